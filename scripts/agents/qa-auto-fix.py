@@ -4,13 +4,262 @@ Auto-Fix Engine for Autonomous Testing
 Applies fixes to test failures with safeguards
 """
 
+import difflib
 import json
+import os
 import sys
 import re
 import shutil
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
 from typing import Dict, List, Any, Optional
 from pathlib import Path
 import subprocess
+import tempfile
+import threading
+import time
+from functools import lru_cache
+
+import qa_profiling
+import qa_telemetry
+import qa_tracing
+
+COMPILE_TIMEOUT = 900  # seconds per service compile
+
+
+def _compile_service(repo_root: str, service: str, test_filter: str = None) -> Dict[str, Any]:
+    """Compile a single service, optionally running one targeted test (runs in a worker process)"""
+    service_dir = Path(repo_root) / "services" / service
+    if not (service_dir / "pom.xml").exists():
+        return {"service": service, "success": True, "skipped": "no pom.xml"}
+    
+    mvn = shutil.which("mvn")
+    if not mvn:
+        # Without Maven we cannot do better than the old syntax-only check
+        return {"service": service, "success": True, "skipped": "mvn not available"}
+    
+    goals = ["test-compile"]
+    if test_filter:
+        goals = ["test", f"-Dtest={test_filter}", "-Dsurefire.failIfNoSpecifiedTests=false"]
+    
+    try:
+        proc = subprocess.run(
+            [mvn, "-q", "-B"] + goals,
+            cwd=str(service_dir),
+            capture_output=True,
+            text=True,
+            timeout=COMPILE_TIMEOUT
+        )
+    except subprocess.TimeoutExpired:
+        return {"service": service, "success": False, "error": f"Compilation timed out after {COMPILE_TIMEOUT}s"}
+    except Exception as e:
+        return {"service": service, "success": False, "error": str(e)}
+    
+    if proc.returncode != 0:
+        # Keep the tail of the output - Maven puts the actual errors last
+        output = (proc.stdout + proc.stderr).strip()
+        return {"service": service, "success": False, "error": output[-2000:]}
+    
+    return {"service": service, "success": True}
+
+
+class ProtectedPathMatcher:
+    """Match repo-relative paths against gitignore-style patterns
+    
+    Patterns are compiled once. Literal paths and directories (e.g. "docs/adr/**")
+    go into prefix sets that are checked against each ancestor of a path, bare
+    names (e.g. "Jenkinsfile") into name sets, and the remaining globs are
+    combined into one regex per run of same-polarity patterns so "!" negations
+    keep gitignore's last-match-wins order. Decisions are cached.
+    """
+    
+    def __init__(self, patterns: List[str], cache_size: int = 8192):
+        self.patterns = [p.strip() for p in patterns if p.strip() and not p.strip().startswith("#")]
+        self._segments = self._compile(self.patterns)
+        self._decide_cached = lru_cache(maxsize=cache_size)(self._decide)
+    
+    def matches(self, path: str) -> bool:
+        """Check if a repo-relative path is protected"""
+        return self._decide_cached(self._normalize(path))
+    
+    def classify(self, paths: List[str]) -> Dict[str, bool]:
+        """Check many paths at once, return {path: protected}"""
+        return {path: self.matches(path) for path in paths}
+    
+    @staticmethod
+    def _normalize(path: str) -> str:
+        path = path.replace("\\", "/")
+        while path.startswith("./"):
+            path = path[2:]
+        return path
+    
+    def _compile(self, patterns: List[str]) -> List[Dict[str, Any]]:
+        """Group patterns into same-polarity segments of prefix sets and one combined regex"""
+        segments = []
+        for pattern in patterns:
+            negated = pattern.startswith("!")
+            if negated:
+                pattern = pattern[1:]
+            elif pattern.startswith("\\!") or pattern.startswith("\\#"):
+                pattern = pattern[1:]
+            
+            if not segments or segments[-1]["negated"] != negated:
+                segments.append({"negated": negated, "exact": set(), "inside": set(), "names": set(),
+                                 "dir_names": set(), "regexes": []})
+            segment = segments[-1]
+            
+            dir_only = pattern.endswith("/")
+            pattern = pattern.rstrip("/")
+            # A slash at the start or in the middle anchors the pattern to the repo root
+            anchored = "/" in pattern
+            pattern = pattern.lstrip("/")
+            
+            body = pattern[:-3] if pattern.endswith("/**") else pattern
+            if not any(c in body for c in "*?["):
+                if pattern.endswith("/**") or dir_only:
+                    # Everything inside a literal directory
+                    (segment["inside"] if anchored else segment["dir_names"]).add(body)
+                elif anchored:
+                    segment["exact"].add(body)
+                    segment["inside"].add(body)
+                else:
+                    segment["names"].add(body)
+                continue
+            
+            regex = self._glob_to_regex(pattern)
+            if not anchored:
+                regex = "(?:.*/)?" + regex
+            # A pattern matching a directory also matches everything below it
+            regex += "/.*" if dir_only else "(?:/.*)?"
+            segment["regexes"].append(regex)
+        
+        for segment in segments:
+            segment["regex"] = re.compile("|".join(f"(?:{r})" for r in segment["regexes"])) if segment["regexes"] else None
+            del segment["regexes"]
+        
+        return segments
+    
+    @staticmethod
+    def _glob_to_regex(pattern: str) -> str:
+        """Translate one gitignore glob to a regex (without anchors)"""
+        regex = ""
+        i = 0
+        n = len(pattern)
+        while i < n:
+            c = pattern[i]
+            if pattern.startswith("**/", i) and (i == 0 or pattern[i - 1] == "/"):
+                # Leading or middle "**/" matches zero or more directories
+                regex += "(?:.*/)?"
+                i += 3
+            elif pattern.startswith("**", i) and i + 2 == n and (i == 0 or pattern[i - 1] == "/"):
+                # Trailing "/**" matches everything inside
+                regex += ".*"
+                i += 2
+            elif c == "*":
+                while i < n and pattern[i] == "*":
+                    i += 1
+                regex += "[^/]*"
+            elif c == "?":
+                regex += "[^/]"
+                i += 1
+            elif c == "[":
+                end = pattern.find("]", i + 2)
+                if end == -1:
+                    regex += re.escape(c)
+                    i += 1
+                else:
+                    body = pattern[i + 1:end]
+                    if body.startswith("!"):
+                        body = "^" + body[1:]
+                    regex += "[" + body + "]"
+                    i = end + 1
+            elif c == "\\" and i + 1 < n:
+                regex += re.escape(pattern[i + 1])
+                i += 2
+            else:
+                regex += re.escape(c)
+                i += 1
+        return regex
+    
+    def _decide(self, path: str) -> bool:
+        parts = path.split("/")
+        ancestors = ["/".join(parts[:i]) for i in range(1, len(parts))]
+        # Last matching pattern wins, so walk the segments backwards
+        for segment in reversed(self._segments):
+            hit = (
+                path in segment["exact"]
+                or any(a in segment["inside"] for a in ancestors)
+                or any(part in segment["names"] for part in parts)
+                or any(part in segment["dir_names"] for part in parts[:-1])
+                or (segment["regex"] is not None and segment["regex"].fullmatch(path) is not None)
+            )
+            if hit:
+                return not segment["negated"]
+        return False
+
+
+class VerificationScheduler:
+    """Verify edited files by compiling each affected service in parallel"""
+    
+    def __init__(self, repo_root: Path, max_workers: int = None):
+        self.repo_root = Path(repo_root)
+        self.max_workers = max_workers or os.cpu_count() or 1
+    
+    @staticmethod
+    def service_for(file_path: str) -> Optional[str]:
+        """Extract service name from a repo-relative path"""
+        parts = Path(file_path).parts
+        if "services" in parts:
+            service_idx = parts.index("services")
+            if service_idx + 1 < len(parts) - 1:
+                return parts[service_idx + 1]
+        return None
+    
+    def group_by_service(self, file_paths: List[str]) -> Dict[str, List[str]]:
+        """Group edited files by the service they belong to"""
+        groups = {}
+        for file_path in file_paths:
+            service = self.service_for(file_path)
+            if service:
+                groups.setdefault(service, [])
+                if file_path not in groups[service]:
+                    groups[service].append(file_path)
+        return groups
+    
+    def verify(self, file_paths: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Run one compile job per service, return results keyed by service"""
+        services = list(self.group_by_service(file_paths))
+        if not services:
+            return {}
+        
+        workers = min(self.max_workers, len(services))
+        if workers == 1:
+            # Not worth spinning up a pool for a single job
+            results = {}
+            for service in services:
+                with qa_tracing.span("compile", service=service):
+                    results[service] = _compile_service(str(self.repo_root), service)
+            return results
+        
+        print(f"[AUTO-FIX] Verifying {len(services)} services with {workers} workers")
+        results = {}
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            submitted = time.time_ns()
+            futures = {
+                pool.submit(_compile_service, str(self.repo_root), service): service
+                for service in services
+            }
+            for future in as_completed(futures):
+                service = futures[future]
+                try:
+                    results[service] = future.result()
+                except Exception as e:
+                    results[service] = {"service": service, "success": False, "error": str(e)}
+                # Workers do not trace; the span covers the compile from submission to its result
+                qa_tracing.record_span("compile", submitted, status="ok" if results[service]["success"] else "error",
+                                       service=service)
+        
+        return results
+
 
 class AutoFixEngine:
     """Apply fixes to test failures with safeguards"""
@@ -22,9 +271,17 @@ class AutoFixEngine:
             self.repo_root = Path(__file__).parent.parent.parent
         
         self.repo_root = self.repo_root.resolve()
-        self.protected_files = self._load_protected_files()
+        self.reload_protected_files()
         self.fixes_applied = []
         self.fixes_skipped = []
+        self.verifier = VerificationScheduler(self.repo_root)
+        # Content of each file before the first fix touched it (for rollback)
+        self._originals = {}
+    
+    def reload_protected_files(self):
+        """(Re)read qa-protected-files.txt and rebuild the matcher"""
+        self.protected_files = self._load_protected_files()
+        self.protected_matcher = ProtectedPathMatcher(self.protected_files)
     
     def _load_protected_files(self) -> List[str]:
         """Load protected files list"""
@@ -65,35 +322,78 @@ class AutoFixEngine:
             rel_path = file_path
         
         # Check against protected patterns
-        for pattern in self.protected_files:
-            # Simple glob matching
-            if self._matches_pattern(rel_path, pattern):
-                return True
-        
-        return False
-    
-    def _matches_pattern(self, path: str, pattern: str) -> bool:
-        """Simple glob pattern matching"""
-        # Convert glob to regex
-        # Handle ** (match any number of directories)
-        regex = pattern.replace("**", ".*")
-        # Handle * (match any characters except /)
-        regex = regex.replace("*", "[^/]*")
-        # Handle ? (match single character)
-        regex = regex.replace("?", ".")
-        
-        # If pattern starts with ** or contains **, match anywhere
-        # Otherwise, match from start (for patterns like .cursor/**)
-        if "**" in pattern or pattern.startswith("*"):
-            return bool(re.search(regex, path))
-        else:
-            return bool(re.match(regex, path))
+        return self.protected_matcher.matches(rel_path)
     
-    def apply_fixes(self, solutions: List[Dict[str, Any]], confidence_threshold: float = 0.90) -> Dict[str, Any]:
-        """Apply fixes from solutions"""
+    @qa_tracing.traced("fix")
+    def apply_fixes(self, solutions: List[Dict[str, Any]], confidence_threshold: float = 0.90,
+                    strategy: str = "service", speculative: bool = False,
+                    max_worktrees: int = None, dry_run: bool = False,
+                    patch_file: str = None) -> Dict[str, Any]:
+        """Apply fixes from solutions
+        
+        strategy "service" applies every fix and compiles each touched service once;
+        "bisect" compiles the whole batch once and bisects failing batches to find the bad fixes.
+        With speculative=True, alternative fixes for the same failure (fixes to the
+        same file) are first tried in parallel git worktrees and only the
+        earliest-ranked one that succeeds is kept.
+        With dry_run=True the working tree is left untouched and all fixes are
+        written as one unified diff to patch_file (apply it with "git apply").
+        """
         print(f"[AUTO-FIX] Applying fixes with confidence threshold: {confidence_threshold}")
+        # Rollback state is per call; an engine reused across iterations must not
+        # restore files to their content from before an earlier call's fixes
+        self._originals = {}
+        started = time.monotonic()
         
-        applied = []
+        candidates, skipped = self._collect_candidates(solutions, confidence_threshold)
+        below_threshold = len(skipped)
+        
+        if speculative:
+            candidates, rejected = self._speculate(candidates, max_worktrees)
+            skipped.extend(rejected)
+        
+        if dry_run:
+            patch_file = patch_file or "fixes.patch"
+            applied, rejected = self._write_patch(candidates, patch_file)
+            compiles = 0
+        elif strategy == "bisect":
+            applied, rejected, compiles = self._apply_bisect(candidates)
+        else:
+            applied, rejected, compiles = self._apply_per_service(candidates)
+        skipped.extend(rejected)
+        
+        self.fixes_applied = applied
+        self.fixes_skipped = skipped
+        qa_telemetry.STAGE_SECONDS.observe(time.monotonic() - started, stage="fix")
+        qa_telemetry.FIXES.inc(len(applied), result="applied")
+        qa_telemetry.FIXES.inc(below_threshold, result="skipped")
+        # Failed speculation or compilation
+        qa_telemetry.FIXES.inc(len(skipped) - below_threshold, result="rejected")
+        
+        result = {
+            "applied": applied,
+            "skipped": skipped,
+            "verification": {
+                "strategy": "none (dry run)" if dry_run else strategy,
+                "candidates": len(candidates),
+                "compiles": compiles,
+                # Verifying each fix on its own would take one compile per candidate
+                "compilesSaved": 0 if dry_run else len(candidates) - compiles
+            },
+            "summary": {
+                "totalFixes": len(applied) + len(skipped),
+                "applied": len(applied),
+                "skipped": len(skipped)
+            }
+        }
+        if dry_run:
+            result["dryRun"] = True
+            result["patch"] = str(patch_file)
+        return result
+    
+    def _collect_candidates(self, solutions: List[Dict[str, Any]], confidence_threshold: float) -> tuple:
+        """Select fixes eligible for application, return (candidates, skipped)"""
+        candidates = []
         skipped = []
         
         for solution in solutions:
@@ -110,7 +410,6 @@ class AutoFixEngine:
                 })
                 continue
             
-            # Apply each fix
             for fix in fixes:
                 fix_confidence = fix.get("confidence", 0.0)
                 
@@ -149,33 +448,405 @@ class AutoFixEngine:
                     })
                     continue
                 
-                # Apply fix
-                result = self._apply_fix(fix, file_path)
-                if result["success"]:
-                    applied.append({
-                        "failureId": failure_id,
-                        "fix": fix,
-                        "result": result
+                failure_data = solution.get("failure", {})
+                test_class = failure_data.get("testClass")
+                test_method = failure_data.get("testMethod")
+                candidates.append({
+                    "failureId": failure_id,
+                    "fix": fix,
+                    "file": file_path,
+                    # Targeted test for speculative checks (compile-only when unknown)
+                    "test": f"{test_class}#{test_method}" if test_class and test_method else None
+                })
+        
+        return candidates, skipped
+    
+    def _apply_per_service(self, candidates: List[Dict[str, Any]]) -> tuple:
+        """Apply every candidate, then verify each touched service once"""
+        applied = []
+        skipped = []
+        
+        for candidate in candidates:
+            # Apply fix (compilation is verified per service below)
+            result = self._apply_fix(candidate["fix"], candidate["file"], verify=False)
+            if result["success"]:
+                applied.append({
+                    "failureId": candidate["failureId"],
+                    "fix": candidate["fix"],
+                    "result": result
+                })
+            else:
+                skipped.append({
+                    "failureId": candidate["failureId"],
+                    "fix": candidate["fix"],
+                    "reason": result.get("error", "Unknown error")
+                })
+        
+        # Verify all touched services at once, roll back failed services only
+        compiles = len(self.verifier.group_by_service([a["result"]["file"] for a in applied]))
+        applied, rolled_back = self._verify_applied(applied)
+        skipped.extend(rolled_back)
+        
+        return applied, skipped, compiles
+    
+    def _write_patch(self, candidates: List[Dict[str, Any]], patch_file: str) -> tuple:
+        """Run every fix in memory and stream one unified diff for the batch to patch_file"""
+        applied = []
+        skipped = []
+        originals = {}
+        contents = {}
+        
+        for candidate in candidates:
+            file_path = candidate["file"]
+            if file_path not in contents:
+                full_path = self.repo_root / file_path
+                if not full_path.exists():
+                    skipped.append({
+                        "failureId": candidate["failureId"],
+                        "fix": candidate["fix"],
+                        "reason": f"File not found: {file_path}"
                     })
-                else:
+                    continue
+                with open(full_path, 'r') as f:
+                    originals[file_path] = contents[file_path] = f.read()
+            
+            try:
+                contents[file_path] = self._transform_content(contents[file_path], candidate["fix"])
+            except Exception as e:
+                skipped.append({
+                    "failureId": candidate["failureId"],
+                    "fix": candidate["fix"],
+                    "reason": str(e)
+                })
+                continue
+            
+            applied.append({
+                "failureId": candidate["failureId"],
+                "fix": candidate["fix"],
+                "result": {
+                    "success": True,
+                    "file": file_path,
+                    "fixType": candidate["fix"].get("type", ""),
+                    "dryRun": True
+                }
+            })
+        
+        Path(patch_file).parent.mkdir(parents=True, exist_ok=True)
+        changed = 0
+        with open(patch_file, 'w') as out:
+            for file_path, content in contents.items():
+                if content == originals[file_path]:
+                    continue
+                changed += 1
+                out.write(f"diff --git a/{file_path} b/{file_path}\n")
+                diff = difflib.unified_diff(
+                    originals[file_path].splitlines(keepends=True),
+                    content.splitlines(keepends=True),
+                    fromfile=f"a/{file_path}",
+                    tofile=f"b/{file_path}"
+                )
+                for line in diff:
+                    out.write(line)
+                    if not line.endswith("\n"):
+                        # Same marker git uses, so "git apply" accepts the patch
+                        out.write("\n\\ No newline at end of file\n")
+        
+        print(f"[AUTO-FIX] Dry run: {len(applied)} fixes across {changed} files written to {patch_file}")
+        return applied, skipped
+    
+    def _apply_bisect(self, candidates: List[Dict[str, Any]]) -> tuple:
+        """Apply the whole batch, compile once, bisect failing services to isolate bad fixes
+        
+        With k bad fixes among n candidates this takes O(k log n) compile rounds.
+        Services compile in parallel within a round, and a service that compiles
+        clears all of its fixes at once, so only failing services are split further.
+        """
+        skipped = []
+        usable = []
+        
+        # Load original contents once; every trial is rebuilt from them in memory
+        for candidate in candidates:
+            file_path = candidate["file"]
+            full_path = self.repo_root / file_path
+            if file_path not in self._originals:
+                if not full_path.exists():
                     skipped.append({
-                        "failureId": failure_id,
-                        "fix": fix,
-                        "reason": result.get("error", "Unknown error")
+                        "failureId": candidate["failureId"],
+                        "fix": candidate["fix"],
+                        "reason": f"File not found: {file_path}"
                     })
+                    continue
+                with open(full_path, 'r') as f:
+                    self._originals[file_path] = f.read()
+                shutil.copy2(full_path, full_path.with_suffix(full_path.suffix + ".backup"))
+            usable.append(candidate)
         
-        self.fixes_applied = applied
-        self.fixes_skipped = skipped
+        accepted = set()
+        bad = set()
+        compiles = 0
         
-        return {
-            "applied": applied,
-            "skipped": skipped,
-            "summary": {
-                "totalFixes": len(applied) + len(skipped),
-                "applied": len(applied),
-                "skipped": len(skipped)
-            }
-        }
+        def files_of(trial: List[int]) -> set:
+            return {usable[i]["file"] for i in trial}
+        
+        def write_state(trial: List[int], files: set = None):
+            """Write original content plus accepted and trial fixes, in candidate order"""
+            active = accepted | set(trial)
+            for file_path in files_of(trial) | (files or set()):
+                content = self._originals[file_path]
+                for i, candidate in enumerate(usable):
+                    if i in active and candidate["file"] == file_path:
+                        content = self._transform_content(content, candidate["fix"])
+                with open(self.repo_root / file_path, 'w') as f:
+                    f.write(content)
+        
+        def search(trial: List[int], known_bad: bool = False):
+            nonlocal compiles
+            if not trial:
+                return
+            if known_bad and len(trial) == 1:
+                # Sibling compiled, so this one must be the culprit - no compile needed
+                bad.add(trial[0])
+                return
+            
+            if not known_bad:
+                write_state(trial)
+                files = [usable[i]["file"] for i in trial]
+                results = self.verifier.verify(files)
+                # One compile per touched service, matching the per-service strategy's count
+                compiles += len(results)
+                failing = {service for service, r in results.items() if not r.get("success")}
+                # Fixes outside failing services are good as a group
+                for i in trial:
+                    if self.verifier.service_for(usable[i]["file"]) not in failing:
+                        accepted.add(i)
+                trial = [i for i in trial if i not in accepted]
+                if not trial:
+                    return
+                # Reset the failing part before trying it in smaller pieces
+                write_state([], files_of(trial))
+                if len(trial) == 1:
+                    bad.add(trial[0])
+                    return
+            
+            mid = len(trial) // 2
+            left, right = trial[:mid], trial[mid:]
+            search(left)
+            # If the left half compiled cleanly the right half holds the failure
+            search(right, known_bad=all(i in accepted for i in left))
+        
+        print(f"[AUTO-FIX] Verifying {len(usable)} fixes as one batch (bisect on failure)")
+        search(list(range(len(usable))))
+        
+        # Final tree: originals plus every accepted fix
+        write_state([], files_of(range(len(usable))))
+        
+        applied = []
+        for i in sorted(accepted):
+            candidate = usable[i]
+            full_path = self.repo_root / candidate["file"]
+            applied.append({
+                "failureId": candidate["failureId"],
+                "fix": candidate["fix"],
+                "result": {
+                    "success": True,
+                    "file": candidate["file"],
+                    "backup": str(full_path.with_suffix(full_path.suffix + ".backup").relative_to(self.repo_root)),
+                    "fixType": candidate["fix"].get("type", "")
+                }
+            })
+        for i in sorted(bad):
+            candidate = usable[i]
+            skipped.append({
+                "failureId": candidate["failureId"],
+                "fix": candidate["fix"],
+                "reason": "Compilation failed: isolated by batch bisection"
+            })
+        
+        print(f"[AUTO-FIX] Batch verification used {compiles} compiles for {len(usable)} fixes")
+        return applied, skipped, compiles
+    
+    def _speculate(self, candidates: List[Dict[str, Any]], max_worktrees: int = None) -> tuple:
+        """Try alternative fixes for the same failure in isolated worktrees
+        
+        Fixes for one failure are alternatives when they edit the same file;
+        fixes in different files (e.g. add_import and add_dependency) work
+        together and are all kept. Each alternative is checked with the
+        failure's fixes to other files applied alongside it. Returns
+        (candidates, skipped) where each set of alternatives keeps at most
+        one fix: the earliest in suggestion order whose targeted compile or
+        test succeeded.
+        """
+        groups = {}
+        for candidate in candidates:
+            groups.setdefault((candidate["failureId"], candidate["file"]), []).append(candidate)
+        contested = {key: group for key, group in groups.items() if len(group) > 1}
+        
+        if not contested:
+            return candidates, []
+        
+        if subprocess.run(["git", "rev-parse", "--verify", "-q", "HEAD"], cwd=str(self.repo_root),
+                          capture_output=True).returncode != 0:
+            print("[AUTO-FIX] Not a git repository with commits - speculative mode disabled")
+            return candidates, []
+        
+        # Uncommitted changes (e.g. fixes from earlier iterations) are replayed into every worktree,
+        # and untracked files (new classes, generated sources) are copied in
+        live_diff = subprocess.run(["git", "diff", "HEAD", "--binary"], cwd=str(self.repo_root),
+                                   capture_output=True).stdout
+        untracked = subprocess.run(["git", "ls-files", "-z", "--others", "--exclude-standard"],
+                                   cwd=str(self.repo_root), capture_output=True, text=True).stdout
+        untracked = [path for path in untracked.split("\0") if path]
+        
+        # The preferred fix of each of a failure's other files goes in with every alternative
+        companions = {}
+        for (failure_id, _), group in groups.items():
+            companions.setdefault(failure_id, []).append(group[0])
+        
+        workers = max_worktrees or min(4, os.cpu_count() or 1)
+        total = sum(len(group) for group in contested.values())
+        print(f"[AUTO-FIX] Speculating on {total} alternative fixes for {len(contested)} files "
+              f"(max {workers} worktrees)")
+        
+        # Rank (suggestion order) of the best alternative that succeeded, per group
+        best = {}
+        errors = {}
+        setup_errors = []
+        lock = threading.Lock()
+        
+        def attempt(key: tuple, rank: int, candidate: Dict[str, Any]):
+            with lock:
+                if best.get(key, rank) < rank or setup_errors:
+                    return  # An earlier-ranked alternative already succeeded
+            others = [c for c in companions[key[0]] if c["file"] != key[1]]
+            result = self._try_in_worktree(candidate, others, live_diff, untracked)
+            with lock:
+                if result.get("setupFailed"):
+                    setup_errors.append(result["error"])
+                elif result["success"]:
+                    best[key] = min(best.get(key, rank), rank)
+                else:
+                    errors[id(candidate)] = result.get("error", "Unknown error")
+        
+        # Submit by rank so every group's preferred alternatives start first
+        attempts = sorted(((rank, key, candidate) for key, group in contested.items()
+                           for rank, candidate in enumerate(group)), key=lambda entry: entry[0])
+        try:
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                # Each in a copy of this context, so speculation spans nest under the fix stage
+                futures = [pool.submit(qa_tracing.in_context(attempt), key, rank, candidate)
+                           for rank, key, candidate in attempts]
+                for future in futures:
+                    future.result()
+        finally:
+            subprocess.run(["git", "worktree", "prune"], cwd=str(self.repo_root), capture_output=True)
+        
+        if setup_errors:
+            # A worktree that does not match the live tree would judge fixes against the wrong code
+            print(f"[AUTO-FIX] {setup_errors[0]} - speculative mode disabled")
+            return candidates, []
+        
+        winners = {id(contested[key][rank]) for key, rank in best.items()}
+        kept = []
+        skipped = []
+        for candidate in candidates:
+            key = (candidate["failureId"], candidate["file"])
+            if key not in contested or id(candidate) in winners:
+                kept.append(candidate)
+            elif id(candidate) in errors:
+                skipped.append({
+                    "failureId": candidate["failureId"],
+                    "fix": candidate["fix"],
+                    "reason": f"Failed in speculative worktree: {errors[id(candidate)]}"
+                })
+            else:
+                skipped.append({
+                    "failureId": candidate["failureId"],
+                    "fix": candidate["fix"],
+                    "reason": "Superseded by an earlier-ranked alternative"
+                })
+        
+        return kept, skipped
+    
+    def _try_in_worktree(self, candidate: Dict[str, Any], companions: List[Dict[str, Any]], live_diff: bytes,
+                         untracked: List[str]) -> Dict[str, Any]:
+        """Apply one candidate (after its companion fixes) in a throwaway worktree and run its targeted check
+        
+        The result has ``setupFailed`` set when the worktree could not be made
+        to match the live tree.
+        """
+        worktree = Path(tempfile.mkdtemp(prefix="qa-speculative-"))
+        try:
+            add = subprocess.run(["git", "worktree", "add", "--detach", "-q", str(worktree), "HEAD"],
+                                 cwd=str(self.repo_root), capture_output=True, text=True)
+            if add.returncode != 0:
+                return {"success": False, "setupFailed": True,
+                        "error": f"git worktree add failed: {add.stderr.strip()}"}
+            
+            if live_diff:
+                applied = subprocess.run(["git", "apply", "--whitespace=nowarn", "-"], cwd=str(worktree),
+                                         input=live_diff, capture_output=True)
+                if applied.returncode != 0:
+                    return {"success": False, "setupFailed": True, "error": "Uncommitted changes do not apply "
+                            f"to a worktree: {applied.stderr.decode(errors='replace').strip()}"}
+            for path in untracked:
+                source = self.repo_root / path
+                if source.is_file():
+                    (worktree / path).parent.mkdir(parents=True, exist_ok=True)
+                    shutil.copy2(source, worktree / path, follow_symlinks=False)
+            
+            engine = AutoFixEngine(str(worktree))
+            for companion in companions:
+                engine._apply_fix(companion["fix"], companion["file"], verify=False)
+            result = engine._apply_fix(candidate["fix"], candidate["file"], verify=False)
+            if not result["success"]:
+                return result
+            
+            service = self.verifier.service_for(candidate["file"])
+            if not service:
+                return {"success": True}
+            with qa_tracing.span("compile", service=service, speculative=True):
+                return _compile_service(str(worktree), service, candidate.get("test"))
+        finally:
+            subprocess.run(["git", "worktree", "remove", "--force", str(worktree)],
+                           cwd=str(self.repo_root), capture_output=True)
+            shutil.rmtree(worktree, ignore_errors=True)
+    
+    def _verify_applied(self, applied: List[Dict[str, Any]]) -> tuple:
+        """Compile services touched by applied fixes and roll back failed services"""
+        files = [a["result"]["file"] for a in applied]
+        results = self.verifier.verify(files)
+        failed = {service: r for service, r in results.items() if not r.get("success")}
+        
+        if not failed:
+            return applied, []
+        
+        kept = []
+        rolled_back = []
+        for entry in applied:
+            service = self.verifier.service_for(entry["result"]["file"])
+            if service in failed:
+                rolled_back.append({
+                    "failureId": entry["failureId"],
+                    "fix": entry["fix"],
+                    "reason": f"Compilation failed in {service}: {failed[service].get('error')}"
+                })
+            else:
+                kept.append(entry)
+        
+        for service in failed:
+            print(f"[AUTO-FIX] Compilation failed in {service} - rolling back its fixes")
+            self._rollback_files(self.verifier.group_by_service(files)[service])
+        
+        return kept, rolled_back
+    
+    def _rollback_files(self, file_paths: List[str]):
+        """Restore files to their content before any fix was applied"""
+        for file_path in file_paths:
+            original = self._originals.pop(file_path, None)
+            if original is None:
+                continue
+            with open(self.repo_root / file_path, 'w') as f:
+                f.write(original)
     
     def _find_file_path(self, failure_id: str, solution: Dict[str, Any]) -> Optional[str]:
         """Find file path from failure ID"""
@@ -196,11 +867,10 @@ class AutoFixEngine:
         
         return None
     
-    def _apply_fix(self, fix: Dict[str, Any], file_path: str) -> Dict[str, Any]:
+    @qa_tracing.traced(file="file_path")
+    def _apply_fix(self, fix: Dict[str, Any], file_path: str, verify: bool = True) -> Dict[str, Any]:
         """Apply a single fix"""
         fix_type = fix.get("type", "")
-        change = fix.get("change", "")
-        location = fix.get("location", "")
         
         # Resolve file path
         full_path = self.repo_root / file_path
@@ -224,27 +894,16 @@ class AutoFixEngine:
             # Read file
             with open(full_path, 'r') as f:
                 content = f.read()
+            self._originals.setdefault(file_path, content)
             
-            # Apply fix based on type
-            if fix_type == "add_import":
-                new_content = self._add_import(content, change)
-            elif fix_type == "add_dependency":
-                new_content = self._add_dependency_to_pom(content, change)
-            elif fix_type == "add_null_check":
-                new_content = self._add_null_check(content, change, location)
-            elif fix_type == "fix_assertion":
-                # For now, just document - actual fix requires more context
-                new_content = content  # Keep original
-            else:
-                # Generic fix - document in comment
-                new_content = self._add_fix_comment(content, change, location)
+            new_content = self._transform_content(content, fix)
             
             # Write file
             with open(full_path, 'w') as f:
                 f.write(new_content)
             
             # Verify compilation (for Java files)
-            if file_path.endswith(".java"):
+            if verify and file_path.endswith(".java"):
                 compile_result = self._verify_compilation(file_path)
                 if not compile_result["success"]:
                     # Restore backup
@@ -272,6 +931,26 @@ class AutoFixEngine:
                 "error": str(e)
             }
     
+    def _transform_content(self, content: str, fix: Dict[str, Any]) -> str:
+        """Apply a fix to file content in memory"""
+        fix_type = fix.get("type", "")
+        change = fix.get("change", "")
+        location = fix.get("location", "")
+        
+        # Apply fix based on type
+        if fix_type == "add_import":
+            return self._add_import(content, change)
+        elif fix_type == "add_dependency":
+            return self._add_dependency_to_pom(content, change)
+        elif fix_type == "add_null_check":
+            return self._add_null_check(content, change, location)
+        elif fix_type == "fix_assertion":
+            # For now, just document - actual fix requires more context
+            return content  # Keep original
+        else:
+            # Generic fix - document in comment
+            return self._add_fix_comment(content, change, location)
+    
     def _add_import(self, content: str, import_stmt: str) -> str:
         """Add import statement to Java file"""
         # Find package declaration
@@ -339,33 +1018,38 @@ class AutoFixEngine:
     
     def _verify_compilation(self, file_path: str) -> Dict[str, Any]:
         """Verify Java file compiles"""
-        # Extract service from path
-        parts = Path(file_path).parts
-        if "services" in parts:
-            service_idx = parts.index("services")
-            if service_idx + 1 < len(parts):
-                service = parts[service_idx + 1]
-                service_dir = self.repo_root / "services" / service
-                
-                # Try to compile (simplified - would need proper Maven setup)
-                try:
-                    # Just check syntax for now
-                    return {"success": True}
-                except Exception as e:
-                    return {"success": False, "error": str(e)}
+        results = self.verifier.verify([file_path])
+        for result in results.values():
+            if not result.get("success"):
+                return result
         
         return {"success": True}
 
 
 def main():
     """CLI for auto-fix engine"""
-    if len(sys.argv) < 2:
-        print("Usage: qa-auto-fix.py <solutions.json> [output-file] [confidence-threshold]")
+    qa_telemetry.export_at_exit("qa-auto-fix")
+    qa_tracing.trace_at_exit("qa-auto-fix")
+    qa_profiling.from_argv("qa-auto-fix")
+    # Split --options from positional arguments
+    options = dict(a[2:].split("=", 1) if "=" in a else (a[2:], "") for a in sys.argv[1:] if a.startswith("--"))
+    args = [a for a in sys.argv[1:] if not a.startswith("--")]
+    
+    if len(args) < 1:
+        print("Usage: qa-auto-fix.py <solutions.json> [output-file] [confidence-threshold] [--strategy=service|bisect]")
+        print("       [--speculative] [--max-worktrees=N] [--dry-run [--patch=<file>]] [--profile[=dir]]")
         sys.exit(1)
     
-    input_file = sys.argv[1]
-    output_file = sys.argv[2] if len(sys.argv) > 2 else None
-    confidence_threshold = float(sys.argv[3]) if len(sys.argv) > 3 else 0.90
+    input_file = args[0]
+    output_file = args[1] if len(args) > 1 else None
+    confidence_threshold = float(args[2]) if len(args) > 2 else 0.90
+    strategy = options.get("strategy", "service")
+    speculative = "speculative" in options
+    max_worktrees = int(options["max-worktrees"]) if options.get("max-worktrees") else None
+    dry_run = "dry-run" in options
+    patch_file = options.get("patch")
+    if dry_run and not patch_file:
+        patch_file = str(Path(output_file).with_suffix(".patch")) if output_file else "fixes.patch"
     
     # Load solutions
     with open(input_file, 'r') as f:
@@ -379,7 +1063,8 @@ def main():
     
     # Apply fixes
     engine = AutoFixEngine()
-    result = engine.apply_fixes(solutions, confidence_threshold)
+    result = engine.apply_fixes(solutions, confidence_threshold, strategy, speculative, max_worktrees,
+                                dry_run, patch_file)
     
     # Output
     json_output = json.dumps(result, indent=2)
@@ -397,6 +1082,10 @@ def main():
     print(f"  Total fixes: {summary['totalFixes']}")
     print(f"  Applied: {summary['applied']}")
     print(f"  Skipped: {summary['skipped']}")
+    verification = result["verification"]
+    print(f"  Compiles: {verification['compiles']} ({verification['compilesSaved']} saved, strategy: {verification['strategy']})")
+    if result.get("dryRun"):
+        print(f"  Patch: {result['patch']} (apply with: git apply {result['patch']})")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+QA Client for Autonomous Testing
+Sends parse/analyze/solve/fix/query requests to qa-daemon.py, or runs them in-process
+"""
+
+import contextlib
+import hashlib
+import itertools
+import json
+import os
+import socket
+import sys
+import tempfile
+from pathlib import Path
+from typing import Any, Dict
+
+import qa_modules
+import qa_profiling
+
+SCRIPT_DIR = Path(__file__).resolve().parent
+REPO_ROOT = SCRIPT_DIR.parent.parent
+
+_request_ids = itertools.count(1)
+_service = None
+
+
+class DaemonUnavailable(Exception):
+    """No daemon is listening on the socket"""
+
+
+class RPCError(Exception):
+    """The daemon answered with a JSON-RPC error"""
+    
+    def __init__(self, code: int, message: str):
+        super().__init__(message)
+        self.code = code
+
+
+def default_socket_path() -> Path:
+    """QA_DAEMON_SOCKET, or a per-checkout socket in the runtime directory"""
+    if os.environ.get("QA_DAEMON_SOCKET"):
+        return Path(os.environ["QA_DAEMON_SOCKET"])
+    runtime_dir = os.environ.get("XDG_RUNTIME_DIR") or tempfile.gettempdir()
+    checkout = hashlib.blake2b(str(REPO_ROOT).encode("utf-8"), digest_size=6).hexdigest()
+    return Path(runtime_dir) / f"qa-daemon-{os.getuid()}-{checkout}.sock"
+
+
+def call(method: str, params: Any = None, socket_path: Path = None) -> Any:
+    """Send one JSON-RPC request to the daemon and return its result"""
+    socket_path = socket_path or default_socket_path()
+    request = {"jsonrpc": "2.0", "id": next(_request_ids), "method": method, "params": params or {}}
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.connect(str(socket_path))
+            sock.sendall(json.dumps(request).encode("utf-8") + b"\n")
+            with sock.makefile("rb") as reader:
+                line = reader.readline()
+    except (FileNotFoundError, ConnectionRefusedError) as e:
+        raise DaemonUnavailable(str(e))
+    if not line:
+        raise DaemonUnavailable(f"Daemon closed the connection on {socket_path}")
+    
+    response = json.loads(line)
+    if "error" in response:
+        raise RPCError(response["error"]["code"], response["error"]["message"])
+    return response["result"]
+
+
+def request(method: str, params: Dict[str, Any] = None, socket_path: Path = None,
+            in_process: bool = False) -> Any:
+    """Run ``method`` on the daemon, falling back to an in-process QAService"""
+    global _service
+    if not in_process:
+        try:
+            return call(method, params, socket_path)
+        except DaemonUnavailable:
+            print(f"[CLIENT] QA daemon not running ({socket_path or default_socket_path()}), running in-process",
+                  file=sys.stderr)
+    
+    if _service is None:
+        _service = qa_modules.load("qa-daemon").QAService()
+    # Stage progress output goes to stderr, as it does to the daemon's log
+    with contextlib.redirect_stdout(sys.stderr):
+        return _service.dispatch(method, params)
+
+
+def main():
+    """CLI for the QA client"""
+    qa_profiling.from_argv("qa-client")
+    options = dict(a[2:].split("=", 1) if "=" in a else (a[2:], "") for a in sys.argv[1:] if a.startswith("--"))
+    args = [a for a in sys.argv[1:] if not a.startswith("--")]
+    command = args[0] if args else "help"
+    
+    if command not in ("ping", "parse", "analyze", "solve", "fix", "query", "list"):
+        print("Usage: qa-client.py <command> [args] [--socket=<path>] [--in-process] [--profile[=dir]]")
+        print("Commands:")
+        print("  ping                                        - Daemon status")
+        print("  parse <results-dir> [output-file]           - Parse test results")
+        print("  analyze <test-results.json> [output-file]   - Analyze failures [--no-cache]")
+        print("  solve <failures-analysis.json> [output-file] - Find solutions [--no-cache]")
+        print("  fix <solutions.json> [output-file] [threshold] - Apply fixes [--strategy=service|bisect]")
+        print("      [--speculative] [--max-worktrees=N] [--dry-run [--patch=<file>]]")
+        print("  query [runs|failures] [--status=] [--type=] [--since=] [--until=] [--run=] [--id=] [--text=]")
+        print("      [--any] [--limit=] [--offset=] [--format=json|jsonl|csv]")
+        print("  list [limit]                                - Recent runs")
+        print("Requests go to qa-daemon.py when it is running and run in this process otherwise.")
+        sys.exit(0 if command == "help" else 1)
+    
+    storage_module = qa_modules.load("qa-storage")
+    output_file = None
+    params = {}
+    
+    if command in ("parse", "analyze", "solve", "fix"):
+        if len(args) < 2:
+            print(f"Usage: qa-client.py {command} <input> [output-file]")
+            sys.exit(1)
+        source = str(Path(args[1]).resolve())
+        output_file = args[2] if len(args) > 2 else None
+        if command == "parse":
+            params = {"resultsDir": source}
+        elif command == "fix":
+            params = {
+                "solutions": storage_module.read_artifact(source).get("solutions", []),
+                "threshold": float(args[3]) if len(args) > 3 else 0.90,
+                "strategy": options.get("strategy", "service"),
+                "speculative": "speculative" in options,
+                "maxWorktrees": int(options["max-worktrees"]) if options.get("max-worktrees") else None,
+                "dryRun": "dry-run" in options,
+                "patch": str(Path(options["patch"]).resolve()) if options.get("patch") else None
+            }
+        else:
+            params = {"failures": storage_module.read_artifact(source).get("failures", []),
+                      "noCache": "no-cache" in options}
+    elif command == "query":
+        params = {
+            "target": args[1] if len(args) > 1 else "runs",
+            "status": options.get("status"),
+            "testType": options.get("type"),
+            "since": options.get("since"),
+            "until": options.get("until"),
+            "runId": options.get("run"),
+            "failureId": options.get("id"),
+            "text": options.get("text"),
+            "matchAny": "any" in options,
+            "limit": int(options["limit"]) if "limit" in options else None,
+            "offset": int(options.get("offset", 0))
+        }
+    elif command == "list":
+        params = {"limit": int(args[1]) if len(args) > 1 else 10}
+    
+    socket_path = Path(options["socket"]) if options.get("socket") else None
+    try:
+        result = request(command, params, socket_path, in_process="in-process" in options)
+    except (RPCError, KeyError, TypeError, ValueError) as e:
+        print(f"[CLIENT] {command} failed: {e}", file=sys.stderr)
+        sys.exit(1)
+    
+    if command == "query":
+        fmt = options.get("format", "jsonl")
+        if fmt not in ("json", "jsonl", "csv"):
+            print(f"Unknown format: {fmt} (use json, jsonl or csv)")
+            sys.exit(1)
+        count = storage_module.write_records(result, fmt)
+        print(f"[CLIENT] {count} {params['target']}", file=sys.stderr)
+    elif output_file:
+        with open(output_file, "w") as f:
+            json.dump(result, f, indent=2)
+        print(f"[CLIENT] {command} result written to: {output_file}", file=sys.stderr)
+    else:
+        print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
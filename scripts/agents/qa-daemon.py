@@ -0,0 +1,314 @@
+#!/usr/bin/env python3
+"""
+QA Daemon for Autonomous Testing
+Keeps stage objects and indexes warm and serves them over JSON-RPC on a Unix socket
+"""
+
+import inspect
+import json
+import os
+import signal
+import socketserver
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Any, Optional
+
+import qa_cache
+import qa_modules
+import qa_profiling
+import qa_telemetry
+
+parser_module = qa_modules.load("qa-result-parser")
+analyzer_module = qa_modules.load("qa-problem-analyzer")
+finder_module = qa_modules.load("qa-solution-finder")
+fix_module = qa_modules.load("qa-auto-fix")
+storage_module = qa_modules.load("qa-storage")
+client_module = qa_modules.load("qa-client")
+
+SCRIPT_DIR = Path(__file__).resolve().parent
+START_TIMEOUT = 10
+
+# JSON-RPC 2.0 error codes
+PARSE_ERROR = -32700
+INVALID_REQUEST = -32600
+METHOD_NOT_FOUND = -32601
+INVALID_PARAMS = -32602
+SERVER_ERROR = -32000
+
+
+class InvalidParams(Exception):
+    """Request params do not match the method's signature"""
+
+
+class QAService:
+    """Stage objects and indexes shared by every request
+    
+    The daemon keeps one instance for its lifetime; qa-client.py creates one
+    in-process when no daemon is running. Parameter names are the JSON-RPC
+    parameter names.
+    """
+    
+    METHODS = ("ping", "parse", "analyze", "solve", "fix", "query", "list")
+    
+    def __init__(self, repo_root: str = None):
+        self.repo_root = Path(repo_root) if repo_root else client_module.REPO_ROOT
+        self.started = time.time()
+        self.requests = 0
+        self.analyzer = analyzer_module.ProblemAnalyzer()
+        # Keeps its class index until services/ or shared/ change
+        self.finder = finder_module.SolutionFinder(str(self.repo_root))
+        self.fixer = fix_module.AutoFixEngine(str(self.repo_root))
+        self.storage = storage_module.ResultStorage()
+        self._protected_mtime = self._protected_files_mtime()
+        # Hashed now, while the source on disk is the code this process loaded: the daemon keeps
+        # running that code after an edit, so its cache entries must stay under the old version
+        self._code_versions = {"analyze": qa_cache.code_version(self.analyzer),
+                               "solve": qa_cache.code_version(self.finder)}
+    
+    def _protected_files_mtime(self) -> Optional[float]:
+        try:
+            return (self.repo_root / "scripts" / "agents" / "qa-protected-files.txt").stat().st_mtime
+        except OSError:
+            return None
+    
+    def ping(self) -> Dict[str, Any]:
+        return {
+            "pid": os.getpid(),
+            "repoRoot": str(self.repo_root),
+            "uptimeSeconds": round(time.time() - self.started, 1),
+            "requests": self.requests
+        }
+    
+    def parse(self, resultsDir: str) -> Dict[str, Any]:
+        return parser_module.TestResultParser(resultsDir).parse()
+    
+    def analyze(self, failures: List[Dict[str, Any]], noCache: bool = False) -> Dict[str, Any]:
+        cache = qa_cache.StageCache(enabled=not noCache)
+        analysis = cache.run("analyze", self._code_versions["analyze"], failures, self.analyzer.analyze)
+        qa_telemetry.observe_analysis(analysis)
+        return analysis
+    
+    def solve(self, failures: List[Dict[str, Any]], noCache: bool = False) -> Dict[str, Any]:
+        cache = qa_cache.StageCache(enabled=not noCache)
+        solutions = cache.run("solve", self._code_versions["solve"], failures, self.finder.find_solutions,
+                              self.finder.cache_config)
+        qa_telemetry.observe_solutions(solutions)
+        return {
+            "failures": failures,
+            "solutions": solutions,
+            "summary": {
+                "totalFailures": len(failures),
+                "failuresWithSolutions": len([s for s in solutions if s.get("suggestedFixes")]),
+                "totalFixes": sum(len(s.get("suggestedFixes", [])) for s in solutions)
+            }
+        }
+    
+    def fix(self, solutions: List[Dict[str, Any]], threshold: float = 0.90, strategy: str = "service",
+            speculative: bool = False, maxWorktrees: int = None, dryRun: bool = False,
+            patch: str = None) -> Dict[str, Any]:
+        mtime = self._protected_files_mtime()
+        if mtime != self._protected_mtime:
+            self.fixer.reload_protected_files()
+            self._protected_mtime = mtime
+        return self.fixer.apply_fixes(solutions, threshold, strategy, speculative, maxWorktrees, dryRun, patch)
+    
+    def query(self, target: str = "runs", status: str = None, testType: str = None, since: str = None,
+              until: str = None, runId: str = None, failureId: str = None, text: str = None,
+              matchAny: bool = False, limit: int = None, offset: int = 0) -> List[Dict[str, Any]]:
+        """Same filters as ``qa-storage.py query``"""
+        if target == "runs":
+            return self.storage.query_runs(status, testType, since, until, limit, offset)
+        if target == "failures":
+            return list(self.storage.iter_failures(text, failure_id=failureId, match_all=not matchAny,
+                                                   limit=limit, run_id=runId, offset=offset))
+        raise ValueError(f"Unknown query target: {target} (use runs or failures)")
+    
+    def list(self, limit: int = 10) -> List[Dict[str, Any]]:
+        return self.storage.list_runs(limit)
+    
+    def dispatch(self, method: str, params: Any) -> Any:
+        """Call ``method``; raises KeyError for unknown methods, InvalidParams for bad params
+        
+        Params are checked against the signature before the call, so a
+        TypeError raised inside the method is a server error, not bad params.
+        """
+        if method not in self.METHODS:
+            raise KeyError(method)
+        self.requests += 1
+        handler = getattr(self, method)
+        if params is None:
+            args, kwargs = (), {}
+        elif isinstance(params, dict):
+            args, kwargs = (), params
+        elif isinstance(params, list):
+            args, kwargs = params, {}
+        else:
+            raise InvalidParams("params must be an array or an object")
+        try:
+            inspect.signature(handler).bind(*args, **kwargs)
+        except TypeError as e:
+            raise InvalidParams(str(e)) from None
+        return handler(*args, **kwargs)
+
+
+class RequestHandler(socketserver.StreamRequestHandler):
+    """Newline-delimited JSON-RPC 2.0; several requests (or batches) per connection"""
+    
+    def handle(self):
+        for line in self.rfile:
+            if not line.strip():
+                continue
+            try:
+                message = json.loads(line)
+            except ValueError as e:
+                response = _error(None, PARSE_ERROR, f"Parse error: {e}")
+            else:
+                if isinstance(message, list):
+                    response = [r for r in (self.server.respond(m) for m in message) if r is not None] or None
+                else:
+                    response = self.server.respond(message)
+            if response is not None:
+                self.wfile.write(json.dumps(response).encode("utf-8") + b"\n")
+                self.wfile.flush()
+
+
+def _error(request_id: Any, code: int, message: str) -> Dict[str, Any]:
+    return {"jsonrpc": "2.0", "id": request_id, "error": {"code": code, "message": message}}
+
+
+class DaemonServer(socketserver.UnixStreamServer):
+    """Serves one request at a time; stage objects and the SQLite connection are not thread-safe"""
+    
+    def __init__(self, socket_path: Path, service: QAService):
+        self.socket_path = Path(socket_path)
+        self.service = service
+        super().__init__(str(self.socket_path), RequestHandler)
+        os.chmod(self.socket_path, 0o600)
+    
+    def respond(self, message: Any) -> Optional[Dict[str, Any]]:
+        """Response for one request object, None for notifications"""
+        if not isinstance(message, dict) or not isinstance(message.get("method"), str):
+            return _error(None, INVALID_REQUEST, "Invalid request")
+        request_id = message.get("id")
+        method = message["method"]
+        
+        if method == "shutdown":
+            threading.Thread(target=self.shutdown, daemon=True).start()
+            result = {"stopping": True}
+        else:
+            try:
+                result = self.service.dispatch(method, message.get("params"))
+            except KeyError:
+                return _error(request_id, METHOD_NOT_FOUND, f"Method not found: {method}")
+            except InvalidParams as e:
+                return _error(request_id, INVALID_PARAMS, f"Invalid params: {e}")
+            except Exception as e:
+                print(f"[DAEMON] {method} failed: {e}", flush=True)
+                return _error(request_id, SERVER_ERROR, f"{type(e).__name__}: {e}")
+        
+        if "id" not in message:
+            return None
+        return {"jsonrpc": "2.0", "id": request_id, "result": result}
+
+
+def serve(socket_path: Path):
+    """Run the daemon in the foreground until shutdown or SIGTERM"""
+    if socket_path.exists():
+        try:
+            client_module.call("ping", socket_path=socket_path)
+            print(f"[DAEMON] Already running on {socket_path}")
+            sys.exit(1)
+        except client_module.DaemonUnavailable:
+            socket_path.unlink()  # Stale socket from a daemon that died
+    
+    server = DaemonServer(socket_path, QAService())
+    metrics = qa_telemetry.serve()
+    if metrics:
+        print(f"[DAEMON] Metrics on http://{metrics.server_address[0]}:{metrics.server_address[1]}/metrics", flush=True)
+    signal.signal(signal.SIGTERM, lambda signum, frame: threading.Thread(target=server.shutdown).start())
+    print(f"[DAEMON] Listening on {socket_path} (pid {os.getpid()})", flush=True)
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        try:
+            socket_path.unlink()
+        except FileNotFoundError:
+            pass
+        print("[DAEMON] Stopped", flush=True)
+
+
+def main():
+    """CLI for the QA daemon"""
+    profile = qa_profiling.from_argv("qa-daemon")
+    options = dict(a[2:].split("=", 1) if "=" in a else (a[2:], "") for a in sys.argv[1:] if a.startswith("--"))
+    args = [a for a in sys.argv[1:] if not a.startswith("--")]
+    command = args[0] if args else "help"
+    socket_path = Path(options["socket"]) if options.get("socket") else client_module.default_socket_path()
+    
+    if command == "serve":
+        serve(socket_path)
+    
+    elif command == "start":
+        try:
+            status = client_module.call("ping", socket_path=socket_path)
+            print(f"[DAEMON] Already running (pid {status['pid']}) on {socket_path}")
+            return
+        except client_module.DaemonUnavailable:
+            pass
+        
+        log_file = client_module.REPO_ROOT / "docs" / "testing" / "autonomous-runs" / ".qa-daemon.log"
+        log_file.parent.mkdir(parents=True, exist_ok=True)
+        with open(log_file, "a") as log:
+            # --profile is passed on, so the report covers the daemon's lifetime
+            forwarded = []
+            if profile:
+                forwarded.append(f"--profile={Path(profile.output_dir).resolve()}" if profile.output_dir else "--profile")
+            subprocess.Popen([sys.executable, str(Path(__file__).resolve()), "serve", f"--socket={socket_path}"]
+                             + forwarded,
+                             stdout=log, stderr=subprocess.STDOUT, stdin=subprocess.DEVNULL,
+                             start_new_session=True)
+        
+        deadline = time.monotonic() + START_TIMEOUT
+        while time.monotonic() < deadline:
+            try:
+                status = client_module.call("ping", socket_path=socket_path)
+                print(f"[DAEMON] Started (pid {status['pid']}) on {socket_path}")
+                return
+            except client_module.DaemonUnavailable:
+                time.sleep(0.1)
+        print(f"[DAEMON] Did not start within {START_TIMEOUT}s, see {log_file}")
+        sys.exit(1)
+    
+    elif command == "stop":
+        try:
+            client_module.call("shutdown", socket_path=socket_path)
+            print("[DAEMON] Stopping")
+        except client_module.DaemonUnavailable:
+            print(f"[DAEMON] Not running ({socket_path})")
+    
+    elif command == "status":
+        try:
+            print(json.dumps(client_module.call("ping", socket_path=socket_path), indent=2))
+        except client_module.DaemonUnavailable:
+            print(f"[DAEMON] Not running ({socket_path})")
+            sys.exit(1)
+    
+    else:
+        print("Usage: qa-daemon.py <command> [--socket=<path>]")
+        print("Commands:")
+        print("  start   - Start the daemon in the background (log: autonomous-runs/.qa-daemon.log)")
+        print("  serve   - Run the daemon in the foreground")
+        print("  stop    - Ask a running daemon to exit")
+        print("  status  - Show pid, uptime and request count")
+        print("Options: --socket=<path>, --profile[=dir] (cProfile/tracemalloc report when the daemon exits)")
+        print("Environment: QA_DAEMON_SOCKET (default: per-checkout socket in $XDG_RUNTIME_DIR or /tmp),")
+        print("             QA_METRICS_PORT/QA_METRICS_HOST (serve Prometheus /metrics, default 127.0.0.1:9464)")
+        sys.exit(0 if command == "help" else 1)
+
+
+if __name__ == "__main__":
+    main()
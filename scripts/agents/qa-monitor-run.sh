@@ -56,16 +56,15 @@ if [ -n "$METADATA" ]; then
 fi
 
 # Check for test results
-RESULTS=$(find "$RUN_DIR" -name "test-results-*.json" | head -1)
+RESULTS=$(find "$RUN_DIR" -name "test-results-*.json*" | head -1)
 if [ -n "$RESULTS" ]; then
     echo ""
     echo "=== Test Results Summary ==="
-    python3 -c "
+    python3 "$SCRIPT_DIR/qa-storage.py" cat "$RESULTS" | python3 -c "
 import json
 import sys
 try:
-    with open('$RESULTS', 'r') as f:
-        data = json.load(f)
+    data = json.load(sys.stdin)
     results = data.get('results', {})
     summary = data.get('summary', {})
     print(f\"Total Tests: {results.get('total', 0)}\")
@@ -0,0 +1,458 @@
+#!/usr/bin/env python3
+"""
+Orchestrator for Autonomous Testing
+Runs the whole iterate loop (execute, parse, analyze, solve, fix, track) in one process
+"""
+
+import asyncio
+import contextlib
+import os
+import queue
+import resource
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Any, Iterator, Optional
+
+import qa_cache
+import qa_modules
+import qa_pipeline
+import qa_profiling
+import qa_telemetry
+import qa_tracing
+
+parser_module = qa_modules.load("qa-result-parser")
+analyzer_module = qa_modules.load("qa-problem-analyzer")
+finder_module = qa_modules.load("qa-solution-finder")
+fix_module = qa_modules.load("qa-auto-fix")
+tracker_module = qa_modules.load("qa-progress-tracker")
+storage_module = qa_modules.load("qa-storage")
+test_runner_module = qa_modules.load("qa-test-runner")
+shard_module = qa_modules.load("qa-shard-scheduler")
+
+SCRIPT_DIR = Path(__file__).resolve().parent
+RUNNER_TIMEOUT = 3600
+BUILD_FAILURE_MARKERS = ["BUILD FAILURE", "compilation", "cannot find symbol", "does not exist"]
+
+# Colors
+GREEN = "\033[0;32m"
+YELLOW = "\033[1;33m"
+BLUE = "\033[0;34m"
+RED = "\033[0;31m"
+NC = "\033[0m"
+
+
+def print_info(message: str):
+    print(f"{BLUE}[AUTONOMOUS]{NC} {message}", flush=True)
+
+
+def print_success(message: str):
+    print(f"{GREEN}[AUTONOMOUS]{NC} {message}", flush=True)
+
+
+def print_warn(message: str):
+    print(f"{YELLOW}[AUTONOMOUS]{NC} {message}", flush=True)
+
+
+def print_error(message: str):
+    print(f"{RED}[AUTONOMOUS]{NC} {message}", flush=True)
+
+
+def cpu_seconds() -> float:
+    """User + system CPU of this process and its finished children"""
+    total = 0.0
+    for who in (resource.RUSAGE_SELF, resource.RUSAGE_CHILDREN):
+        usage = resource.getrusage(who)
+        total += usage.ru_utime + usage.ru_stime
+    return total
+
+
+class Orchestrator:
+    """Drive test/fix iterations with every stage imported in-process"""
+    
+    def __init__(self, test_type: str = "all", confidence_threshold: float = 0.90, max_iterations: int = 10,
+                 budget_minutes: Optional[float] = None, cpu_budget_minutes: Optional[float] = None,
+                 fix_strategy: str = "service", run_id: str = None, checkpoints: bool = True,
+                 cache: bool = True, shards: Optional[int] = None, profile: bool = False):
+        self.repo_root = SCRIPT_DIR.parent.parent
+        self.test_type = test_type
+        self.confidence_threshold = confidence_threshold
+        self.max_iterations = max_iterations
+        self.budget_minutes = budget_minutes
+        self.fix_strategy = fix_strategy
+        self.shards = shards
+        self.profile = profile
+        
+        self.run_id = run_id or f"{datetime.now().strftime('%Y%m%d-%H%M%S')}-{os.getpid()}"
+        self.storage = storage_module.ResultStorage()
+        self.run_dir = self.storage.create_run_directory(self.run_id)
+        # Keeps background gc (this one or another orchestrator's) off the run while it is in progress
+        self._active = self.storage.mark_active(self.run_id)
+        
+        # Stage artifacts are written off the loop's critical path; --no-checkpoint skips them
+        self.checkpointer = qa_pipeline.Checkpointer(self.run_dir, enabled=checkpoints)
+        self.pipeline = qa_pipeline.Pipeline(
+            analyzer_module.ProblemAnalyzer(),
+            finder_module.SolutionFinder(str(self.repo_root)),
+            fix_module.AutoFixEngine(str(self.repo_root)),
+            self.checkpointer,
+            # Unchanged failures on an unchanged tree skip analysis/solving; --no-cache recomputes
+            qa_cache.StageCache(enabled=cache)
+        )
+        self.tracker = tracker_module.ProgressTracker(
+            max_iterations=max_iterations,
+            journal_path=str(self.run_dir / "progress-journal.jsonl"),
+            budget_seconds=budget_minutes * 60 if budget_minutes else None,
+            cpu_budget_seconds=cpu_budget_minutes * 60 if cpu_budget_minutes else None
+        )
+        self.progress_log = {"iterations": []}
+        self.iteration = 0
+        self.archived = set()
+        self.parser = None
+        self.results_dir = None
+        self._results_wait = 0.0
+        
+        # Latest artifacts, kept in memory for the final report
+        self.results = {"failures": []}
+        self.analysis = {"statistics": {}}
+        self.fixes = {"summary": {}}
+    
+    def _write(self, name: str, data: Any) -> Path:
+        """Write a run-level file synchronously as plain JSON"""
+        return storage_module.write_artifact(self.run_dir / name, data, "none")
+    
+    def _profiled(self, stage: str):
+        """cProfile/tracemalloc reports of ``stage`` in <run-dir>/profiles with --profile, else a no-op"""
+        if not self.profile:
+            return contextlib.nullcontext()
+        return qa_profiling.Profile(f"iter-{self.iteration}-{stage}", self.run_dir / "profiles")
+    
+    def _export_metrics(self):
+        """Prometheus textfile of this run so far (metrics.prom in the run directory)"""
+        try:
+            qa_telemetry.write_textfile(self.run_dir / "metrics.prom")
+        except OSError as e:
+            print_warn(f"Could not write metrics: {e}")
+    
+    def _flush_checkpoints(self):
+        for name, error in self.checkpointer.flush():
+            print_warn(f"Could not write checkpoint {name}: {error}")
+    
+    def run(self) -> int:
+        print_info("Starting autonomous test run")
+        print_info(f"Run ID: {self.run_id}")
+        print_info(f"Test Type: {self.test_type}")
+        print_info(f"Confidence Threshold: {self.confidence_threshold}")
+        print_info(f"Max Iterations: {self.max_iterations}")
+        if self.budget_minutes:
+            print_info(f"Budget: {self.budget_minutes} minutes")
+        metrics = qa_telemetry.serve()
+        if metrics:
+            print_info(f"Metrics on http://{metrics.server_address[0]}:{metrics.server_address[1]}/metrics")
+        
+        # Spans of this run: trace.jsonl, converted to trace.json (Chrome trace) when the run ends
+        qa_tracing.start(self.run_dir / "trace.jsonl")
+        try:
+            return self._loop()
+        finally:
+            qa_tracing.stop()
+    
+    def _loop(self) -> int:
+        """Iterate until done, the budget is spent or the first run fails; returns the exit code"""
+        # Compact runs expired by the retention policy (QA_RETENTION_KEEP_RUNS, _MAX_AGE_DAYS,
+        # _MAX_SIZE_MB) in the background; pinned runs and runs still in progress (mark_active) are never touched
+        with open(self.run_dir / "gc-report.json", "w") as gc_report:
+            subprocess.Popen([sys.executable, str(SCRIPT_DIR / "qa-storage.py"), "gc"],
+                             stdout=gc_report, stderr=subprocess.DEVNULL, start_new_session=True)
+        
+        while self.iteration < self.max_iterations:
+            self.iteration += 1
+            print_info(f"=== Iteration {self.iteration} ===")
+            with qa_tracing.span("iteration", iteration=self.iteration):
+                outcome = self._run_iteration()
+            self._export_metrics()
+            if outcome == "abort":
+                return 1
+            if outcome == "stop":
+                break
+            self._archive_iteration(self.iteration - 1)
+            time.sleep(2)  # Brief pause between iterations
+        
+        self._finish()
+        return 0
+    
+    def _run_iteration(self) -> str:
+        """Run one iteration; returns "continue", "stop" or "abort" """
+        cpu_start = cpu_seconds()
+        durations = {}
+        
+        # Steps 1-4: the test runner hands over each job's results as its container exits;
+        # failures stream from the parser through analysis and solution finding meanwhile
+        print_info("Step 1: Executing tests, parsing, analyzing and solving failures as results arrive...")
+        started = time.monotonic()
+        runner, thread, finished = self._execute_tests()
+        try:
+            # Failures of tests that pass on a later attempt (rerun or another shard) are dropped
+            # Parse, analyze and solve interleave per failure, so they are profiled together
+            # (minus the waits for container results, see _parse_failures)
+            with self._profiled("pipeline"):
+                analysis, solutions = self.pipeline.solve(self._parse_failures(runner, finished), self.iteration,
+                                                          lambda: self.parser.failures)
+            results = self._store_results()
+        except Exception as e:
+            print_error(f"Failed to process test results: {e}")
+            return "stop"
+        finally:
+            # The pipeline stops reading results on an error; stop the containers rather than wait for them
+            if thread.is_alive():
+                runner.cancel()
+            thread.join()
+        durations["run"] = round(time.monotonic() - started, 1)
+        # Time the parser spent waiting for containers is test time, not parse time
+        self.pipeline.durations["parse"] = max(0.0, self.pipeline.durations.get("parse", 0.0) - self._results_wait)
+        # The fix stage is observed by the fixer itself
+        qa_telemetry.STAGE_SECONDS.observe(durations["run"], stage="run")
+        for stage in ("parse", "analyze", "solve"):
+            qa_telemetry.STAGE_SECONDS.observe(self.pipeline.durations.get(stage, 0.0), stage=stage)
+        if runner.exit_code != 0 and self.iteration == 1:
+            print_error("Initial test execution failed")
+            return "abort"
+        
+        failures = results.get("failures", [])
+        total = results.get("results", {}).get("total", 0)
+        print_info(f"Failures found: {len(failures)}")
+        print_info(f"Total tests: {total}")
+        print_info(f"Status: {results.get('summary', {}).get('status', 'unknown')}")
+        
+        if not failures and total > 0:
+            print_success("All tests passed!")
+            return "stop"
+        if not failures:
+            print_warn("No tests ran and no build failures detected. Stopping.")
+            return "stop"
+        self.analysis = analysis
+        print_info(f"Solutions found: {len([s for s in solutions if s.get('suggestedFixes')])}")
+        
+        # Step 5: Apply fixes
+        print_info("Step 5: Applying fixes...")
+        try:
+            with self._profiled("fix"):
+                self.fixes = self.pipeline.fix(solutions, self.iteration, self.confidence_threshold,
+                                               self.fix_strategy)
+            self.storage.attach_fixes(self.run_id, self.iteration, self.fixes)
+        except Exception as e:
+            print_warn(f"Some fixes failed to apply: {e}")
+            self.fixes = {"summary": {"applied": 0}}
+        for stage, seconds in self.pipeline.durations.items():
+            durations[stage] = round(seconds, 1)
+        
+        # Track progress
+        progress_data = {
+            "stageDurations": durations,
+            "cpuSeconds": round(cpu_seconds() - cpu_start, 1),
+            "failureCount": len(failures),
+            "fixesApplied": self.fixes.get("summary", {}).get("applied", 0),
+            "failureIds": [f.get("id") for f in failures]
+        }
+        progress = self.tracker.add_iteration(progress_data)
+        self.checkpointer.write(f"progress-iter-{self.iteration}.json", progress)
+        
+        self.progress_log["iterations"].append(progress_data)
+        self._write("progress-log.json", self.progress_log)
+        
+        budget = progress["budget"]
+        message = f"Used {budget['wallUsedSeconds']}s"
+        if "wallRemainingSeconds" in budget:
+            message += f", {budget['wallRemainingSeconds']}s of budget remaining"
+        print_info(message + f", next iteration ~{budget['predictedNextSeconds']}s (ETA {budget['eta']})")
+        
+        if not progress["shouldContinue"]:
+            print_warn(f"Progress tracker indicates we should stop: {progress.get('stopReason')}")
+            return "stop"
+        return "continue"
+    
+    def _execute_tests(self) -> tuple:
+        """Start the test runner on a background thread; returns (runner, thread, queue of results directories)
+        
+        The queue receives each job's results directory as it is pulled from
+        its container, then None once the run is over.
+        """
+        finished = queue.Queue()
+        if self.shards and self.test_type in ("unit", "all"):
+            # Unit test classes split into shards balanced on their history (--shards=N)
+            runner = shard_module.ShardRunner(str(self.run_dir), self.test_type, RUNNER_TIMEOUT, self.shards,
+                                              memory=shard_module.parse_memory(os.environ.get("QA_SHARD_MEMORY")),
+                                              on_results=finished.put, storage=self.storage)
+        else:
+            runner = test_runner_module.TestRunner(str(self.run_dir), self.test_type, RUNNER_TIMEOUT,
+                                                   on_results=finished.put)
+        
+        def run():
+            try:
+                with qa_tracing.span("run", runner=type(runner).__name__):
+                    runner.exit_code = asyncio.run(runner.run())
+            except Exception as e:
+                print_error(f"Test runner failed: {e}")
+                runner.exit_code = 1
+            finally:
+                finished.put(None)
+        
+        runner.exit_code = None
+        thread = threading.Thread(target=qa_tracing.in_context(run), name="test-runner", daemon=True)
+        thread.start()
+        return runner, thread, finished
+    
+    def _parse_failures(self, runner, finished: queue.Queue) -> Iterator[Dict[str, Any]]:
+        """Yield failures from each job's results as the runner hands them over"""
+        self.results_dir = runner.results_dir
+        self.parser = parser_module.TestResultParser(str(self.results_dir))
+        self._results_wait = 0.0
+        while True:
+            started = time.monotonic()
+            # Waiting for containers is test time: keep it out of the "pipeline" CPU profile
+            with qa_tracing.span("wait-for-results"), qa_profiling.paused():
+                directory = finished.get()
+            self._results_wait += time.monotonic() - started
+            if directory is None:
+                break
+            yield from self.parser.parse_reports(directory)
+        # Compilation errors are only known from the complete execution log
+        yield from self.parser.parse_execution_log()
+        parsed = self.parser.document()
+        
+        # Build failures that did not produce reports are only in the execution log
+        execution_log = runner.execution_log
+        if parsed["results"]["total"] == 0 and not parsed["failures"] and execution_log.exists():
+            log_text = execution_log.read_text(errors="ignore")
+            if any(marker in log_text for marker in BUILD_FAILURE_MARKERS):
+                print_warn("Build failures detected but not parsed. Re-parsing execution log...")
+                self.parser = parser_module.TestResultParser(str(runner.run_dir))
+                yield from self.parser.iter_failures()
+                parsed = self.parser.document()
+                print_info(f"After re-parsing: Failures: {len(parsed['failures'])}, Total: {parsed['results']['total']}")
+    
+    def _store_results(self) -> Dict[str, Any]:
+        """Checkpoint test-results-iter-N.json for the drained parser and index it"""
+        parsed = self.parser.document()
+        self.results = {
+            "testRun": {
+                "timestamp": datetime.utcnow().isoformat() + "Z",
+                "type": self.test_type,
+                "resultsDirectory": str(self.results_dir),
+                "parserVersion": "1.0.0"
+            },
+            "results": parsed["results"],
+            "failures": parsed["failures"],
+            "tests": parsed.get("tests", []),
+            "summary": parsed["summary"]
+        }
+        self.checkpointer.write(f"test-results-iter-{self.iteration}.json", self.results)
+        self.storage.index_results(self.run_id, self.results, self.iteration)
+        return self.results
+    
+    def _archive_iteration(self, iteration: int):
+        """Dedup and compress an iteration the loop no longer reads"""
+        if iteration < 1 or iteration in self.archived:
+            return
+        self.archived.add(iteration)
+        self._flush_checkpoints()
+        try:
+            self.storage.dedup_iteration(self.run_id, iteration)
+            for kind in ("solutions", "fixes", "progress"):
+                storage_module.compress_artifact(self.run_dir / f"{kind}-iter-{iteration}.json")
+        except (OSError, ValueError, KeyError, RuntimeError) as e:
+            print_warn(f"Could not archive iteration {iteration}: {e}")
+    
+    def _report(self) -> str:
+        results, fixes = self.results, self.fixes
+        return f"""# Autonomous Test Run Report
+
+**Run ID**: {self.run_id}
+**Test Type**: {self.test_type}
+**Iterations**: {self.iteration}
+**Date**: {datetime.utcnow().strftime('%Y-%m-%dT%H:%M:%SZ')}
+
+## Summary
+
+- **Total Failures**: {len(results.get('failures', []))}
+- **Fixes Applied**: {fixes.get('summary', {}).get('applied', 0)}
+- **Fixes Skipped**: {fixes.get('summary', {}).get('skipped', 0)}
+- **Pass Rate**: {results.get('summary', {}).get('passRate', 0)}%
+
+## Failures
+
+{len(results.get('failures', []))} test failures identified.
+
+## Fixes Applied
+
+{fixes.get('summary', {}).get('applied', 0)} fixes were automatically applied.
+
+## Next Steps
+
+Review the fixes and test results in this directory.
+"""
+    
+    def _finish(self):
+        print_info("Generating final report...")
+        report_file = self.storage.store_report(self.run_id, self._report())
+        
+        if self.fixes.get("summary", {}).get("applied", 0) > 0:
+            print_info("Creating PR for applied fixes...")
+            result = subprocess.run([str(SCRIPT_DIR / "qa-create-pr.sh"), self.run_id, str(report_file)])
+            if result.returncode != 0:
+                print_warn("PR creation failed or skipped")
+        
+        for name, error in self.checkpointer.close():
+            print_warn(f"Could not write checkpoint {name}: {error}")
+        
+        # Dedup/compress remaining iteration artifacts (read back with: qa-storage.py cat <file>)
+        for iteration in range(1, self.iteration + 1):
+            self._archive_iteration(iteration)
+        for path in sorted(self.run_dir.glob("*-iter-*.json")):
+            storage_module.compress_artifact(path)
+        
+        print_success("Autonomous test run complete")
+        print_info(f"Results in: {self.run_dir}")
+        print_info(f"Run ID: {self.run_id}")
+
+
+def main():
+    """CLI for the orchestrator (same arguments as qa-autonomous.sh)"""
+    qa_telemetry.export_at_exit("qa-orchestrator")
+    options = dict(a[2:].split("=", 1) if "=" in a else (a[2:], "") for a in sys.argv[1:] if a.startswith("--"))
+    args = [a for a in sys.argv[1:] if not a.startswith("--")]
+    
+    if "help" in options:
+        print("Usage: qa-orchestrator.py [test-type] [confidence-threshold] [max-iterations] [budget-minutes]")
+        print("       [--strategy=service|bisect] [--run-id=<id>] [--no-checkpoint] [--no-cache] [--shards=N]")
+        print("       [--profile]  (per-stage cProfile/tracemalloc reports in <run-dir>/profiles)")
+        print("Environment: QA_BUDGET_MINUTES, QA_CPU_BUDGET_MINUTES, QA_RETENTION_*, QA_TEST_PARALLEL,")
+        print("             QA_SHARD_MEMORY, QA_METRICS_PORT/QA_METRICS_HOST (serve /metrics, default 127.0.0.1:9464),")
+        print("             QA_METRICS_TEXTFILE_DIR,")
+        print("             QA_TRACE_DIR (span traces of the stage CLIs; runs always write trace.jsonl/trace.json)")
+        sys.exit(0)
+    
+    budget = args[3] if len(args) > 3 else os.environ.get("QA_BUDGET_MINUTES")
+    cpu_budget = os.environ.get("QA_CPU_BUDGET_MINUTES")
+    
+    orchestrator = Orchestrator(
+        test_type=args[0] if len(args) > 0 else "all",
+        confidence_threshold=float(args[1]) if len(args) > 1 else 0.90,
+        max_iterations=int(args[2]) if len(args) > 2 else 10,
+        budget_minutes=float(budget) if budget else None,
+        cpu_budget_minutes=float(cpu_budget) if cpu_budget else None,
+        fix_strategy=options.get("strategy") or "service",
+        run_id=options.get("run-id") or None,
+        checkpoints="no-checkpoint" not in options,
+        cache="no-cache" not in options,
+        shards=int(options["shards"]) if options.get("shards") else None,
+        profile="profile" in options
+    )
+    sys.exit(orchestrator.run())
+
+
+if __name__ == "__main__":
+    main()
@@ -7,9 +7,14 @@ Analyzes test failures, categorizes issues, and calculates confidence scores
 import json
 import sys
 import re
-from typing import Dict, List, Any
+from typing import Dict, Iterable, Iterator, List, Any
 from pathlib import Path
 
+import qa_cache
+import qa_profiling
+import qa_telemetry
+import qa_tracing
+
 class ProblemAnalyzer:
     """Analyze test failures and categorize problems"""
     
@@ -51,14 +56,20 @@ class ProblemAnalyzer:
         """Analyze all failures"""
         print(f"[ANALYZER] Analyzing {len(failures)} failures...")
         
-        analyzed_failures = []
+        with qa_telemetry.timed("analyze"):
+            return self.summarize(list(self.iter_analyze(failures)))
+    
+    def iter_analyze(self, failures: Iterable[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+        """Analyze failures one at a time as they arrive"""
+        for failure in failures:
+            yield self._analyze_failure(failure)
+    
+    def summarize(self, analyzed_failures: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Build the analysis document from already analyzed failures"""
         category_counts = {}
         confidence_scores = []
         
-        for failure in failures:
-            analyzed = self._analyze_failure(failure)
-            analyzed_failures.append(analyzed)
-            
+        for analyzed in analyzed_failures:
             # Count categories
             category = analyzed["category"]
             category_counts[category] = category_counts.get(category, 0) + 1
@@ -259,12 +270,16 @@ class ProblemAnalyzer:
 
 def main():
     """CLI for problem analyzer"""
-    if len(sys.argv) < 2:
-        print("Usage: qa-problem-analyzer.py <test-results.json> [output-file]")
+    qa_telemetry.export_at_exit("qa-problem-analyzer")
+    qa_tracing.trace_at_exit("qa-problem-analyzer")
+    qa_profiling.from_argv("qa-problem-analyzer")
+    args = [a for a in sys.argv[1:] if a != "--no-cache"]
+    if len(args) < 1:
+        print("Usage: qa-problem-analyzer.py <test-results.json> [output-file] [--no-cache] [--profile[=dir]]")
         sys.exit(1)
     
-    input_file = sys.argv[1]
-    output_file = sys.argv[2] if len(sys.argv) > 2 else None
+    input_file = args[0]
+    output_file = args[1] if len(args) > 1 else None
     
     # Load test results
     with open(input_file, 'r') as f:
@@ -278,7 +293,9 @@ def main():
     
     # Analyze
     analyzer = ProblemAnalyzer()
-    analysis = analyzer.analyze(failures)
+    cache = qa_cache.StageCache(enabled="--no-cache" not in sys.argv)
+    analysis = cache.run("analyze", qa_cache.code_version(analyzer), failures, analyzer.analyze)
+    qa_telemetry.observe_analysis(analysis)
     
     # Output
     json_output = json.dumps(analysis, indent=2)
@@ -4,22 +4,272 @@ Progress Tracker for Autonomous Testing
 Tracks fix attempts and detects no-progress scenarios
 """
 
+import hashlib
 import json
+import os
 import sys
 from typing import Dict, List, Any
-from datetime import datetime
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import qa_profiling
+import qa_telemetry
+import qa_tracing
+
+# Stages an iteration's "stageDurations" may report; only these are estimated
+STAGES = ["run", "parse", "analyze", "solve", "fix"]
+ESTIMATE_ALPHA = 0.5  # weight of the latest iteration in stage-time estimates
+SEEN_SETS_LIMIT = 20  # most recent failure sets remembered for oscillation detection
+SUMMARY_INTERVAL = 10  # iterations between summary checkpoints
 
 class ProgressTracker:
-    """Track progress of test fixes"""
+    """Track progress of test fixes
+    
+    With a journal path, every iteration is appended as one JSON line to an
+    append-only journal. A small summary file next to it is checkpointed every
+    SUMMARY_INTERVAL iterations (and when the tracker says stop); loading
+    replays only the journal lines after the checkpoint, so adding an iteration
+    or reading the summary costs the same however long the run gets. Only the
+    last few iterations are kept in self.iterations.
+    
+    When iterations carry "failureIds", the previous failure set is kept as a set
+    of 64-bit hashes so each iteration reports fixed, new and persisting failures,
+    detects oscillation with the last SEEN_SETS_LIMIT failure sets and stops once
+    the persisting set stays the same.
     
-    def __init__(self, max_iterations: int = 10, no_progress_threshold: int = 3):
+    Iterations may report "stageDurations" (seconds per stage) and "cpuSeconds".
+    With a wall-clock or CPU budget, the cost of the next iteration is predicted
+    from an exponentially weighted average of past stage times and an iteration
+    that would overrun the budget is not started.
+    """
+    
+    def __init__(self, max_iterations: int = 10, no_progress_threshold: int = 3, journal_path: str = None,
+                 budget_seconds: float = None, cpu_budget_seconds: float = None):
         self.max_iterations = max_iterations
         self.no_progress_threshold = no_progress_threshold
+        self.budget_seconds = budget_seconds
+        self.cpu_budget_seconds = cpu_budget_seconds
+        self.stop_reason = None
+        # Recent iterations needed for progress checks (bounded window)
         self.iterations = []
+        self.window = max(no_progress_threshold, 2)
+        self.state = self._empty_state()
+        
+        self.journal_path = Path(journal_path) if journal_path else None
+        if self.journal_path:
+            self.summary_path = self.journal_path.with_name(self.journal_path.name + ".summary.json")
+            self._load_journal()
+    
+    @staticmethod
+    def _empty_state() -> Dict[str, Any]:
+        return {
+            "count": 0,
+            "initialFailures": 0,
+            "improvements": 0,
+            "regressions": 0,
+            "noChanges": 0,
+            "journalBytes": 0,
+            # Failure-set tracking (only used when iterations carry failureIds)
+            "failureHashes": None,
+            "persistingFingerprint": None,
+            "persistingStable": 0,
+            "seenSets": {},
+            "totalFixed": 0,
+            "totalNew": 0,
+            "oscillations": 0,
+            "lastSetChange": None,
+            # Time accounting
+            "wallSeconds": 0.0,
+            "cpuSeconds": 0.0,
+            "stageEstimates": {},
+            "cpuEstimate": None
+        }
+    
+    @staticmethod
+    def _hash_id(failure_id: str) -> int:
+        """Compact 64-bit hash of a failure ID"""
+        return int.from_bytes(hashlib.blake2b(str(failure_id).encode(), digest_size=8).digest(), "big")
+    
+    @staticmethod
+    def _fingerprint(hashes) -> str:
+        """Order-independent fingerprint of a set of failure hashes"""
+        digest = hashlib.blake2b(digest_size=16)
+        for h in sorted(hashes):
+            digest.update(h.to_bytes(8, "big"))
+        return digest.hexdigest()
+    
+    def _load_journal(self):
+        """Load summary state, replaying any journal lines it has not seen yet"""
+        if self.summary_path.exists():
+            try:
+                with open(self.summary_path, 'r') as f:
+                    data = json.load(f)
+                self.state = data["state"]
+                self.iterations = data["recent"]
+            except (OSError, ValueError, KeyError):
+                self.state = self._empty_state()
+                self.iterations = []
+        
+        if not self.journal_path.exists():
+            return
+        
+        size = self.journal_path.stat().st_size
+        if size < self.state["journalBytes"]:
+            # Journal was replaced - rebuild from scratch
+            self.state = self._empty_state()
+            self.iterations = []
+        if size == self.state["journalBytes"]:
+            return
+        
+        # Summary is behind (missing or crashed before update) - replay the tail only
+        with open(self.journal_path, 'rb') as f:
+            f.seek(self.state["journalBytes"])
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break  # Partial write, ignore
+                self.state["journalBytes"] += len(line)
+                if line.strip():
+                    self._record(json.loads(line))
+    
+    def _save_summary(self):
+        """Atomically rewrite the (bounded size) summary file"""
+        tmp_path = self.summary_path.with_name(self.summary_path.name + ".tmp")
+        with open(tmp_path, 'w') as f:
+            json.dump({"state": self.state, "recent": self.iterations}, f)
+        os.replace(tmp_path, self.summary_path)
+    
+    def _record(self, iteration: Dict[str, Any]):
+        """Fold one iteration into the running summary"""
+        failures = iteration.get("failureCount", 0)
+        if self.state["count"] == 0:
+            self.state["initialFailures"] = failures
+        elif self.iterations:
+            previous = self.iterations[-1].get("failureCount", 0)
+            if failures < previous:
+                self.state["improvements"] += 1
+            elif failures > previous:
+                self.state["regressions"] += 1
+            else:
+                self.state["noChanges"] += 1
+        
+        self.state["count"] += 1
+        self._record_durations(iteration)
+        if "failureIds" in iteration:
+            self._record_failure_set(iteration)
+        else:
+            self.state["lastSetChange"] = None
+        self.iterations.append(iteration)
+        del self.iterations[:-self.window]
+    
+    def _record_durations(self, iteration: Dict[str, Any]):
+        """Accumulate used time and update per-stage estimates"""
+        stages = iteration.get("stageDurations") or {}
+        wall = iteration.get("durationSeconds", sum(stages.values()))
+        self.state["wallSeconds"] += wall
+        
+        estimates = self.state["stageEstimates"]
+        for stage, seconds in stages.items():
+            if stage not in STAGES:
+                # A misspelled stage would add an estimate that never updates again
+                print(f"[PROGRESS TRACKER] Ignoring unknown stage in stageDurations: {stage}", file=sys.stderr)
+                continue
+            previous = estimates.get(stage)
+            estimates[stage] = seconds if previous is None else (
+                ESTIMATE_ALPHA * seconds + (1 - ESTIMATE_ALPHA) * previous)
+        
+        cpu = iteration.get("cpuSeconds")
+        if cpu is not None:
+            self.state["cpuSeconds"] += cpu
+            previous = self.state["cpuEstimate"]
+            self.state["cpuEstimate"] = cpu if previous is None else (
+                ESTIMATE_ALPHA * cpu + (1 - ESTIMATE_ALPHA) * previous)
+    
+    def get_budget_status(self) -> Dict[str, Any]:
+        """Used and remaining budget plus the predicted cost of the next iteration"""
+        predicted = sum(self.state["stageEstimates"].values())
+        status = {
+            "wallUsedSeconds": round(self.state["wallSeconds"], 1),
+            "predictedNextSeconds": round(predicted, 1),
+            "predictedStages": {k: round(v, 1) for k, v in self.state["stageEstimates"].items()},
+            "eta": (datetime.utcnow() + timedelta(seconds=predicted)).isoformat() + "Z"
+        }
+        if self.budget_seconds is not None:
+            status["wallLimitSeconds"] = self.budget_seconds
+            status["wallRemainingSeconds"] = round(self.budget_seconds - self.state["wallSeconds"], 1)
+        if self.cpu_budget_seconds is not None:
+            status["cpuUsedSeconds"] = round(self.state["cpuSeconds"], 1)
+            status["cpuLimitSeconds"] = self.cpu_budget_seconds
+            status["cpuRemainingSeconds"] = round(self.cpu_budget_seconds - self.state["cpuSeconds"], 1)
+            status["predictedNextCpuSeconds"] = round(self.state["cpuEstimate"] or 0.0, 1)
+        return status
+    
+    def _within_budget(self) -> bool:
+        """Check the next iteration is predicted to fit in the remaining budget"""
+        budget = self.get_budget_status()
+        if "wallRemainingSeconds" in budget and budget["predictedNextSeconds"] > budget["wallRemainingSeconds"]:
+            self.stop_reason = (f"Next iteration predicted at {budget['predictedNextSeconds']}s "
+                                f"but only {budget['wallRemainingSeconds']}s of wall-clock budget left")
+            return False
+        if "cpuRemainingSeconds" in budget and budget["predictedNextCpuSeconds"] > budget["cpuRemainingSeconds"]:
+            self.stop_reason = (f"Next iteration predicted at {budget['predictedNextCpuSeconds']} CPU-seconds "
+                                f"but only {budget['cpuRemainingSeconds']} CPU-seconds of budget left")
+            return False
+        return True
+    
+    def _record_failure_set(self, iteration: Dict[str, Any]):
+        """Compare this iteration's failure set with the previous one"""
+        current_ids = iteration.get("failureIds") or []
+        current = {self._hash_id(fid) for fid in current_ids}
+        fingerprint = self._fingerprint(current)
+        previous_hashes = self.state["failureHashes"]
+        
+        change = {"fixed": 0, "new": len(current), "persisting": 0, "oscillating": False}
+        if previous_hashes is not None:
+            previous = set(previous_hashes)
+            fixed = previous - current
+            new = current - previous
+            persisting = current & previous
+            change = {
+                "fixed": len(fixed),
+                "new": len(new),
+                "persisting": len(persisting),
+                "newIds": [fid for fid in current_ids if self._hash_id(fid) in new],
+                "oscillating": False
+            }
+            # IDs of fixed failures are only known while the previous iteration is in the window
+            if self.iterations and "failureIds" in self.iterations[-1]:
+                change["fixedIds"] = [fid for fid in self.iterations[-1]["failureIds"] if self._hash_id(fid) in fixed]
+            
+            self.state["totalFixed"] += len(fixed)
+            self.state["totalNew"] += len(new)
+            
+            persisting_fingerprint = self._fingerprint(persisting)
+            if persisting and persisting_fingerprint == self.state["persistingFingerprint"]:
+                self.state["persistingStable"] += 1
+            else:
+                self.state["persistingStable"] = 1 if persisting else 0
+            self.state["persistingFingerprint"] = persisting_fingerprint
+            
+            # Same set as a non-adjacent earlier iteration means fixes are cycling
+            seen_at = self.state["seenSets"].get(fingerprint)
+            if current and fingerprint != self._fingerprint(previous) and seen_at is not None:
+                change["oscillating"] = True
+                change["cycleWith"] = seen_at
+                self.state["oscillations"] += 1
+        
+        # Most recent sighting last, so the oldest set is dropped first
+        seen = self.state["seenSets"]
+        seen.pop(fingerprint, None)
+        seen[fingerprint] = self.state["count"]
+        while len(seen) > SEEN_SETS_LIMIT:
+            del seen[next(iter(seen))]
+        self.state["failureHashes"] = sorted(current)
+        change["persistingStable"] = self.state["persistingStable"]
+        self.state["lastSetChange"] = change
     
     def add_iteration(self, iteration_data: Dict[str, Any]) -> Dict[str, Any]:
         """Add an iteration and check progress"""
-        iteration_num = len(self.iterations) + 1
+        iteration_num = self.state["count"] + 1
         
         iteration = {
             "iteration": iteration_num,
@@ -27,16 +277,41 @@ class ProgressTracker:
             **iteration_data
         }
         
-        self.iterations.append(iteration)
+        if self.journal_path:
+            line = (json.dumps(iteration) + "\n").encode()
+            self.journal_path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.journal_path, 'ab') as f:
+                f.write(line)
+            self.state["journalBytes"] += len(line)
+        
+        self._record(iteration)
         
         # Check progress
         progress_status = self._check_progress()
+        should_continue = self._should_continue(progress_status)
         
-        return {
+        if self.journal_path and (not should_continue or self.state["count"] % SUMMARY_INTERVAL == 0):
+            self._save_summary()
+        
+        result = {
             "iteration": iteration,
             "progress": progress_status,
-            "shouldContinue": self._should_continue(progress_status)
+            "shouldContinue": should_continue,
+            "budget": self.get_budget_status()
         }
+        qa_telemetry.ITERATIONS.inc()
+        qa_telemetry.ITERATION.set(iteration_num)
+        qa_telemetry.ITERATION_FAILURES.set(iteration.get("failureCount", 0))
+        if "wallRemainingSeconds" in result["budget"]:
+            qa_telemetry.BUDGET_REMAINING.set(result["budget"]["wallRemainingSeconds"])
+        if not should_continue:
+            result["stopReason"] = self.stop_reason
+        return result
+    
+    def load_iterations(self, iterations: List[Dict[str, Any]]):
+        """Replay iterations from an existing progress log"""
+        for iteration in iterations:
+            self._record(iteration)
     
     def _check_progress(self) -> Dict[str, Any]:
         """Check if progress is being made"""
@@ -51,33 +326,65 @@ class ProgressTracker:
         
         current_failures = current.get("failureCount", 0)
         previous_failures = previous.get("failureCount", 0)
+        change = self.state["lastSetChange"]
         
         if current_failures < previous_failures:
-            return {
+            status = {
                 "status": "improving",
                 "message": f"Failures decreased from {previous_failures} to {current_failures}",
                 "improvement": previous_failures - current_failures
             }
         elif current_failures > previous_failures:
-            return {
+            status = {
                 "status": "regressing",
                 "message": f"Failures increased from {previous_failures} to {current_failures}",
                 "regression": current_failures - previous_failures
             }
+        elif change and change["new"]:
+            status = {
+                "status": "churning",
+                "message": f"Failures unchanged at {current_failures} but {change['fixed']} fixed and {change['new']} new"
+            }
         else:
-            return {
+            status = {
                 "status": "no_change",
                 "message": f"Failures unchanged at {current_failures}"
             }
+        
+        if change:
+            status["failureSet"] = change
+            if change["oscillating"]:
+                status["message"] += f" - failure set repeats iteration {change['cycleWith']} (oscillating fixes)"
+        
+        return status
     
     def _should_continue(self, progress_status: Dict[str, Any]) -> bool:
         """Determine if iteration should continue"""
         # Check max iterations
-        if len(self.iterations) >= self.max_iterations:
+        if self.state["count"] >= self.max_iterations:
+            self.stop_reason = f"Reached max iterations ({self.max_iterations})"
+            return False
+        
+        # Check time and CPU budget
+        if not self._within_budget():
             return False
         
         # Check no-progress threshold
-        if len(self.iterations) < self.no_progress_threshold:
+        if self.state["count"] < self.no_progress_threshold:
+            return True
+        
+        change = self.state["lastSetChange"]
+        if change:
+            # Failure sets known: judge progress on which failures remain, not how many
+            if change["oscillating"]:
+                self.stop_reason = "Fixes are oscillating between failure sets"
+                return False
+            if change["persistingStable"] >= self.no_progress_threshold - 1:
+                self.stop_reason = f"Same {change['persisting']} failures persisted for {self.no_progress_threshold} iterations"
+                return False
+            if progress_status.get("status") == "regressing":
+                self.stop_reason = "Failures are regressing"
+                return False
             return True
         
         # Check last N iterations for no progress
@@ -86,91 +393,102 @@ class ProgressTracker:
         
         # If all recent iterations have same failure count, stop
         if len(set(failure_counts)) == 1 and failure_counts[0] > 0:
+            self.stop_reason = f"Failure count unchanged for {self.no_progress_threshold} iterations"
             return False
         
         # If regressing, stop
         if progress_status.get("status") == "regressing":
+            self.stop_reason = "Failures are regressing"
             return False
         
         return True
     
     def get_summary(self) -> Dict[str, Any]:
         """Get progress summary"""
-        if not self.iterations:
+        if not self.state["count"]:
             return {
                 "iterations": 0,
                 "status": "no_iterations"
             }
         
-        initial_failures = self.iterations[0].get("failureCount", 0)
+        initial_failures = self.state["initialFailures"]
         current_failures = self.iterations[-1].get("failureCount", 0)
         improvement = initial_failures - current_failures
         
-        # Count improvements
-        improvements = 0
-        regressions = 0
-        no_changes = 0
-        
-        for i in range(1, len(self.iterations)):
-            prev = self.iterations[i-1].get("failureCount", 0)
-            curr = self.iterations[i].get("failureCount", 0)
-            if curr < prev:
-                improvements += 1
-            elif curr > prev:
-                regressions += 1
-            else:
-                no_changes += 1
-        
         return {
-            "iterations": len(self.iterations),
+            "iterations": self.state["count"],
             "initialFailures": initial_failures,
             "currentFailures": current_failures,
             "totalImprovement": improvement,
             "improvementRate": round(improvement / initial_failures * 100, 2) if initial_failures > 0 else 0,
-            "improvements": improvements,
-            "regressions": regressions,
-            "noChanges": no_changes,
+            "improvements": self.state["improvements"],
+            "regressions": self.state["regressions"],
+            "noChanges": self.state["noChanges"],
+            "fixedFailures": self.state["totalFixed"],
+            "newFailures": self.state["totalNew"],
+            "oscillations": self.state["oscillations"],
+            "budget": self.get_budget_status(),
             "status": "success" if current_failures == 0 else "in_progress" if improvement > 0 else "stalled"
         }
 
 
 def main():
     """CLI for progress tracker"""
-    if len(sys.argv) < 2:
-        print("Usage: qa-progress-tracker.py <command> [args...]")
+    qa_telemetry.export_at_exit("qa-progress-tracker")
+    qa_tracing.trace_at_exit("qa-progress-tracker")
+    qa_profiling.from_argv("qa-progress-tracker")
+    # Split --options from positional arguments
+    options = dict(a[2:].split("=", 1) if "=" in a else (a[2:], "") for a in sys.argv[1:] if a.startswith("--"))
+    args = [a for a in sys.argv[1:] if not a.startswith("--")]
+    
+    if len(args) < 1:
+        print("Usage: qa-progress-tracker.py <command> [args...] [--journal=<file>] [--max-iterations=N]")
+        print("       [--budget-minutes=N] [--cpu-budget-minutes=N] [--profile[=dir]]")
         print("Commands:")
         print("  add <iteration-data.json> - Add iteration")
-        print("  summary - Show summary")
+        print("  summary [progress-log.json] - Show summary")
         sys.exit(1)
     
-    command = sys.argv[1]
-    tracker = ProgressTracker()
+    command = args[0]
+    tracker = ProgressTracker(
+        max_iterations=int(options.get("max-iterations") or 10),
+        journal_path=options.get("journal") or None,
+        budget_seconds=float(options["budget-minutes"]) * 60 if options.get("budget-minutes") else None,
+        cpu_budget_seconds=float(options["cpu-budget-minutes"]) * 60 if options.get("cpu-budget-minutes") else None
+    )
     
     if command == "add":
-        if len(sys.argv) < 3:
-            print("Usage: qa-progress-tracker.py add <iteration-data.json>")
+        if len(args) < 2:
+            print("Usage: qa-progress-tracker.py add <iteration-data.json> [--journal=<file>]")
             sys.exit(1)
         
         # Support reading from stdin if '-' is provided
-        if sys.argv[2] == "-":
+        if args[1] == "-":
             iteration_data = json.load(sys.stdin)
         else:
-            with open(sys.argv[2], 'r') as f:
+            with open(args[1], 'r') as f:
                 iteration_data = json.load(f)
         
         result = tracker.add_iteration(iteration_data)
         print(json.dumps(result, indent=2))
         
+        budget = result["budget"]
+        message = f"[PROGRESS TRACKER] Used {budget['wallUsedSeconds']}s"
+        if "wallRemainingSeconds" in budget:
+            message += f", {budget['wallRemainingSeconds']}s of budget remaining"
+        message += f", next iteration ~{budget['predictedNextSeconds']}s (ETA {budget['eta']})"
+        print(message, file=sys.stderr)
+        
         if not result["shouldContinue"]:
-            print("\n[PROGRESS TRACKER] Should stop iteration")
+            print(f"\n[PROGRESS TRACKER] Should stop iteration: {result['stopReason']}", file=sys.stderr)
             sys.exit(2)  # Exit with code 2 to signal stop
     
     elif command == "summary":
         # Load existing iterations if available
-        if len(sys.argv) > 2:
-            with open(sys.argv[2], 'r') as f:
+        if len(args) > 1:
+            with open(args[1], 'r') as f:
                 data = json.load(f)
-                tracker.iterations = data.get("iterations", [])
+                tracker.load_iterations(data.get("iterations", []))
         
         summary = tracker.get_summary()
         print(json.dumps(summary, indent=2))
@@ -182,4 +500,3 @@ def main():
 
 if __name__ == "__main__":
     main()
-
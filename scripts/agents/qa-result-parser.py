@@ -10,9 +10,13 @@ import os
 import sys
 from pathlib import Path
 from datetime import datetime
-from typing import Dict, List, Any, Optional
+from typing import Dict, Iterator, List, Any, Optional
 import re
 
+import qa_profiling
+import qa_telemetry
+import qa_tracing
+
 class TestResultParser:
     """Parse test results from various formats"""
     
@@ -21,99 +25,232 @@ class TestResultParser:
         # If results_dir is actually a file path, use its parent
         if self.results_dir.is_file():
             self.results_dir = self.results_dir.parent
-        self.failures = []
+        # Failures of tests whose final status is failed/error, by test key
+        self._failures = {}
+        # Every executed test with status and duration (seconds), for history
+        self.tests = []
+        # Final outcome per (service, class, method): Surefire reruns, Playwright
+        # retries and the same report in two results directories are attempts
+        # of one test, reconciled into passed, failed, error, flaky or skipped
+        self._outcomes = {}
+        # Keys of failures added since the last report file was yielded
+        self._found = []
         self.results = {
             "total": 0,
             "passed": 0,
             "failed": 0,
             "skipped": 0,
-            "errors": 0
+            "errors": 0,
+            "flaky": 0
         }
+        # Set when the results directory cannot be parsed (no_results/error)
+        self.status = None
+    
+    @property
+    def failures(self) -> List[Dict[str, Any]]:
+        """Failures of tests that did not pass on any attempt, in the order found"""
+        return list(self._failures.values())
     
     def parse(self) -> Dict[str, Any]:
         """Parse all test results in the directory"""
+        with qa_telemetry.timed("parse"):
+            for _ in self.iter_failures():
+                pass
+            return self.document()
+    
+    def iter_failures(self) -> Iterator[Dict[str, Any]]:
+        """Parse results file by file, yielding failures as they are found.
+        
+        Once exhausted, document() returns the same result as parse().
+        """
         # Validate results directory exists
         if not self.results_dir.exists():
             print(f"[PARSER] Warning: Results directory does not exist: {self.results_dir}", file=sys.stderr)
-            return {
-                "results": {"total": 0, "passed": 0, "failed": 0, "skipped": 0, "errors": 0},
-                "failures": [],
-                "summary": {"passRate": 0.0, "failureRate": 0.0, "status": "no_results"}
-            }
+            self.status = "no_results"
+            return
         
         # Try to parse execution log for compilation errors if no test results found
-        execution_log = self.results_dir.parent / "execution.log"
-        if execution_log.exists():
-            compilation_errors = self._parse_compilation_errors(execution_log)
-            if compilation_errors:
-                print(f"[PARSER] Found {len(compilation_errors)} compilation errors in execution log")
-                for i, error in enumerate(compilation_errors):
-                    file_path = error.get("file", "")
-                    service = error.get("service", "unknown")
-                    self.failures.append({
-                        "id": f"compilation-{service}-{i}",
-                        "testName": file_path.split("/")[-1] if file_path else "compilation",
-                        "className": service,
-                        "errorType": "CompilationError",
-                        "errorMessage": error.get("message", ""),
-                        "stackTrace": error.get("details", ""),
-                        "category": "compilation",
-                        "confidence": 0.95,
-                        "sourceFile": error.get("sourceFile", file_path),
-                        "service": service,
-                        "file": file_path,
-                        "details": error.get("details", "")
-                    })
-                self.results["errors"] = len(compilation_errors)
-                self.results["failed"] = len(compilation_errors)
+        compilation_failures = self._compilation_failures(self.results_dir.parent / "execution.log")
         
         if not self.results_dir.is_dir():
             print(f"[PARSER] Error: Path is not a directory: {self.results_dir}", file=sys.stderr)
-            return {
-                "results": {"total": 0, "passed": 0, "failed": 0, "skipped": 0, "errors": 0},
-                "failures": [],
-                "summary": {"passRate": 0.0, "failureRate": 0.0, "status": "error"}
-            }
+            self.status = "error"
+            return
         
         print(f"[PARSER] Parsing test results from: {self.results_dir}")
         
         # Find all JUnit XML files
         try:
-            junit_files = list(self.results_dir.rglob("TEST-*.xml"))
-            playwright_files = list(self.results_dir.rglob("results.json"))
+            report_files = self._report_files(self.results_dir)
         except OSError as e:
             print(f"[PARSER] Error accessing results directory: {e}", file=sys.stderr)
-            return {
-                "results": {"total": 0, "passed": 0, "failed": 0, "skipped": 0, "errors": 0},
-                "failures": [],
-                "summary": {"passRate": 0.0, "failureRate": 0.0, "status": "error"}
-            }
+            self.status = "error"
+            return
         
+        yield from self._add_compilation_failures(compilation_failures)
+        yield from self._parse_report_files(*report_files)
+    
+    def parse_reports(self, directory: Path) -> Iterator[Dict[str, Any]]:
+        """Parse the reports under one more directory, e.g. one service's results as soon as
+        the test runner has pulled them; yields the failures found there"""
+        print(f"[PARSER] Parsing test results from: {directory}")
+        yield from self._parse_report_files(*self._report_files(Path(directory)))
+    
+    def parse_execution_log(self, execution_log: Path = None) -> Iterator[Dict[str, Any]]:
+        """Add compilation errors from the execution log (once the run has finished writing it)"""
+        execution_log = Path(execution_log) if execution_log else self.results_dir.parent / "execution.log"
+        yield from self._add_compilation_failures(self._compilation_failures(execution_log))
+    
+    def _report_files(self, directory: Path) -> tuple:
+        """(JUnit XML files, Playwright results files) under directory"""
+        return list(directory.rglob("TEST-*.xml")), list(directory.rglob("results.json"))
+    
+    def _parse_report_files(self, junit_files: List[Path], playwright_files: List[Path]) -> Iterator[Dict[str, Any]]:
         # Parse JUnit XML files
         for junit_file in junit_files:
             self._parse_junit_xml(junit_file)
+            yield from self._take_found()
         
         # Parse Playwright results
         for playwright_file in playwright_files:
             self._parse_playwright_json(playwright_file)
+            yield from self._take_found()
+    
+    def _take_found(self) -> List[Dict[str, Any]]:
+        """Failures added since the last call that are still failing"""
+        found, self._found = self._found, []
+        return [self._failures[key] for key in found if key in self._failures]
+    
+    @staticmethod
+    def _final_status(statuses: set) -> str:
+        """Reconcile the statuses of all attempts of one test"""
+        ran = statuses - {"skipped"}
+        if not ran:
+            return "skipped"
+        if "flaky" in ran or ("passed" in ran and len(ran) > 1):
+            return "flaky"
+        if ran == {"passed"}:
+            return "passed"
+        return "error" if ran == {"error"} else "failed"
+    
+    def _record_attempt(self, key: tuple, test_id: str, status: str, duration: float,
+                        failure: Optional[Dict[str, Any]] = None, attempts: int = 1):
+        """Merge one attempt (or one testcase's attempts) into the test's final outcome"""
+        outcome = self._outcomes.get(key)
+        if outcome is None:
+            outcome = {"test": {"id": test_id, "status": status, "duration": duration}, "statuses": set()}
+            self._outcomes[key] = outcome
+            self.tests.append(outcome["test"])
+        else:
+            attempts += outcome["test"].get("attempts", 1)
+        
+        outcome["statuses"].add(status)
+        test = outcome["test"]
+        test["status"] = self._final_status(outcome["statuses"])
+        test["duration"] = duration  # Latest attempt
+        if attempts > 1:
+            test["attempts"] = attempts
+        
+        if test["status"] in ("failed", "error"):
+            if key not in self._failures and failure is not None:
+                self._failures[key] = failure
+                self._found.append(key)
+        elif self._failures.pop(key, None) is not None:
+            # Passed on another attempt: not worth a fix
+            print(f"[PARSER] {test_id} passed on retry, marked flaky")
+    
+    def _compilation_failures(self, execution_log: Path) -> List[Dict[str, Any]]:
+        """Failure records for the compilation errors in an execution log"""
+        failures = []
+        if not execution_log.exists():
+            return failures
+        compilation_errors = self._parse_compilation_errors(execution_log)
+        if compilation_errors:
+            print(f"[PARSER] Found {len(compilation_errors)} compilation errors in execution log")
+            for i, error in enumerate(compilation_errors):
+                file_path = error.get("file", "")
+                service = error.get("service", "unknown")
+                failures.append({
+                    "id": f"compilation-{service}-{i}",
+                    "testName": file_path.split("/")[-1] if file_path else "compilation",
+                    "className": service,
+                    "errorType": "CompilationError",
+                    "errorMessage": error.get("message", ""),
+                    "stackTrace": error.get("details", ""),
+                    "category": "compilation",
+                    "confidence": 0.95,
+                    "sourceFile": error.get("sourceFile", file_path),
+                    "service": service,
+                    "file": file_path,
+                    "details": error.get("details", "")
+                })
+        return failures
+    
+    def _add_compilation_failures(self, failures: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        added = []
+        for failure in failures:
+            key = ("compilation", failure["id"])
+            if key not in self._failures:
+                self._failures[key] = failure
+                added.append(failure)
+        return added
+    
+    def _count_results(self) -> Dict[str, int]:
+        """Totals from the final outcome of each test; flaky tests count as passed"""
+        results = {"total": 0, "passed": 0, "failed": 0, "skipped": 0, "errors": 0, "flaky": 0}
+        for outcome in self._outcomes.values():
+            status = outcome["test"]["status"]
+            results["total"] += 1
+            if status == "flaky":
+                results["flaky"] += 1
+                results["passed"] += 1
+            elif status == "error":
+                results["errors"] += 1
+            else:
+                results[status] += 1
+        
+        for status in ("passed", "failed", "error", "flaky", "skipped"):
+            qa_telemetry.TESTS.set(sum(1 for o in self._outcomes.values() if o["test"]["status"] == status),
+                                   status=status)
         
+        compilation = sum(1 for key in self._failures if key[0] == "compilation")
+        results["errors"] += compilation
+        results["failed"] += compilation
+        return results
+    
+    def document(self) -> Dict[str, Any]:
+        """Build the parse result from what has been parsed so far"""
+        if self.status:
+            return {
+                "results": {"total": 0, "passed": 0, "failed": 0, "skipped": 0, "errors": 0},
+                "failures": [],
+                "tests": [],
+                "summary": {"passRate": 0.0, "failureRate": 0.0, "status": self.status}
+            }
+        
+        self.results = self._count_results()
+        failures = self.failures
         # If we found compilation errors but no test results, return them
-        if self.failures and self.results["total"] == 0:
-            self.results["total"] = len(self.failures)
+        if failures and self.results["total"] == 0:
+            self.results["total"] = len(failures)
         
         return {
             "results": self.results,
-            "failures": self.failures,
+            "failures": failures,
+            "tests": self.tests,
             "summary": self._generate_summary()
         }
     
+    @qa_tracing.traced(file="log_file")
     def _parse_compilation_errors(self, log_file: Path) -> List[Dict[str, Any]]:
         """Parse compilation errors from execution log"""
         errors = []
         try:
             with open(log_file, 'r', encoding='utf-8', errors='ignore') as f:
                 content = f.read()
-                
+            qa_telemetry.FILES_PARSED.inc(format="execution-log")
+            qa_telemetry.BYTES_READ.inc(log_file.stat().st_size, format="execution-log")
+            
             # Pattern for Maven compilation errors - improved to capture full error message
             error_pattern = r'\[ERROR\]\s+(/workspace/[^\s]+\.java):\[(\d+),(\d+)\]\s+((?:cannot find symbol|package [^\s]+ does not exist|symbol:.*?location:).*?)(?=\[ERROR\]|\[INFO\]|\[WARNING\]|$)'
             matches = re.finditer(error_pattern, content, re.MULTILINE | re.DOTALL)
@@ -179,15 +316,18 @@ class TestResultParser:
                         "message": "Build failed - compilation errors detected",
                         "details": error_text[:500]
                     })
-                    
+        
         except Exception as e:
             print(f"[PARSER] Error parsing compilation errors: {e}", file=sys.stderr)
         
         return errors
     
+    @qa_tracing.traced(file="xml_file")
     def _parse_junit_xml(self, xml_file: Path):
         """Parse JUnit XML test results"""
         try:
+            qa_telemetry.FILES_PARSED.inc(format="junit")
+            qa_telemetry.BYTES_READ.inc(xml_file.stat().st_size, format="junit")
             tree = ET.parse(xml_file)
             root = tree.getroot()
             
@@ -205,21 +345,8 @@ class TestResultParser:
         # Extract service name from path
         service_name = self._extract_service_name(xml_file)
         
-        # Get test counts
-        tests = int(testsuite.get("tests", 0))
-        failures = int(testsuite.get("failures", 0))
-        errors = int(testsuite.get("errors", 0))
-        skipped = int(testsuite.get("skipped", 0))
-        
-        passed = tests - failures - errors - skipped
-        
-        self.results["total"] += tests
-        self.results["passed"] += passed
-        self.results["failed"] += failures
-        self.results["errors"] += errors
-        self.results["skipped"] += skipped
-        
-        # Parse test cases
+        # Counts come from the test cases (see _count_results), not the suite's
+        # tests/failures attributes, so repeated attempts are counted once
         for testcase in testsuite.findall("testcase"):
             self._parse_testcase(testcase, service_name, xml_file)
     
@@ -227,11 +354,31 @@ class TestResultParser:
         """Parse a single test case"""
         test_class = testcase.get("classname", "").split(".")[-1]
         test_method = testcase.get("name", "")
+        duration = self._parse_duration(testcase.get("time"))
         
         # Check for failures
         failure = testcase.find("failure")
         error = testcase.find("error")
+        # Surefire with rerunFailingTestsCount: failed reruns of a failing test,
+        # and failed attempts of a test that passed on a rerun
+        reruns = testcase.findall("rerunFailure") + testcase.findall("rerunError")
+        flaky = testcase.findall("flakyFailure") + testcase.findall("flakyError")
+        
+        if failure is not None:
+            status = "failed"
+        elif error is not None:
+            status = "error"
+        elif flaky:
+            status = "flaky"
+        elif testcase.find("skipped") is not None:
+            status = "skipped"
+        else:
+            status = "passed"
+        test_id = f"{service_name}-{test_class}-{test_method}"
+        key = (service_name, testcase.get("classname", ""), test_method)
+        attempts = 1 + len(reruns) + len(flaky)
         
+        failure_data = None
         if failure is not None or error is not None:
             issue = failure if failure is not None else error
             error_type = issue.get("type", "Unknown")
@@ -245,7 +392,7 @@ class TestResultParser:
             confidence = self._estimate_confidence(error_type, error_message)
             
             failure_data = {
-                "id": f"{service_name}-{test_class}-{test_method}",
+                "id": test_id,
                 "service": service_name,
                 "testClass": test_class,
                 "testMethod": test_method,
@@ -254,14 +401,20 @@ class TestResultParser:
                 "stackTrace": stack_trace[:5000],  # Limit stack trace size
                 "category": category,
                 "confidence": confidence,
+                "duration": duration,
                 "sourceFile": str(xml_file.relative_to(self.results_dir.parent.parent.parent))
             }
-            
-            self.failures.append(failure_data)
+            if reruns:
+                failure_data["attempts"] = attempts
+        
+        self._record_attempt(key, test_id, status, duration, failure_data, attempts)
     
+    @qa_tracing.traced(file="json_file")
     def _parse_playwright_json(self, json_file: Path):
         """Parse Playwright test results JSON"""
         try:
+            qa_telemetry.FILES_PARSED.inc(format="playwright")
+            qa_telemetry.BYTES_READ.inc(json_file.stat().st_size, format="playwright")
             with open(json_file, 'r') as f:
                 data = json.load(f)
             
@@ -275,21 +428,21 @@ class TestResultParser:
             print(f"[PARSER] Error parsing Playwright results {json_file}: {e}", file=sys.stderr)
     
     def _parse_playwright_test(self, test: Dict, json_file: Path):
-        """Parse a single Playwright test result"""
+        """Parse a single Playwright test result (one entry per retry)"""
         test_title = test.get("title", "")
         test_file = test.get("file", "")
+        test_id = f"e2e-{test_file}-{test_title}"
+        key = ("frontend", test_file, test_title)
         
         results = test.get("results", [])
         for result in results:
             status = result.get("status", "")
+            if status not in ("passed", "failed", "skipped"):
+                continue
+            duration = round(result.get("duration", 0) / 1000.0, 3)  # Playwright reports ms
             
-            if status == "passed":
-                self.results["passed"] += 1
-                self.results["total"] += 1
-            elif status == "failed":
-                self.results["failed"] += 1
-                self.results["total"] += 1
-                
+            failure_data = None
+            if status == "failed":
                 # Extract failure details
                 error = result.get("error", {})
                 error_message = error.get("message", "")
@@ -299,7 +452,7 @@ class TestResultParser:
                 confidence = self._estimate_confidence("PlaywrightError", error_message)
                 
                 failure_data = {
-                    "id": f"e2e-{test_file}-{test_title}",
+                    "id": test_id,
                     "service": "frontend",
                     "testClass": test_file,
                     "testMethod": test_title,
@@ -310,11 +463,16 @@ class TestResultParser:
                     "confidence": confidence,
                     "sourceFile": str(json_file.relative_to(self.results_dir.parent.parent.parent))
                 }
-                
-                self.failures.append(failure_data)
-            elif status == "skipped":
-                self.results["skipped"] += 1
-                self.results["total"] += 1
+            
+            self._record_attempt(key, test_id, status, duration, failure_data)
+    
+    @staticmethod
+    def _parse_duration(value: Optional[str]) -> float:
+        """JUnit time attribute in seconds (surefire may use a thousands separator)"""
+        try:
+            return round(float((value or "0").replace(",", "")), 3)
+        except ValueError:
+            return 0.0
     
     def _extract_service_name(self, xml_file: Path) -> str:
         """Extract service name from file path"""
@@ -323,6 +481,10 @@ class TestResultParser:
             if part in ["services", "tests"]:
                 if i + 1 < len(parts):
                     return parts[i + 1]
+        # Reports copied out of the test containers: results/<service>-unit-tests/
+        for part in reversed(parts[:-1]):
+            if part.endswith("-unit-tests"):
+                return part[:-len("-unit-tests")]
         return "unknown"
     
     def _categorize_failure(self, error_type: str, error_message: str, stack_trace: str) -> str:
@@ -397,8 +559,11 @@ class TestResultParser:
 
 
 def main():
+    qa_telemetry.export_at_exit("qa-result-parser")
+    qa_tracing.trace_at_exit("qa-result-parser")
+    qa_profiling.from_argv("qa-result-parser")
     if len(sys.argv) < 2:
-        print("Usage: qa-result-parser.py <results-directory> [output-file]")
+        print("Usage: qa-result-parser.py <results-directory> [output-file] [--profile[=dir]]")
         sys.exit(1)
     
     results_dir = sys.argv[1]
@@ -416,6 +581,7 @@ def main():
         },
         "results": parsed_results["results"],
         "failures": parsed_results["failures"],
+        "tests": parsed_results["tests"],
         "summary": parsed_results["summary"]
     }
     
@@ -435,6 +601,7 @@ def main():
     print(f"  Total: {output['results']['total']}")
     print(f"  Passed: {output['results']['passed']}")
     print(f"  Failed: {output['results']['failed']}")
+    print(f"  Flaky: {output['results'].get('flaky', 0)}")
     print(f"  Pass Rate: {summary['passRate']}%")
     print(f"  Failures: {len(output['failures'])}")
 
@@ -0,0 +1,312 @@
+#!/usr/bin/env python3
+"""
+Shard Scheduler for Autonomous Testing
+Splits unit test classes into balanced shards from historical durations and runs them concurrently
+"""
+
+import asyncio
+import json
+import os
+import re
+import shutil
+import sys
+from pathlib import Path
+from typing import Dict, List, Any, Optional, Tuple
+
+import qa_modules
+import qa_profiling
+
+storage_module = qa_modules.load("qa-storage")
+test_runner_module = qa_modules.load("qa-test-runner")
+
+REPO_ROOT = test_runner_module.REPO_ROOT
+SERVICES_DIR = REPO_ROOT / "services"
+# Surefire's default includes
+TEST_CLASS_PATTERN = re.compile(r"^(Test\w*|\w+Test|\w+Tests|\w+TestCase)\.java$")
+# Estimate for a class with no history when no other class has history either
+DEFAULT_CLASS_SECONDS = 10.0
+# Maven startup plus compiling one service, paid once per service in every shard it lands in
+SERVICE_OVERHEAD_SECONDS = 30.0
+MIN_SHARD_MEMORY = 1 << 30
+MEMORY_UNITS = {"": 1, "k": 1 << 10, "m": 1 << 20, "g": 1 << 30}
+
+# Each shard builds a private copy of its services so shards of one service do not
+# share target/; paths in the output are rewritten back to /workspace/services/ so
+# the parser's compilation error patterns still match.
+SHARD_SERVICE_COMMAND = (
+    "echo 'Testing service: {service} ({count} classes)' && "
+    "mkdir -p /workspace/shards/{shard}/services && "
+    "ln -sfn /workspace/shared /workspace/shards/{shard}/shared && "
+    "ln -sfn /workspace/tests /workspace/shards/{shard}/tests && "
+    "rm -rf /workspace/shards/{shard}/services/{service} && "
+    "cp -r /workspace/services/{service} /workspace/shards/{shard}/services/ && "
+    "cd /workspace/shards/{shard}/services/{service} && rm -rf target && "
+    "mkdir -p target/classes target/test-classes && "
+    "rm -f /tmp/{service}.failed && "
+    "(mvn test -Dmaven.test.failure.ignore=true -Dsurefire.failIfNoSpecifiedTests=false -Dtest={classes} 2>&1 "
+    "|| touch /tmp/{service}.failed) | sed 's#/workspace/shards/{shard}/#/workspace/#g'; "
+    "if [ -f /tmp/{service}.failed ]; then echo '{service}: BUILD FAILURE'; "
+    "else echo '{service}: BUILD SUCCESS'; fi; "
+    "mkdir -p " + test_runner_module.CONTAINER_RESULTS + "/{shard}/{service}-unit-tests && "
+    "cp target/surefire-reports/* " + test_runner_module.CONTAINER_RESULTS
+    + "/{shard}/{service}-unit-tests/ 2>/dev/null || true"
+)
+
+
+def parse_memory(value: Optional[str]) -> Optional[int]:
+    """Bytes for a Docker-style size (512m, 8g); None for no cap"""
+    if not value:
+        return None
+    match = re.fullmatch(r"(\d+(?:\.\d+)?)\s*([kmg]?)b?", value.strip().lower())
+    if not match:
+        raise ValueError(f"Invalid memory size: {value} (use e.g. 512m or 8g)")
+    return int(float(match.group(1)) * MEMORY_UNITS[match.group(2)])
+
+
+def discover_test_classes(services: List[str] = None, services_dir: Path = SERVICES_DIR) -> Dict[str, List[str]]:
+    """Test class names per service, as Surefire would select them"""
+    if services is None:
+        services = [s for s in test_runner_module.UNIT_TEST_SERVICES if (services_dir / s).is_dir()]
+    classes = {}
+    for service in services:
+        test_dir = services_dir / service / "src" / "test" / "java"
+        if not test_dir.is_dir():
+            continue
+        found = sorted({p.stem for p in test_dir.rglob("*.java") if TEST_CLASS_PATTERN.match(p.name)})
+        if found:
+            classes[service] = found
+    return classes
+
+
+def historical_durations(storage, services: List[str], since: str = None) -> Dict[Tuple[str, str], float]:
+    """Mean seconds per (service, test class) from the per-test history
+    
+    History test IDs are ``<service>-<class>-<method>``; service names contain
+    dashes, so the service is matched by prefix against ``services``.
+    """
+    # Longest first, so "chemical-parser-" wins over a service named "chemical-"
+    prefixes = sorted(((f"{service}-", service) for service in services), key=lambda p: len(p[0]), reverse=True)
+    durations = {}
+    for series in storage.iter_test_series(since=since):
+        for prefix, service in prefixes:
+            if series.test_id.startswith(prefix):
+                test_class = series.test_id[len(prefix):].split("-", 1)[0]
+                key = (service, test_class)
+                durations[key] = durations.get(key, 0.0) + series.mean_duration()
+                break
+    return durations
+
+
+def estimate_units(classes: Dict[str, List[str]], durations: Dict[Tuple[str, str], float]) -> List[Dict[str, Any]]:
+    """One unit per test class with its expected seconds; classes without history get the median"""
+    known = sorted(durations[(service, c)] for service, names in classes.items() for c in names
+                   if (service, c) in durations)
+    fallback = known[len(known) // 2] if known else DEFAULT_CLASS_SECONDS
+    return [
+        {
+            "service": service,
+            "testClass": test_class,
+            "seconds": round(durations.get((service, test_class), fallback), 3),
+            "estimated": (service, test_class) not in durations
+        }
+        for service, names in classes.items() for test_class in names
+    ]
+
+
+def plan_shards(units: List[Dict[str, Any]], shard_count: int) -> List[Dict[str, Any]]:
+    """Longest-processing-time-first assignment of units to shards
+    
+    A unit goes to the shard whose load grows least by taking it, counting
+    SERVICE_OVERHEAD_SECONDS when the shard does not build that service yet, so
+    a service is only split across shards when that evens out the load.
+    """
+    shards = [{"name": f"shard-{i + 1}", "seconds": 0.0, "services": {}} for i in range(max(1, shard_count))]
+    for unit in sorted(units, key=lambda u: (-u["seconds"], u["service"], u["testClass"])):
+        def cost(shard):
+            overhead = 0.0 if unit["service"] in shard["services"] else SERVICE_OVERHEAD_SECONDS
+            return shard["seconds"] + unit["seconds"] + overhead, len(shard["services"])
+        
+        shard = min(shards, key=cost)
+        shard["seconds"] = cost(shard)[0]
+        shard["services"].setdefault(unit["service"], []).append(unit["testClass"])
+    
+    for shard in shards:
+        shard["seconds"] = round(shard["seconds"], 1)
+        shard["services"] = {service: sorted(names) for service, names in sorted(shard["services"].items())}
+    return [shard for shard in shards if shard["services"]]
+
+
+def merge_results(shard_dirs: List[Path], target: Path) -> Dict[str, int]:
+    """Move the reports in several shards' copies of a results directory into ``target``
+    
+    Each test class runs in exactly one shard; a report name seen twice keeps
+    the first copy so totals are not counted twice.
+    """
+    merged = {"reports": 0, "duplicates": 0}
+    target.mkdir(parents=True, exist_ok=True)
+    for shard_dir in shard_dirs:
+        if not shard_dir.is_dir():
+            continue
+        for report in sorted(p for p in shard_dir.rglob("*") if p.is_file()):
+            destination = target / report.name
+            if destination.exists():
+                merged["duplicates"] += 1
+                continue
+            shutil.move(str(report), str(destination))
+            merged["reports"] += 1
+        shutil.rmtree(shard_dir, ignore_errors=True)
+    return merged
+
+
+class ShardRunner(test_runner_module.TestRunner):
+    """TestRunner whose unit tests run as balanced shards of test classes
+    
+    Shards run ``parallel`` at a time (bounded by the memory cap) and each
+    running shard container gets an equal part of the CPU and memory caps.
+    Shard results are staged under <run-dir>/shards/ and merged into
+    results/<service>-unit-tests/ as soon as every shard testing that service
+    has finished; ``on_results`` is then called with the merged directory, so
+    the parser sees one combined run.
+    """
+    
+    def __init__(self, output_dir: str, test_type: str = "unit", timeout: int = 3600, shards: int = None,
+                 parallel: Optional[int] = None, cpus: Optional[float] = None, memory: Optional[int] = None,
+                 on_results=None, storage=None, since: str = None):
+        super().__init__(output_dir, test_type, timeout, parallel, on_results)
+        self.cpus = cpus or float(os.cpu_count() or 2)
+        self.memory = memory
+        shard_count = shards or self.parallel
+        if memory:
+            self.parallel = max(1, min(self.parallel, memory // MIN_SHARD_MEMORY))
+        
+        classes = discover_test_classes()
+        storage = storage or storage_module.ResultStorage()
+        durations = historical_durations(storage, list(classes), since)
+        self.units = estimate_units(classes, durations)
+        self.shards = plan_shards(self.units, shard_count)
+        self.staging_dir = self.run_dir / "shards"
+        self._service_shards = {}
+        for shard in self.shards:
+            for service in shard["services"]:
+                self._service_shards.setdefault(service, []).append(shard["name"])
+        # Shards still running per service
+        self._pending = {service: set(names) for service, names in self._service_shards.items()}
+        
+        with open(self.run_dir / "shards.json", "w") as f:
+            json.dump({
+                "shards": self.shards,
+                "parallel": self.parallel,
+                "cpusPerShard": round(self.cpus / self.parallel, 2),
+                "memoryPerShard": self.memory // self.parallel if self.memory else None,
+                "classesWithoutHistory": sum(1 for u in self.units if u["estimated"])
+            }, f, indent=2)
+    
+    def plan(self) -> tuple:
+        prepare, jobs = super().plan()
+        if self.test_type not in ("unit", "all"):
+            return prepare, jobs
+        shard_jobs = [{
+            "name": shard["name"],
+            "service": "unit-tests-runner",
+            "profile": "unit-tests",
+            "command": " ; ".join(SHARD_SERVICE_COMMAND.format(
+                shard=shard["name"], service=service, count=len(names), classes=",".join(names)
+            ) for service, names in shard["services"].items()),
+            "results": shard["name"]
+        } for shard in self.shards]
+        return prepare, shard_jobs + [job for job in jobs if job["service"] != "unit-tests-runner"]
+    
+    async def _container_started(self, job: Dict[str, Any], name: str):
+        if not job["name"].startswith("shard-"):
+            return
+        limits = ["--cpus", f"{self.cpus / self.parallel:.2f}"]
+        if self.memory:
+            memory = str(self.memory // self.parallel)
+            limits += ["--memory", memory, "--memory-swap", memory]
+        code, output = await self._exec("docker", "update", *limits, name, log=False)
+        if code != 0:
+            test_runner_module.print_warn(f"{job['name']}: could not apply resource limits: {output.strip()}")
+    
+    def _results_path(self, job: Dict[str, Any]) -> Path:
+        if job["name"].startswith("shard-"):
+            return self.staging_dir / job["results"]
+        return super()._results_path(job)
+    
+    def _results_ready(self, job: Dict[str, Any], results: Optional[Path]):
+        if not job["name"].startswith("shard-"):
+            return super()._results_ready(job, results)
+        
+        shard = next(s for s in self.shards if s["name"] == job["name"])
+        for service in shard["services"]:
+            self._pending[service].discard(shard["name"])
+            if not self._pending[service]:
+                # Every shard testing this service is in: merge its reports into one directory
+                self._merge_service(service)
+        if not any(self._pending.values()):
+            shutil.rmtree(self.staging_dir, ignore_errors=True)
+    
+    def _drain_results(self):
+        # Shards that never ran or were cancelled: hand over what the others produced
+        for service, pending in self._pending.items():
+            if pending:
+                test_runner_module.print_warn(f"{service}: merging without {len(pending)} unfinished shard(s)")
+                pending.clear()
+                self._merge_service(service)
+        shutil.rmtree(self.staging_dir, ignore_errors=True)
+    
+    def _merge_service(self, service: str):
+        name = f"{service}-unit-tests"
+        merged = merge_results([self.staging_dir / s / name for s in self._service_shards[service]],
+                               self.results_dir / name)
+        if merged["duplicates"]:
+            test_runner_module.print_warn(f"{service}: dropped {merged['duplicates']} duplicate reports")
+        super()._results_ready({"name": name, "results": name},
+                               self.results_dir / name if merged["reports"] else None)
+
+
+def main():
+    """CLI for the shard scheduler"""
+    profile = qa_profiling.from_argv("qa-shard-scheduler")
+    options = dict(a[2:].split("=", 1) if "=" in a else (a[2:], "") for a in sys.argv[1:] if a.startswith("--"))
+    args = [a for a in sys.argv[1:] if not a.startswith("--")]
+    command = args[0] if args else "help"
+    
+    if command == "plan":
+        shard_count = int(args[1]) if len(args) > 1 else os.cpu_count() or 2
+        services = options["services"].split(",") if options.get("services") else None
+        classes = discover_test_classes(services)
+        units = estimate_units(classes, historical_durations(storage_module.ResultStorage(), list(classes),
+                                                             options.get("since")))
+        print(json.dumps({"shards": plan_shards(units, shard_count), "units": units}, indent=2))
+    
+    elif command == "run":
+        runner = ShardRunner(
+            output_dir=args[1] if len(args) > 1 else str(REPO_ROOT / "docs" / "testing" / "autonomous-runs" / "temp"),
+            test_type=options.get("type") or "unit",
+            shards=int(args[2]) if len(args) > 2 else None,
+            timeout=int(args[3]) if len(args) > 3 else 3600,
+            parallel=int(options["parallel"]) if options.get("parallel") else None,
+            cpus=float(options["cpus"]) if options.get("cpus") else None,
+            memory=parse_memory(options.get("memory") or os.environ.get("QA_SHARD_MEMORY")),
+            since=options.get("since")
+        )
+        if profile:
+            profile.output_dir = profile.output_dir or runner.run_dir
+        exit_code = asyncio.run(runner.run())
+        print(runner.run_dir)
+        sys.exit(exit_code)
+    
+    else:
+        print("Usage: qa-shard-scheduler.py <command> [args]")
+        print("Commands:")
+        print("  plan [shards] [--services=a,b] [--since=<iso>]   - Show the shard assignment as JSON")
+        print("  run [output-dir] [shards] [timeout] [--type=unit|all] [--parallel=N] [--cpus=N]")
+        print("      [--memory=8g] [--since=<iso>]                 - Run the shards, print the run directory")
+        print("Any command takes --profile[=dir] (cProfile/tracemalloc reports; run: in the run directory)")
+        print("Shards are balanced with per-test durations from qa-storage.py history (index.db).")
+        print("Environment: QA_TEST_PARALLEL, QA_SHARD_MEMORY (total memory cap for shard containers)")
+        sys.exit(0 if command == "help" else 1)
+
+
+if __name__ == "__main__":
+    main()
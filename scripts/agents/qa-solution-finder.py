@@ -8,12 +8,20 @@ import json
 import sys
 import re
 import subprocess
-from typing import Dict, List, Any, Optional
+from typing import Dict, Iterable, Iterator, List, Any, Optional
 from pathlib import Path
 
+import qa_cache
+import qa_profiling
+import qa_telemetry
+import qa_tracing
+
 class SolutionFinder:
     """Find solutions to test failures"""
     
+    # Source trees the finder searches; their state is part of the stage cache key
+    SOURCE_DIRS = ("services", "shared")
+    
     def __init__(self, repo_root: str = None):
         if repo_root:
             self.repo_root = Path(repo_root)
@@ -22,19 +30,33 @@ class SolutionFinder:
             self.repo_root = Path(__file__).parent.parent.parent
         
         self.repo_root = self.repo_root.resolve()
+        # Java files by class name per searched directory, reused until the source tree changes
+        self._class_index = {}
+        self._class_index_tree = None
+    
+    def cache_config(self) -> Dict[str, Any]:
+        """Inputs besides the failures that solutions depend on (see qa_cache)"""
+        return {"repoTree": qa_cache.tree_hash(self.repo_root, self.SOURCE_DIRS)}
     
     def find_solutions(self, failures: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         """Find solutions for all failures"""
         print(f"[SOLUTION FINDER] Finding solutions for {len(failures)} failures...")
         
-        solutions = []
+        with qa_telemetry.timed("solve"):
+            return list(self.iter_solutions(failures))
+    
+    def iter_solutions(self, failures: Iterable[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+        """Find solutions one failure at a time as failures arrive"""
+        tree = qa_cache.tree_hash(self.repo_root, self.SOURCE_DIRS)
+        if tree != self._class_index_tree:
+            self._class_index = {}
+            self._class_index_tree = tree
+        
         for failure in failures:
             solution = self._find_solution(failure)
             # Embed failure data in solution for auto-fix to use
             solution["failure"] = failure
-            solutions.append(solution)
-        
-        return solutions
+            yield solution
     
     def _find_solution(self, failure: Dict[str, Any]) -> Dict[str, Any]:
         """Find solution for a single failure"""
@@ -284,6 +306,7 @@ class SolutionFinder:
         
         return fixes
     
+    @qa_tracing.traced(class_name="class_name", service="service")
     def _find_import_path(self, class_name: str, service: str) -> Optional[str]:
         """Find import path for a class"""
         # Search in service directory
@@ -292,21 +315,32 @@ class SolutionFinder:
             return None
         
         # Search for class file
-        for java_file in service_dir.rglob("*.java"):
-            if java_file.stem == class_name:
-                # Extract package from file
-                relative_path = java_file.relative_to(service_dir / "src" / "main" / "java")
-                package_path = str(relative_path.parent).replace("/", ".").replace("\\", ".")
-                return f"{package_path}.{class_name}"
+        matches = self._java_classes(service_dir).get(class_name)
+        if matches:
+            # Extract package from file
+            relative_path = matches[0].relative_to(service_dir / "src" / "main" / "java")
+            package_path = str(relative_path.parent).replace("/", ".").replace("\\", ".")
+            return f"{package_path}.{class_name}"
         
         # Check shared models
         shared_dir = self.repo_root / "shared" / "models"
-        for java_file in shared_dir.rglob("*.java"):
-            if java_file.stem == class_name:
-                return f"io.leanda.ng.shared.models.{class_name}"
+        if class_name in self._java_classes(shared_dir):
+            return f"io.leanda.ng.shared.models.{class_name}"
         
         return None
     
+    @qa_tracing.traced(directory="directory")
+    def _java_classes(self, directory: Path) -> Dict[str, List[Path]]:
+        """Java files under ``directory`` by class name, in rglob order"""
+        index = self._class_index.get(directory)
+        if index is None:
+            index = {}
+            for java_file in directory.rglob("*.java"):
+                index.setdefault(java_file.stem, []).append(java_file)
+            self._class_index[directory] = index
+        return index
+    
+    @qa_tracing.traced(test_class="test_class", service="service")
     def _find_similar_tests(self, test_class: str, service: str) -> List[str]:
         """Find similar test classes"""
         similar = []
@@ -329,12 +363,16 @@ class SolutionFinder:
 
 def main():
     """CLI for solution finder"""
-    if len(sys.argv) < 2:
-        print("Usage: qa-solution-finder.py <failures-analysis.json> [output-file]")
+    qa_telemetry.export_at_exit("qa-solution-finder")
+    qa_tracing.trace_at_exit("qa-solution-finder")
+    qa_profiling.from_argv("qa-solution-finder")
+    args = [a for a in sys.argv[1:] if a != "--no-cache"]
+    if len(args) < 1:
+        print("Usage: qa-solution-finder.py <failures-analysis.json> [output-file] [--no-cache] [--profile[=dir]]")
         sys.exit(1)
     
-    input_file = sys.argv[1]
-    output_file = sys.argv[2] if len(sys.argv) > 2 else None
+    input_file = args[0]
+    output_file = args[1] if len(args) > 1 else None
     
     # Load analysis
     with open(input_file, 'r') as f:
@@ -348,7 +386,10 @@ def main():
     
     # Find solutions
     finder = SolutionFinder()
-    solutions = finder.find_solutions(failures)
+    cache = qa_cache.StageCache(enabled="--no-cache" not in sys.argv)
+    solutions = cache.run("solve", qa_cache.code_version(finder), failures, finder.find_solutions,
+                          finder.cache_config)
+    qa_telemetry.observe_solutions(solutions)
     
     # Combine with original failures
     output = {
@@ -4,17 +4,544 @@ Result Storage System for Autonomous Testing
 Manages storage and indexing of test run results
 """
 
+import csv
+import gzip
+import hashlib
+import io
 import json
 import os
+import re
+import shutil
+import sqlite3
 import sys
+from array import array
 from pathlib import Path
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
 from typing import Dict, List, Any, Optional
 
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+import qa_profiling
+import qa_telemetry
+import qa_tracing
+
+INDEX_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    runId TEXT PRIMARY KEY,
+    timestamp TEXT NOT NULL,
+    testType TEXT,
+    status TEXT,
+    passRate REAL,
+    failureCount INTEGER,
+    totalTests INTEGER,
+    directory TEXT,
+    pinned INTEGER NOT NULL DEFAULT 0,
+    compacted INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_runs_timestamp ON runs (timestamp);
+CREATE INDEX IF NOT EXISTS idx_runs_status ON runs (status, timestamp);
+CREATE INDEX IF NOT EXISTS idx_runs_test_type ON runs (testType, timestamp);
+
+CREATE TABLE IF NOT EXISTS failure_occurrences (
+    id INTEGER PRIMARY KEY,
+    runId TEXT NOT NULL,
+    iteration INTEGER NOT NULL,
+    failureId TEXT NOT NULL,
+    errorType TEXT,
+    message TEXT,
+    signature TEXT,
+    fixes TEXT,
+    UNIQUE (runId, iteration, failureId)
+);
+CREATE INDEX IF NOT EXISTS idx_occurrences_failure ON failure_occurrences (failureId);
+CREATE INDEX IF NOT EXISTS idx_occurrences_signature ON failure_occurrences (signature);
+CREATE TABLE IF NOT EXISTS failure_tokens (
+    token TEXT NOT NULL,
+    occurrence INTEGER NOT NULL,
+    PRIMARY KEY (token, occurrence)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_tokens_occurrence ON failure_tokens (occurrence);
+CREATE TABLE IF NOT EXISTS indexed_iterations (
+    runId TEXT NOT NULL,
+    iteration INTEGER NOT NULL,
+    PRIMARY KEY (runId, iteration)
+);
+
+CREATE TABLE IF NOT EXISTS history_samples (
+    seq INTEGER PRIMARY KEY,
+    runId TEXT NOT NULL,
+    iteration INTEGER NOT NULL,
+    timestamp TEXT NOT NULL,
+    UNIQUE (runId, iteration)
+);
+CREATE INDEX IF NOT EXISTS idx_history_samples_timestamp ON history_samples (timestamp);
+CREATE TABLE IF NOT EXISTS test_history (
+    testId TEXT NOT NULL,
+    chunk INTEGER NOT NULL,
+    seqs BLOB NOT NULL,
+    statuses BLOB NOT NULL,
+    durations BLOB NOT NULL,
+    PRIMARY KEY (testId, chunk)
+) WITHOUT ROWID;
+"""
+
+RUN_COLUMNS = ["runId", "timestamp", "testType", "status", "passRate", "failureCount", "totalTests", "directory"]
+
+# Columns added after the first index.db layout (name -> definition)
+ADDED_COLUMNS = {
+    "pinned": "INTEGER NOT NULL DEFAULT 0",
+    "compacted": "INTEGER NOT NULL DEFAULT 0",
+}
+
+RUN_ID_PATTERN = re.compile(r"^\d{8}-\d{6}-\d+$")
+
+# Artifact file names the loop writes into a run directory (any compression / delta form)
+ARTIFACT_NAME = re.compile(
+    r"^(test-results|failures-analysis|solutions|fixes|progress)(?:-iter-(\d+))?(?:\.delta)?\.json(?:\.gz|\.zst)?$"
+)
+# Ingest order within an iteration: fixes are attached to already indexed failures
+INGEST_ORDER = ["test-results", "failures-analysis", "solutions", "fixes", "progress"]
+
+# Artifact compression: zstd when the zstandard module is installed, gzip otherwise.
+# QA_STORAGE_COMPRESSION=none|gzip|zstd overrides the default.
+ARTIFACT_SUFFIXES = {"none": ".json", "gzip": ".json.gz", "zstd": ".json.zst"}
+DEFAULT_COMPRESSION = os.environ.get("QA_STORAGE_COMPRESSION", "zstd" if zstandard else "gzip")
+GZIP_LEVEL = 6
+ZSTD_LEVEL = 3
+
+
+def _base_name(path: Path) -> Path:
+    """Strip any artifact suffix, e.g. fixes-iter-1.json.gz -> fixes-iter-1"""
+    for suffix in (".json.gz", ".json.zst", ".json"):
+        if path.name.endswith(suffix):
+            return path.with_name(path.name[:-len(suffix)])
+    return path
+
+
+def _compression_of(path: Path) -> str:
+    if path.name.endswith(".json.zst"):
+        return "zstd"
+    if path.name.endswith(".json.gz"):
+        return "gzip"
+    return "none"
+
+
+def resolve_artifact(path) -> Optional[Path]:
+    """Find the stored variant of an artifact (.json, .json.zst or .json.gz)"""
+    path = Path(path)
+    if path.exists():
+        return path
+    base = _base_name(path)
+    for suffix in (".json", ".json.zst", ".json.gz"):
+        candidate = base.with_name(base.name + suffix)
+        if candidate.exists():
+            return candidate
+    return None
+
+
+def open_artifact(path, mode: str = "r"):
+    """Open an artifact for text reading or writing, compressed or not
+    
+    When reading, ``path`` may name any variant (or the plain .json name);
+    the variant that exists on disk is opened. When writing, the suffix of
+    ``path`` selects the compression.
+    """
+    if "r" in mode:
+        resolved = resolve_artifact(path)
+        if resolved is None:
+            raise FileNotFoundError(f"No artifact found for {path}")
+        path = resolved
+    path = Path(path)
+    compression = _compression_of(path)
+    binary_mode = "rb" if "r" in mode else "wb"
+    
+    if compression == "gzip":
+        return gzip.open(path, binary_mode[0] + "t", compresslevel=GZIP_LEVEL, encoding="utf-8")
+    if compression == "zstd":
+        if zstandard is None:
+            raise RuntimeError(f"{path} is zstd-compressed but the zstandard module is not installed")
+        raw = open(path, binary_mode)
+        if "r" in mode:
+            stream = zstandard.ZstdDecompressor().stream_reader(raw, closefd=True)
+        else:
+            stream = zstandard.ZstdCompressor(level=ZSTD_LEVEL).stream_writer(raw, closefd=True)
+        return io.TextIOWrapper(stream, encoding="utf-8")
+    return open(path, mode[0], encoding="utf-8")
+
+
+@qa_tracing.traced(path="path")
+def read_artifact(path) -> Any:
+    """Load a JSON artifact regardless of how it was compressed
+    
+    Iterations stored as deltas (see ResultStorage.store_iteration) are
+    expanded back into the full document.
+    """
+    resolved = resolve_artifact(path)
+    if resolved is None or _is_delta(resolved):
+        return _read_delta(resolved or _delta_base(Path(path)))
+    qa_telemetry.ARTIFACT_BYTES.inc(resolved.stat().st_size, direction="read")
+    with open_artifact(resolved) as f:
+        return json.load(f)
+
+
+@qa_tracing.traced(path="path")
+def write_artifact(path, data: Any, compression: str = None) -> Path:
+    """Stream ``data`` as JSON into a (compressed) artifact
+    
+    The suffix is derived from ``compression``; other variants of the same
+    artifact are removed so readers never see stale data. The write goes to
+    a temporary file first and is moved into place atomically.
+    """
+    compression = compression or DEFAULT_COMPRESSION
+    if compression == "zstd" and zstandard is None:
+        compression = "gzip"
+    base = _base_name(Path(path))
+    target = base.with_name(base.name + ARTIFACT_SUFFIXES[compression])
+    tmp = base.with_name(base.name + ".tmp" + ARTIFACT_SUFFIXES[compression])
+    
+    with open_artifact(tmp, "w") as f:
+        if compression == "none":
+            json.dump(data, f, indent=2)
+        else:
+            json.dump(data, f, separators=(",", ":"))
+    os.replace(tmp, target)
+    qa_telemetry.ARTIFACT_BYTES.inc(target.stat().st_size, direction="written")
+    
+    _remove_other_variants(base, target)
+    return target
+
+
+def compress_artifact(path, compression: str = None) -> Optional[Path]:
+    """Compress an existing plain .json artifact in place (streamed, no full load)"""
+    path = Path(path)
+    compression = compression or DEFAULT_COMPRESSION
+    if compression == "zstd" and zstandard is None:
+        compression = "gzip"
+    if not path.name.endswith(".json") or not path.exists() or compression == "none":
+        return None
+    
+    base = _base_name(path)
+    target = base.with_name(base.name + ARTIFACT_SUFFIXES[compression])
+    tmp = base.with_name(base.name + ".tmp" + ARTIFACT_SUFFIXES[compression])
+    with open(path, "r", encoding="utf-8") as src, open_artifact(tmp, "w") as dst:
+        shutil.copyfileobj(src, dst, 1 << 20)
+    os.replace(tmp, target)
+    path.unlink()
+    return target
+
+
+def _remove_other_variants(base: Path, keep: Path):
+    for suffix in ARTIFACT_SUFFIXES.values():
+        other = base.with_name(base.name + suffix)
+        if other != keep and other.exists():
+            other.unlink()
+
+
+# Cross-iteration deduplication: failure records live once per run in
+# failure-records.jsonl.gz (keyed by failure id and a hash of the fields that
+# do not change between iterations); each iteration keeps a small
+# <kind>-iter-N.delta.json manifest listing the keys it contains, plus each
+# failure's per-iteration fields (duration, iteration output directory).
+FAILURE_RECORDS_FILE = "failure-records.jsonl.gz"
+DELTA_KINDS = ["test-results", "failures-analysis"]
+FAILURE_REFS = "$failureRefs"
+FAILURE_VOLATILE = "$failureVolatile"
+RUN_DIR_PLACEHOLDER = re.compile(r"<run-dir-(\d+)>")
+
+
+def _is_delta(path: Path) -> bool:
+    return _base_name(path).name.endswith(".delta")
+
+
+def _delta_base(path: Path) -> Path:
+    base = _base_name(path)
+    return base if base.name.endswith(".delta") else base.with_name(base.name + ".delta")
+
+
+def _read_delta(path: Path) -> Any:
+    manifest_path = resolve_artifact(_delta_base(path))
+    if manifest_path is None:
+        raise FileNotFoundError(f"No artifact found for {path}")
+    with open_artifact(manifest_path) as f:
+        document = json.load(f)
+    
+    failures = document.get("failures")
+    if isinstance(failures, dict) and FAILURE_REFS in failures:
+        refs = failures[FAILURE_REFS]
+        volatile = failures.get(FAILURE_VOLATILE) or [{}] * len(refs)
+        records = FailureRecordStore(manifest_path.parent).get_many(refs)
+        document["failures"] = [FailureRecordStore.restore(records[key], fields)
+                                for key, fields in zip(refs, volatile)]
+    return document
+
+
+class FailureRecordStore:
+    """Append-only store of failure records for one run, keyed by failure id and stable content"""
+    
+    def __init__(self, run_dir: Path):
+        self.path = Path(run_dir) / FAILURE_RECORDS_FILE
+        self._keys = None
+    
+    @staticmethod
+    def split(record: Dict[str, Any]) -> tuple:
+        """(stable record, per-iteration fields) of a failure record
+        
+        Per-iteration fields are qa_cache.VOLATILE_FIELDS and the names of
+        iteration output directories in report paths, which become
+        <run-dir-N> placeholders in the stable record.
+        """
+        import qa_cache
+        
+        stable = {key: value for key, value in record.items() if key not in qa_cache.VOLATILE_FIELDS}
+        volatile = {key: record[key] for key in qa_cache.VOLATILE_FIELDS if key in record}
+        text = json.dumps(stable)
+        run_dirs = list(dict.fromkeys(qa_cache.RUN_DIR_COMPONENT.findall(text)))
+        if run_dirs:
+            volatile["runDirs"] = run_dirs
+            position = {run_dir: i for i, run_dir in enumerate(run_dirs)}
+            stable = json.loads(qa_cache.RUN_DIR_COMPONENT.sub(lambda m: f"<run-dir-{position[m.group(0)]}>", text))
+        return stable, volatile
+    
+    @staticmethod
+    def restore(stable: Dict[str, Any], volatile: Dict[str, Any]) -> Dict[str, Any]:
+        """Inverse of split()"""
+        run_dirs = volatile.get("runDirs")
+        if run_dirs:
+            stable = json.loads(RUN_DIR_PLACEHOLDER.sub(lambda m: run_dirs[int(m.group(1))], json.dumps(stable)))
+        return dict(stable, **{key: value for key, value in volatile.items() if key != "runDirs"})
+    
+    @staticmethod
+    def key_of(stable: Dict[str, Any]) -> str:
+        canonical = json.dumps(stable, sort_keys=True, separators=(",", ":"))
+        return f"{stable.get('id')}:{hashlib.blake2b(canonical.encode('utf-8'), digest_size=12).hexdigest()}"
+    
+    def _iter_lines(self):
+        if not self.path.exists():
+            return
+        # Every append adds a gzip member; gzip reads concatenated members as one stream
+        with gzip.open(self.path, "rt", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+    
+    def keys(self) -> set:
+        if self._keys is None:
+            self._keys = {entry["key"] for entry in self._iter_lines()}
+        return self._keys
+    
+    def put(self, records: List[Dict[str, Any]]) -> tuple:
+        """Store the stable part of records not yet present; returns (keys, per-iteration fields), one per record"""
+        known = self.keys()
+        refs = []
+        volatile = []
+        new_lines = []
+        for record in records:
+            stable, fields = self.split(record)
+            key = self.key_of(stable)
+            refs.append(key)
+            volatile.append(fields)
+            if key not in known:
+                known.add(key)
+                new_lines.append(json.dumps({"key": key, "id": record.get("id"), "record": stable}, separators=(",", ":")))
+        
+        if new_lines:
+            with gzip.open(self.path, "at", compresslevel=GZIP_LEVEL, encoding="utf-8") as f:
+                f.write("\n".join(new_lines) + "\n")
+        return refs, volatile
+    
+    def get_many(self, keys: List[str]) -> Dict[str, Dict[str, Any]]:
+        wanted = set(keys)
+        found = {}
+        for entry in self._iter_lines():
+            if entry["key"] in wanted:
+                found[entry["key"]] = entry["record"]
+        missing = wanted - found.keys()
+        if missing:
+            raise KeyError(f"{len(missing)} failure records missing from {self.path}")
+        return found
+
+
+# Failure-message tokenization for the inverted index: volatile parts
+# (addresses, UUIDs, numbers, quoted values) are masked so the same error
+# from different runs yields the same tokens.
+_VOLATILE_PATTERNS = [
+    (re.compile(r"0x[0-9a-f]+|@[0-9a-f]{6,}"), " "),
+    (re.compile(r"[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}"), " "),
+    (re.compile(r"'[^']*'|\"[^\"]*\"|<[^<>]*>"), " "),
+    (re.compile(r"\b\d+(\.\d+)?\b"), " "),
+]
+_TOKEN_PATTERN = re.compile(r"[a-z_$][a-z0-9_$]*(?:\.[a-z_$][a-z0-9_$]*)*")
+_FRAME_PATTERN = re.compile(r"^\s*at\s+([\w$.<>/-]+?)(?:\(|\s|:|$)", re.MULTILINE)
+MIN_TOKEN_LENGTH = 3
+SIGNATURE_FRAMES = 5
+
+
+def message_tokens(text: str) -> List[str]:
+    """Normalized tokens of an error message or search query
+    
+    Dotted names are indexed whole and by component, so
+    "java.lang.NullPointerException" matches "nullpointerexception".
+    """
+    text = (text or "").lower()
+    for pattern, replacement in _VOLATILE_PATTERNS:
+        text = pattern.sub(replacement, text)
+    
+    tokens = set()
+    for match in _TOKEN_PATTERN.findall(text):
+        parts = match.split(".")
+        for token in ([match] if len(parts) > 1 else []) + parts:
+            if len(token) >= MIN_TOKEN_LENGTH:
+                tokens.add(token)
+    return sorted(tokens)
+
+
+def stack_signature(error_type: str, stack_trace: str) -> Optional[str]:
+    """Hash of the exception type and top stack frames (line numbers ignored)"""
+    frames = _FRAME_PATTERN.findall(stack_trace or "")[:SIGNATURE_FRAMES]
+    if not frames:
+        return None
+    canonical = "|".join([error_type or ""] + frames)
+    return hashlib.blake2b(canonical.encode("utf-8"), digest_size=8).hexdigest()
+
+
+# Per-test history: one "sample" per executed iteration (history_samples.seq).
+# Each test stores parallel arrays of sample seq, status code and duration,
+# split into chunks of HISTORY_CHUNK samples so appends only rewrite the last
+# chunk and range queries skip chunks outside the range. Arrays use the
+# machine's native byte order; the index is local to the machine anyway.
+HISTORY_CHUNK = 256
+# "flaky": failed at least once, passed on a rerun
+STATUS_CODES = {"passed": 0, "failed": 1, "error": 2, "skipped": 3, "flaky": 4}
+STATUS_NAMES = {code: name for name, code in STATUS_CODES.items()}
+FAILING_CODES = (STATUS_CODES["failed"], STATUS_CODES["error"])
+
+
+class TestSeries:
+    """Decoded history of one test: parallel seq/status/duration arrays"""
+    
+    def __init__(self, test_id: str):
+        self.test_id = test_id
+        self.seqs = array("q")
+        self.statuses = array("b")
+        self.durations = array("f")
+    
+    def extend(self, seqs: bytes, statuses: bytes, durations: bytes):
+        self.seqs.frombytes(seqs)
+        self.statuses.frombytes(statuses)
+        self.durations.frombytes(durations)
+    
+    def select(self, seqs: set) -> "TestSeries":
+        """Samples whose seq is in ``seqs``"""
+        selected = TestSeries(self.test_id)
+        for i, seq in enumerate(self.seqs):
+            if seq in seqs:
+                selected.seqs.append(seq)
+                selected.statuses.append(self.statuses[i])
+                selected.durations.append(self.durations[i])
+        return selected
+    
+    def mean_duration(self, start: int = 0, end: int = None) -> float:
+        values = [d for d, s in zip(self.durations[start:end], self.statuses[start:end])
+                  if s != STATUS_CODES["skipped"]]
+        return sum(values) / len(values) if values else 0.0
+    
+    def failure_rate(self, start: int = 0, end: int = None) -> float:
+        statuses = self.statuses[start:end]
+        return sum(1 for s in statuses if s in FAILING_CODES) / len(statuses) if statuses else 0.0
+
+
+# Held (flock) by the process running a run; gc never compacts a locked run
+ACTIVE_LOCK = ".active.lock"
+
+# Files that survive compaction of an expired run
+COMPACT_KEEP = {"summary.json", "final-report.md", "pr-description.md"}
+
+
+def _tree_size(path: Path) -> int:
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.lstat(os.path.join(root, name)).st_size
+            except OSError:
+                pass
+    return total
+
+
+def _parse_timestamp(value: Optional[str]) -> Optional[datetime]:
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+class RetentionPolicy:
+    """Decide which runs are kept in full
+    
+    A run is kept while it is among the newest ``keep_runs`` runs, younger
+    than ``max_age_days`` and fits in ``max_total_bytes`` (counted from the
+    newest run down). Pinned and active (in-progress) runs are always kept
+    and count towards the size budget. ``None`` disables a limit.
+    """
+    
+    def __init__(self, keep_runs: Optional[int] = 100, max_age_days: Optional[float] = None,
+                 max_total_bytes: Optional[int] = None):
+        # The newest run may still be in progress; never expire it by count
+        self.keep_runs = max(keep_runs, 1) if keep_runs is not None else None
+        self.max_age_days = max_age_days
+        self.max_total_bytes = max_total_bytes
+    
+    @classmethod
+    def from_env(cls) -> "RetentionPolicy":
+        """Build a policy from QA_RETENTION_KEEP_RUNS / _MAX_AGE_DAYS / _MAX_SIZE_MB"""
+        keep = os.environ.get("QA_RETENTION_KEEP_RUNS")
+        age = os.environ.get("QA_RETENTION_MAX_AGE_DAYS")
+        size = os.environ.get("QA_RETENTION_MAX_SIZE_MB")
+        return cls(
+            keep_runs=int(keep) if keep else 100,
+            max_age_days=float(age) if age else None,
+            max_total_bytes=int(float(size) * 1024 * 1024) if size else None
+        )
+    
+    def select_expired(self, runs: List[Dict[str, Any]], now: datetime) -> List[Dict[str, Any]]:
+        """Return the runs to compact; ``runs`` must be sorted newest first"""
+        expired = []
+        kept = 0
+        total_bytes = 0
+        for run in runs:
+            if run.get("pinned") or run.get("active"):
+                total_bytes += run["bytes"]
+                continue
+            
+            too_many = self.keep_runs is not None and kept >= self.keep_runs
+            too_old = (self.max_age_days is not None and run["started"] is not None
+                       and now - run["started"] > timedelta(days=self.max_age_days))
+            too_big = self.max_total_bytes is not None and total_bytes + run["bytes"] > self.max_total_bytes
+            
+            if too_many or too_old or too_big:
+                expired.append(run)
+            else:
+                kept += 1
+                total_bytes += run["bytes"]
+        return expired
+
+
 class ResultStorage:
-    """Manage test result storage and indexing"""
+    """Manage test result storage and indexing
+    
+    Runs are indexed in an SQLite database (index.db, WAL mode) so concurrent
+    runners can insert safely and history is unlimited. A legacy index.json is
+    migrated on first use. JSON artifacts are written compressed (see
+    write_artifact) and read back with read_artifact.
+    """
     
-    def __init__(self, base_dir: str = None):
+    def __init__(self, base_dir: str = None, compression: str = None):
         if base_dir:
             self.base_dir = Path(base_dir)
         else:
@@ -23,25 +550,61 @@ class ResultStorage:
             self.base_dir = repo_root / "docs" / "testing" / "autonomous-runs"
         
         self.base_dir.mkdir(parents=True, exist_ok=True)
-        self.index_file = self.base_dir / "index.json"
-        self._load_index()
+        self.repo_root = self.base_dir.parent.parent.parent
+        self.compression = compression or DEFAULT_COMPRESSION
+        self.index_file = self.base_dir / "index.db"
+        self.legacy_index_file = self.base_dir / "index.json"
+        self._open_index()
     
-    def _load_index(self):
-        """Load or create index file"""
-        if self.index_file.exists():
-            try:
-                with open(self.index_file, 'r') as f:
-                    self.index = json.load(f)
-            except:
-                self.index = {"runs": [], "lastUpdated": None}
-        else:
-            self.index = {"runs": [], "lastUpdated": None}
+    def _open_index(self):
+        """Open (or create) the SQLite index and migrate a legacy index.json"""
+        self.db = sqlite3.connect(str(self.index_file), timeout=30)
+        self.db.row_factory = sqlite3.Row
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        with self.db:
+            self.db.executescript(INDEX_SCHEMA)
+            existing = {row["name"] for row in self.db.execute("PRAGMA table_info(runs)")}
+            for column, definition in ADDED_COLUMNS.items():
+                if column not in existing:
+                    self.db.execute(f"ALTER TABLE runs ADD COLUMN {column} {definition}")
+        
+        if self.legacy_index_file.exists():
+            self._migrate_legacy_index()
     
-    def _save_index(self):
-        """Save index file"""
-        self.index["lastUpdated"] = datetime.utcnow().isoformat() + "Z"
-        with open(self.index_file, 'w') as f:
-            json.dump(self.index, f, indent=2)
+    def _migrate_legacy_index(self):
+        """Import runs from index.json, then move it aside"""
+        try:
+            with open(self.legacy_index_file, 'r') as f:
+                runs = json.load(f).get("runs", [])
+        except (OSError, ValueError):
+            runs = []
+        
+        with self.db:
+            self.db.executemany(
+                f"INSERT OR IGNORE INTO runs ({', '.join(RUN_COLUMNS)}) "
+                f"VALUES ({', '.join(':' + c for c in RUN_COLUMNS)})",
+                [{c: run.get(c) for c in RUN_COLUMNS} for run in runs if run.get("runId")]
+            )
+        
+        self.legacy_index_file.rename(self.legacy_index_file.with_name("index.json.migrated"))
+        print(f"[STORAGE] Migrated {len(runs)} runs from index.json to {self.index_file.name}", file=sys.stderr)
+    
+    def _index_run(self, run_entry: Dict[str, Any]):
+        """Insert or update a run in the index (one transaction)
+        
+        Pin state is kept, and results older than the indexed ones (e.g. an
+        earlier iteration ingested late) do not replace them.
+        """
+        with self.db:
+            self.db.execute(
+                f"INSERT INTO runs ({', '.join(RUN_COLUMNS)}) "
+                f"VALUES ({', '.join(':' + c for c in RUN_COLUMNS)}) "
+                f"ON CONFLICT(runId) DO UPDATE SET "
+                + ", ".join(f"{c} = excluded.{c}" for c in RUN_COLUMNS if c != "runId")
+                + " WHERE excluded.timestamp >= runs.timestamp",
+                run_entry
+            )
     
     def create_run_directory(self, run_id: str) -> Path:
         """Create directory for a test run"""
@@ -54,12 +617,21 @@ class ResultStorage:
         run_dir = self.create_run_directory(run_id)
         
         # Store test results
-        results_file = run_dir / "test-results.json"
-        with open(results_file, 'w') as f:
-            json.dump(results, f, indent=2)
+        write_artifact(run_dir / "test-results.json", results, self.compression)
         
-        # Update index
-        run_entry = {
+        # Add to index (latest results for a run replace earlier ones)
+        self._index_run(self._run_entry(run_id, results))
+        
+        return run_dir
+    
+    def _run_entry(self, run_id: str, results: Dict[str, Any]) -> Dict[str, Any]:
+        """Index row for a run from its (latest) test results"""
+        run_dir = self.base_dir / run_id
+        try:
+            directory = str(run_dir.relative_to(self.repo_root))
+        except ValueError:
+            directory = str(run_dir)
+        return {
             "runId": run_id,
             "timestamp": results.get("testRun", {}).get("timestamp", datetime.utcnow().isoformat() + "Z"),
             "testType": results.get("testRun", {}).get("type", "unknown"),
@@ -67,52 +639,76 @@ class ResultStorage:
             "passRate": results.get("summary", {}).get("passRate", 0.0),
             "failureCount": results.get("summary", {}).get("failureCount", 0),
             "totalTests": results.get("results", {}).get("total", 0),
-            "directory": str(run_dir.relative_to(self.base_dir.parent.parent.parent))
+            "directory": directory
         }
+    
+    def index_results(self, run_id: str, results: Dict[str, Any], iteration: int = None):
+        """Index test results: the run's row and, for an iteration, failures and per-test history"""
+        self._index_run(self._run_entry(run_id, results))
+        if iteration is not None:
+            self.record_test_history(run_id, iteration, results.get("tests", []),
+                                     results.get("testRun", {}).get("timestamp"))
+            self.index_failures(run_id, iteration, results.get("failures", []))
+    
+    def ingest_artifact(self, run_id: str, path) -> Dict[str, Any]:
+        """Store one artifact under a run and index what it contains
         
-        # Add to index (prepend to keep recent first)
-        self.index["runs"].insert(0, run_entry)
+        Test results update the run's index row and, for iteration files,
+        the failure index and per-test history; fix artifacts are attached to
+        the failures they address. Files outside the run directory are copied
+        into it (compressed).
+        """
+        path = Path(path)
+        match = ARTIFACT_NAME.match(path.name)
+        if not match:
+            raise ValueError(f"Not a run artifact: {path.name}")
+        kind = match.group(1)
+        iteration = int(match.group(2)) if match.group(2) else None
+        data = read_artifact(path)
         
-        # Keep only last 100 runs in index
-        if len(self.index["runs"]) > 100:
-            self.index["runs"] = self.index["runs"][:100]
+        run_dir = self.create_run_directory(run_id)
+        if path.resolve().parent != run_dir.resolve():
+            name = f"{kind}-iter-{iteration}.json" if iteration is not None else f"{kind}.json"
+            write_artifact(run_dir / name, data, self.compression)
         
-        self._save_index()
+        if kind == "test-results":
+            self.index_results(run_id, data, iteration)
+        elif kind == "fixes" and iteration is not None:
+            self.attach_fixes(run_id, iteration, data)
         
-        return run_dir
+        return {"runId": run_id, "file": str(path), "kind": kind, "iteration": iteration}
+    
+    def ingest_run(self, run_dir) -> List[Dict[str, Any]]:
+        """Ingest every artifact of a run directory (the run ID is the directory name)"""
+        run_dir = Path(run_dir)
+        artifacts = []
+        for path in run_dir.iterdir():
+            match = ARTIFACT_NAME.match(path.name)
+            if match and path.is_file():
+                iteration = int(match.group(2)) if match.group(2) else -1
+                artifacts.append((iteration, INGEST_ORDER.index(match.group(1)), path))
+        return [self.ingest_artifact(run_dir.name, path) for _, _, path in sorted(artifacts)]
     
     def store_analysis(self, run_id: str, analysis: Dict[str, Any]) -> Path:
         """Store failure analysis"""
         run_dir = self.base_dir / run_id
         run_dir.mkdir(parents=True, exist_ok=True)
         
-        analysis_file = run_dir / "failures-analysis.json"
-        with open(analysis_file, 'w') as f:
-            json.dump(analysis, f, indent=2)
-        
-        return analysis_file
+        return write_artifact(run_dir / "failures-analysis.json", analysis, self.compression)
     
     def store_fixes(self, run_id: str, fixes: List[Dict[str, Any]]) -> Path:
         """Store applied fixes"""
         run_dir = self.base_dir / run_id
         run_dir.mkdir(parents=True, exist_ok=True)
         
-        fixes_file = run_dir / "fixes-applied.json"
-        with open(fixes_file, 'w') as f:
-            json.dump({"fixes": fixes, "count": len(fixes)}, f, indent=2)
-        
-        return fixes_file
+        return write_artifact(run_dir / "fixes-applied.json", {"fixes": fixes, "count": len(fixes)}, self.compression)
     
     def store_progress(self, run_id: str, progress: List[Dict[str, Any]]) -> Path:
         """Store progress log"""
         run_dir = self.base_dir / run_id
         run_dir.mkdir(parents=True, exist_ok=True)
         
-        progress_file = run_dir / "progress-log.json"
-        with open(progress_file, 'w') as f:
-            json.dump({"iterations": progress, "count": len(progress)}, f, indent=2)
-        
-        return progress_file
+        return write_artifact(run_dir / "progress-log.json", {"iterations": progress, "count": len(progress)}, self.compression)
     
     def store_report(self, run_id: str, report: str) -> Path:
         """Store human-readable report"""
@@ -136,29 +732,671 @@ class ResultStorage:
         
         return pr_file
     
+    def store_iteration(self, run_id: str, iteration: int, kind: str, document: Dict[str, Any]) -> Path:
+        """Store one iteration's document as a delta against earlier iterations
+        
+        Failure records are kept once per run; the iteration itself only
+        records which failures it contains (in order). Per-test results are
+        left out: they live in the test history (recorded here if they were
+        not yet), so manifests do not grow with the suite. Any full copy of
+        the same artifact is replaced.
+        """
+        run_dir = self.create_run_directory(run_id)
+        refs, volatile = FailureRecordStore(run_dir).put(document.get("failures", []))
+        delta = {key: value for key, value in document.items() if key != "tests"}
+        delta["failures"] = {FAILURE_REFS: refs, FAILURE_VOLATILE: volatile}
+        if "tests" in document:
+            self.record_test_history(run_id, iteration, document["tests"],
+                                     document.get("testRun", {}).get("timestamp"))
+        
+        manifest = write_artifact(run_dir / f"{kind}-iter-{iteration}.delta.json", delta, self.compression)
+        _remove_other_variants(run_dir / f"{kind}-iter-{iteration}", None)
+        return manifest
+    
+    def load_iteration(self, run_id: str, iteration: int, kind: str) -> Dict[str, Any]:
+        """Load the full document for an iteration, delta-encoded or not"""
+        return read_artifact(self.base_dir / run_id / f"{kind}-iter-{iteration}.json")
+    
+    def dedup_iteration(self, run_id: str, iteration: int, kinds: List[str] = None) -> List[Path]:
+        """Convert an iteration's full artifacts (written by the loop) into deltas"""
+        run_dir = self.base_dir / run_id
+        manifests = []
+        for kind in kinds or DELTA_KINDS:
+            full = resolve_artifact(run_dir / f"{kind}-iter-{iteration}.json")
+            if full is None or _is_delta(full):
+                continue
+            manifests.append(self.store_iteration(run_id, iteration, kind, read_artifact(full)))
+        return manifests
+    
+    @staticmethod
+    def _fixes_by_failure(fixes: Optional[Dict[str, Any]]) -> Dict[str, List[Dict[str, Any]]]:
+        fixes_by_failure = {}
+        for fix in (fixes or {}).get("applied", []):
+            result = fix.get("result", {})
+            fixes_by_failure.setdefault(fix.get("failureId"), []).append({
+                "type": result.get("fixType") or fix.get("fix", {}).get("type"),
+                "file": result.get("file") or fix.get("fix", {}).get("file"),
+                "description": fix.get("fix", {}).get("description")
+            })
+        return fixes_by_failure
+    
+    def attach_fixes(self, run_id: str, iteration: int, fixes: Dict[str, Any]) -> int:
+        """Record the fixes applied in an iteration on its already indexed failures"""
+        fixes_by_failure = self._fixes_by_failure(fixes)
+        with self.db:
+            for failure_id, applied in fixes_by_failure.items():
+                self.db.execute(
+                    "UPDATE failure_occurrences SET fixes = ? WHERE runId = ? AND iteration = ? AND failureId = ?",
+                    (json.dumps(applied), run_id, iteration, failure_id)
+                )
+        return len(fixes_by_failure)
+    
+    def index_failures(self, run_id: str, iteration: int, failures: List[Dict[str, Any]],
+                       fixes: Optional[Dict[str, Any]] = None) -> int:
+        """Add an iteration's failures (and the fixes applied for them) to the inverted index"""
+        fixes_by_failure = self._fixes_by_failure(fixes)
+        
+        with self.db:
+            self.db.execute("INSERT OR IGNORE INTO indexed_iterations (runId, iteration) VALUES (?, ?)",
+                            (run_id, iteration))
+            for failure in failures:
+                failure_id = failure.get("id")
+                if not failure_id:
+                    continue
+                error_type = failure.get("errorType", "")
+                message = failure.get("errorMessage", "")
+                signature = stack_signature(error_type, failure.get("stackTrace", ""))
+                applied = fixes_by_failure.get(failure_id)
+                
+                self.db.execute(
+                    "INSERT INTO failure_occurrences (runId, iteration, failureId, errorType, message, signature, fixes) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?) "
+                    "ON CONFLICT(runId, iteration, failureId) DO UPDATE SET "
+                    "errorType = excluded.errorType, message = excluded.message, "
+                    "signature = excluded.signature, fixes = COALESCE(excluded.fixes, fixes)",
+                    (run_id, iteration, failure_id, error_type, message[:2000], signature,
+                     json.dumps(applied) if applied else None)
+                )
+                occurrence = self.db.execute(
+                    "SELECT id FROM failure_occurrences WHERE runId = ? AND iteration = ? AND failureId = ?",
+                    (run_id, iteration, failure_id)
+                ).fetchone()["id"]
+                
+                tokens = set(message_tokens(f"{error_type} {message}"))
+                if signature:
+                    tokens.add(f"sig:{signature}")
+                self.db.execute("DELETE FROM failure_tokens WHERE occurrence = ?", (occurrence,))
+                self.db.executemany("INSERT INTO failure_tokens (token, occurrence) VALUES (?, ?)",
+                                    [(token, occurrence) for token in tokens])
+        return len(failures)
+    
+    def index_iteration(self, run_id: str, iteration: int) -> int:
+        """Index a stored iteration: failures for search, tests for history"""
+        run_dir = self.base_dir / run_id
+        results = read_artifact(run_dir / f"test-results-iter-{iteration}.json")
+        try:
+            fixes = read_artifact(run_dir / f"fixes-iter-{iteration}.json")
+        except (OSError, ValueError):
+            fixes = None
+        self.record_test_history(run_id, iteration, results.get("tests", []),
+                                 results.get("testRun", {}).get("timestamp"))
+        return self.index_failures(run_id, iteration, results.get("failures", []), fixes)
+    
+    def search_failures(self, query: str = None, failure_id: str = None, signature: str = None,
+                        match_all: bool = True, limit: int = 20, run_id: str = None,
+                        offset: int = 0) -> List[Dict[str, Any]]:
+        """Find earlier occurrences of a failure
+        
+        ``query`` is tokenized like the indexed messages; with ``match_all``
+        every token must match, otherwise results are ranked by the number of
+        matching tokens. Each hit carries the fixes applied for it and whether
+        the failure was gone in the run's next indexed iteration.
+        """
+        return list(self.iter_failures(query, failure_id, signature, match_all, limit, run_id, offset))
+    
+    def iter_failures(self, query: str = None, failure_id: str = None, signature: str = None,
+                      match_all: bool = True, limit: int = None, run_id: str = None, offset: int = 0):
+        """Stream indexed failure occurrences (see search_failures)"""
+        tokens = message_tokens(query) if query else []
+        if signature:
+            tokens.append(f"sig:{signature}")
+        
+        clauses = []
+        params = []
+        sql = "SELECT o.*, 0 AS score FROM failure_occurrences o"
+        if tokens:
+            sql = (
+                "SELECT o.*, hits.score FROM ("
+                "SELECT occurrence, COUNT(*) AS score FROM failure_tokens "
+                f"WHERE token IN ({', '.join('?' * len(tokens))}) GROUP BY occurrence"
+                + (" HAVING COUNT(*) = ?" if match_all else "") +
+                ") hits JOIN failure_occurrences o ON o.id = hits.occurrence"
+            )
+            params += tokens + ([len(tokens)] if match_all else [])
+        if failure_id:
+            clauses.append("o.failureId = ?")
+            params.append(failure_id)
+        if run_id:
+            clauses.append("o.runId = ?")
+            params.append(run_id)
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY score DESC, o.runId DESC, o.iteration DESC LIMIT ? OFFSET ?"
+        params += [limit if limit is not None else -1, offset]
+        
+        for row in self.db.execute(sql, params):
+            hit = dict(row)
+            hit["fixes"] = json.loads(hit["fixes"]) if hit["fixes"] else []
+            hit["resolved"] = self._resolved_after(hit["runId"], hit["iteration"], hit["failureId"])
+            del hit["id"]
+            yield hit
+    
+    def similar_failures(self, failure: Dict[str, Any], limit: int = 10) -> List[Dict[str, Any]]:
+        """Earlier occurrences of the same stack signature, else of similar messages"""
+        signature = stack_signature(failure.get("errorType", ""), failure.get("stackTrace", ""))
+        if signature:
+            hits = self.search_failures(signature=signature, limit=limit)
+            if hits:
+                return hits
+        text = f"{failure.get('errorType', '')} {failure.get('errorMessage', '')}"
+        return self.search_failures(text, match_all=False, limit=limit)
+    
+    def record_test_history(self, run_id: str, iteration: int, tests: List[Dict[str, Any]],
+                            timestamp: str = None) -> int:
+        """Append one iteration's test statuses and durations to the per-test history"""
+        timestamp = timestamp or datetime.utcnow().isoformat() + "Z"
+        with self.db:
+            if self.db.execute("SELECT 1 FROM history_samples WHERE runId = ? AND iteration = ?",
+                               (run_id, iteration)).fetchone():
+                return 0
+            seq = self.db.execute(
+                "INSERT INTO history_samples (runId, iteration, timestamp) VALUES (?, ?, ?)",
+                (run_id, iteration, timestamp)
+            ).lastrowid
+            chunk = seq // HISTORY_CHUNK
+            
+            for test in tests:
+                test_id = test.get("id")
+                if not test_id:
+                    continue
+                row = self.db.execute(
+                    "SELECT seqs, statuses, durations FROM test_history WHERE testId = ? AND chunk = ?",
+                    (test_id, chunk)
+                ).fetchone()
+                seqs, statuses, durations = array("q"), array("b"), array("f")
+                if row:
+                    seqs.frombytes(row["seqs"])
+                    statuses.frombytes(row["statuses"])
+                    durations.frombytes(row["durations"])
+                seqs.append(seq)
+                statuses.append(STATUS_CODES.get(test.get("status"), STATUS_CODES["error"]))
+                durations.append(float(test.get("duration") or 0.0))
+                self.db.execute(
+                    "INSERT OR REPLACE INTO test_history (testId, chunk, seqs, statuses, durations) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (test_id, chunk, seqs.tobytes(), statuses.tobytes(), durations.tobytes())
+                )
+        return len(tests)
+    
+    def _sample_seqs(self, since: str = None, until: str = None) -> List[int]:
+        """Seqs of the samples taken in [since, until), ascending
+        
+        Seqs follow insertion order, not time (runs can be ingested late), so
+        the matching samples are selected exactly rather than as a seq range.
+        """
+        clauses = []
+        params = []
+        if since:
+            clauses.append("timestamp >= ?")
+            params.append(since)
+        if until:
+            clauses.append("timestamp < ?")
+            params.append(until)
+        sql = "SELECT seq FROM history_samples"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        return [row["seq"] for row in self.db.execute(sql + " ORDER BY seq", params)]
+    
+    def iter_test_series(self, test_ids: List[str] = None, since: str = None, until: str = None):
+        """Yield a TestSeries per test, restricted to samples in [since, until)"""
+        seqs = self._sample_seqs(since, until)
+        if not seqs:
+            return
+        # Without bounds every sample matches
+        wanted = set(seqs) if since or until else None
+        sql = ("SELECT testId, seqs, statuses, durations FROM test_history "
+               "WHERE chunk BETWEEN ? AND ?")
+        params = [seqs[0] // HISTORY_CHUNK, seqs[-1] // HISTORY_CHUNK]
+        if test_ids:
+            sql += f" AND testId IN ({', '.join('?' * len(test_ids))})"
+            params += list(test_ids)
+        sql += " ORDER BY testId, chunk"
+        
+        def finished(series: Optional[TestSeries]) -> Optional[TestSeries]:
+            if series is not None and wanted is not None:
+                series = series.select(wanted)
+            return series if series is not None and series.seqs else None
+        
+        series = None
+        for row in self.db.execute(sql, params):
+            if series is None or series.test_id != row["testId"]:
+                done = finished(series)
+                if done:
+                    yield done
+                series = TestSeries(row["testId"])
+            series.extend(row["seqs"], row["statuses"], row["durations"])
+        done = finished(series)
+        if done:
+            yield done
+    
+    def _samples_by_seq(self, seqs) -> Dict[int, Dict[str, Any]]:
+        wanted = sorted(set(seqs))
+        samples = {}
+        for start in range(0, len(wanted), 500):
+            batch = wanted[start:start + 500]
+            for row in self.db.execute(
+                f"SELECT * FROM history_samples WHERE seq IN ({', '.join('?' * len(batch))})", batch
+            ):
+                samples[row["seq"]] = dict(row)
+        return samples
+    
+    def test_history(self, test_id: str, since: str = None, until: str = None) -> List[Dict[str, Any]]:
+        """Status and duration of a test in every sample in range, oldest first"""
+        for series in self.iter_test_series([test_id], since, until):
+            samples = self._samples_by_seq(series.seqs)
+            return [
+                {
+                    "runId": samples[seq]["runId"],
+                    "iteration": samples[seq]["iteration"],
+                    "timestamp": samples[seq]["timestamp"],
+                    "status": STATUS_NAMES[status],
+                    "duration": round(duration, 3)
+                }
+                for seq, status, duration in zip(series.seqs, series.statuses, series.durations)
+            ]
+        return []
+    
+    def first_failure(self, test_id: str) -> Optional[Dict[str, Any]]:
+        """Start of the test's most recent failing streak (None if it never failed)"""
+        history = self.test_history(test_id)
+        start = None
+        for i in range(len(history) - 1, -1, -1):
+            status = history[i]["status"]
+            if status in ("failed", "error"):
+                start = i
+            elif status in ("passed", "flaky") and start is not None:
+                break
+        return history[start] if start is not None else None
+    
+    def slowest_tests(self, limit: int = 20, since: str = None, until: str = None) -> List[Dict[str, Any]]:
+        """Tests with the highest mean duration in range"""
+        ranked = [
+            {"testId": s.test_id, "meanDuration": round(s.mean_duration(), 3),
+             "maxDuration": round(max(s.durations), 3), "samples": len(s.seqs)}
+            for s in self.iter_test_series(since=since, until=until)
+        ]
+        ranked.sort(key=lambda t: t["meanDuration"], reverse=True)
+        return ranked[:limit]
+    
+    def degraded_tests(self, limit: int = 20, since: str = None, until: str = None,
+                       min_samples: int = 4) -> List[Dict[str, Any]]:
+        """Tests whose second half of samples in range is slower or fails more than the first half"""
+        ranked = []
+        for series in self.iter_test_series(since=since, until=until):
+            n = len(series.seqs)
+            if n < min_samples:
+                continue
+            half = n // 2
+            before, after = series.mean_duration(0, half), series.mean_duration(half)
+            ranked.append({
+                "testId": series.test_id,
+                "durationBefore": round(before, 3),
+                "durationAfter": round(after, 3),
+                "durationRatio": round(after / before, 3) if before > 0 else None,
+                "failureRateBefore": round(series.failure_rate(0, half), 3),
+                "failureRateAfter": round(series.failure_rate(half), 3),
+                "samples": n
+            })
+        ranked.sort(key=lambda t: (t["failureRateAfter"] - t["failureRateBefore"],
+                                   (t["durationRatio"] or 1.0)), reverse=True)
+        return ranked[:limit]
+    
+    def export_test_history(self, out, test_ids: List[str] = None, since: str = None, until: str = None) -> int:
+        """Write history samples in range as CSV to a text stream; returns the row count"""
+        writer = csv.writer(out)
+        writer.writerow(["testId", "runId", "iteration", "timestamp", "status", "duration"])
+        samples = self._samples_by_seq(self._sample_seqs(since, until))
+        rows = 0
+        for series in self.iter_test_series(test_ids, since, until):
+            for seq, status, duration in zip(series.seqs, series.statuses, series.durations):
+                sample = samples[seq]
+                writer.writerow([series.test_id, sample["runId"], sample["iteration"], sample["timestamp"],
+                                 STATUS_NAMES[status], round(duration, 3)])
+                rows += 1
+        return rows
+    
+    def _resolved_after(self, run_id: str, iteration: int, failure_id: str) -> Optional[bool]:
+        """True if the next indexed iteration of the run no longer had the failure; None if unknown"""
+        row = self.db.execute(
+            "SELECT MIN(iteration) AS next FROM indexed_iterations WHERE runId = ? AND iteration > ?",
+            (run_id, iteration)
+        ).fetchone()
+        if row["next"] is None:
+            return None
+        still = self.db.execute(
+            "SELECT 1 FROM failure_occurrences WHERE runId = ? AND iteration = ? AND failureId = ?",
+            (run_id, row["next"], failure_id)
+        ).fetchone()
+        return still is None
+    
+    def _ensure_indexed(self, run_id: str) -> bool:
+        """Index a run directory that never stored results (e.g. runner output)"""
+        if self.get_run(run_id) is not None:
+            return True
+        run_dir = self.base_dir / run_id
+        if not run_dir.is_dir():
+            return False
+        
+        started = datetime.fromtimestamp(run_dir.stat().st_mtime, timezone.utc)
+        run_entry = {column: None for column in RUN_COLUMNS}
+        run_entry.update({
+            "runId": run_id,
+            "timestamp": started.isoformat().replace("+00:00", "Z"),
+            "directory": str(run_dir.relative_to(self.repo_root))
+        })
+        self._index_run(run_entry)
+        return True
+    
+    def set_pinned(self, run_id: str, pinned: bool = True) -> bool:
+        """Pin (or unpin) a run so retention never compacts it"""
+        if not self._ensure_indexed(run_id):
+            return False
+        with self.db:
+            self.db.execute("UPDATE runs SET pinned = ? WHERE runId = ?", (int(pinned), run_id))
+        return True
+    
+    def mark_active(self, run_id: str):
+        """Mark a run as in progress until the returned handle is closed (or the process exits)
+        
+        The mark is an flock on <run>/.active.lock, so it vanishes with a
+        crashed process instead of protecting a dead run forever.
+        """
+        import fcntl
+        
+        handle = open(self.create_run_directory(run_id) / ACTIVE_LOCK, "w")
+        fcntl.flock(handle, fcntl.LOCK_EX)
+        return handle
+    
+    def is_active(self, run_id: str) -> bool:
+        """True while some process holds the run's mark_active() lock"""
+        import fcntl
+        
+        lock_path = self.base_dir / run_id / ACTIVE_LOCK
+        if not lock_path.exists():
+            return False
+        with open(lock_path, "r") as lock:
+            try:
+                fcntl.flock(lock, fcntl.LOCK_SH | fcntl.LOCK_NB)
+            except OSError:
+                return True
+        return False
+    
+    def _runs_on_disk(self) -> List[Dict[str, Any]]:
+        """Run directories under base_dir, joined with their index rows, newest first"""
+        indexed = {row["runId"]: dict(row) for row in self.db.execute("SELECT * FROM runs")}
+        runs = []
+        for entry in os.scandir(self.base_dir):
+            if not entry.is_dir() or not RUN_ID_PATTERN.match(entry.name):
+                continue
+            row = indexed.get(entry.name, {})
+            if row.get("compacted"):
+                continue
+            started = _parse_timestamp(row.get("timestamp")) or datetime.fromtimestamp(entry.stat().st_mtime, timezone.utc)
+            runs.append({
+                "runId": entry.name,
+                "started": started,
+                "pinned": bool(row.get("pinned")),
+                "active": self.is_active(entry.name),
+                "bytes": _tree_size(Path(entry.path))
+            })
+        runs.sort(key=lambda run: run["started"], reverse=True)
+        return runs
+    
+    def _backups_of(self, run_dir: Path) -> List[Path]:
+        """Source .backup files recorded by the run's fix artifacts"""
+        backups = set()
+        for artifact in run_dir.glob("fixes-*.json*"):
+            if ".tmp" in artifact.name:
+                continue
+            try:
+                data = read_artifact(artifact)
+            except (OSError, ValueError, KeyError, RuntimeError):
+                continue
+            for fix in data.get("applied", []) + data.get("fixes", []):
+                if not isinstance(fix, dict):
+                    continue
+                backup = fix.get("result", {}).get("backup") or fix.get("backup")
+                if backup and backup.endswith(".backup"):
+                    backups.add(self.repo_root / backup)
+        return sorted(path for path in backups if path.is_file())
+    
+    def _iterations_of(self, run_id: str, kind: str = "test-results") -> List[int]:
+        """Iteration numbers stored for a run (full or delta artifacts)"""
+        pattern = re.compile(rf"^{re.escape(kind)}-iter-(\d+)\.")
+        run_dir = self.base_dir / run_id
+        if not run_dir.is_dir():
+            return []
+        return sorted({int(m.group(1)) for m in (pattern.match(p.name) for p in run_dir.iterdir()) if m})
+    
+    def _run_summary(self, run_id: str, run_dir: Path) -> Dict[str, Any]:
+        """Summary kept in place of a compacted run"""
+        iterations = self._iterations_of(run_id)
+        summary = {
+            "runId": run_id,
+            "compactedAt": datetime.now(timezone.utc).isoformat().replace("+00:00", "Z"),
+            "index": self.get_run(run_id),
+            "iterations": len(iterations)
+        }
+        if iterations:
+            try:
+                last = self.load_iteration(run_id, iterations[-1], "test-results")
+                summary["finalResults"] = last.get("results", {})
+                summary["finalSummary"] = last.get("summary", {})
+                summary["remainingFailureIds"] = [f.get("id") for f in last.get("failures", [])]
+            except (OSError, ValueError, KeyError, RuntimeError):
+                pass
+        return summary
+    
+    def compact_run(self, run_id: str, dry_run: bool = False) -> Dict[str, Any]:
+        """Reduce a run directory to summary.json plus its reports"""
+        run_dir = self.base_dir / run_id
+        size_before = _tree_size(run_dir)
+        backups = self._backups_of(run_dir)
+        backup_bytes = sum(path.stat().st_size for path in backups)
+        doomed = [p for p in run_dir.rglob("*") if (p.is_file() or p.is_symlink())
+                  and not (p.parent == run_dir and p.name in COMPACT_KEEP)]
+        
+        if dry_run:
+            kept_bytes = sum(p.stat().st_size for p in run_dir.iterdir() if p.name in COMPACT_KEEP and p.is_file())
+            return {"runId": run_id, "filesDeleted": len(doomed), "backupsDeleted": len(backups),
+                    "bytesReclaimed": size_before - kept_bytes + backup_bytes}
+        
+        summary = self._run_summary(run_id, run_dir)
+        for path in backups:
+            path.unlink()
+        for path in doomed:
+            path.unlink()
+        for path in sorted((p for p in run_dir.rglob("*") if p.is_dir()), key=lambda p: len(p.parts), reverse=True):
+            path.rmdir()
+        with open(run_dir / "summary.json", 'w') as f:
+            json.dump(summary, f, indent=2)
+        
+        self._ensure_indexed(run_id)
+        with self.db:
+            self.db.execute("UPDATE runs SET compacted = 1 WHERE runId = ?", (run_id,))
+        
+        return {"runId": run_id, "filesDeleted": len(doomed), "backupsDeleted": len(backups),
+                "bytesReclaimed": size_before - _tree_size(run_dir) + backup_bytes}
+    
+    def gc(self, policy: RetentionPolicy = None, dry_run: bool = False) -> Dict[str, Any]:
+        """Compact runs the retention policy expires; returns what was reclaimed
+        
+        Only one gc runs at a time (flock on .gc.lock); a concurrent call
+        returns immediately with ``skipped`` set.
+        """
+        import fcntl
+        
+        policy = policy or RetentionPolicy.from_env()
+        with open(self.base_dir / ".gc.lock", "w") as lock:
+            try:
+                fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                return {"skipped": "another gc is running", "runsCompacted": 0, "bytesReclaimed": 0}
+            
+            runs = self._runs_on_disk()
+            # A run may have started since it was listed
+            compacted = [self.compact_run(run["runId"], dry_run) for run in
+                         policy.select_expired(runs, datetime.now(timezone.utc))
+                         if not self.is_active(run["runId"])]
+        
+        return {
+            "dryRun": dry_run,
+            "runsScanned": len(runs),
+            "runsCompacted": len(compacted),
+            "filesDeleted": sum(r["filesDeleted"] for r in compacted),
+            "backupsDeleted": sum(r["backupsDeleted"] for r in compacted),
+            "bytesReclaimed": sum(r["bytesReclaimed"] for r in compacted),
+            "runs": compacted
+        }
+    
     def get_run(self, run_id: str) -> Optional[Dict[str, Any]]:
         """Get run information from index"""
-        for run in self.index["runs"]:
-            if run["runId"] == run_id:
-                return run
-        return None
+        row = self.db.execute("SELECT * FROM runs WHERE runId = ?", (run_id,)).fetchone()
+        return dict(row) if row else None
     
     def list_runs(self, limit: int = 10) -> List[Dict[str, Any]]:
         """List recent runs"""
-        return self.index["runs"][:limit]
+        return self.query_runs(limit=limit)
+    
+    def query_runs(self, status: str = None, test_type: str = None, since: str = None, until: str = None,
+                   limit: int = None, offset: int = 0) -> List[Dict[str, Any]]:
+        """Query runs, most recent first (timestamps are ISO-8601 strings)"""
+        return list(self.iter_runs(status, test_type, since, until, limit, offset))
+    
+    def iter_runs(self, status: str = None, test_type: str = None, since: str = None, until: str = None,
+                  limit: int = None, offset: int = 0):
+        """Stream runs matching the filters without loading them all"""
+        clauses = []
+        params = []
+        if status:
+            clauses.append("status = ?")
+            params.append(status)
+        if test_type:
+            clauses.append("testType = ?")
+            params.append(test_type)
+        if since:
+            clauses.append("timestamp >= ?")
+            params.append(since)
+        if until:
+            clauses.append("timestamp < ?")
+            params.append(until)
+        
+        sql = "SELECT * FROM runs"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY timestamp DESC LIMIT ? OFFSET ?"
+        params += [limit if limit is not None else -1, offset]
+        
+        for row in self.db.execute(sql, params):
+            yield dict(row)
+
+
+def write_records(records, fmt: str, out=sys.stdout) -> int:
+    """Stream records as a JSON array, JSON lines or CSV without collecting them"""
+    count = 0
+    writer = None
+    if fmt == "json":
+        out.write("[")
+    for record in records:
+        if fmt == "csv":
+            if writer is None:
+                writer = csv.DictWriter(out, fieldnames=list(record.keys()), extrasaction="ignore")
+                writer.writeheader()
+            writer.writerow({k: json.dumps(v) if isinstance(v, (list, dict)) else v for k, v in record.items()})
+        elif fmt == "jsonl":
+            out.write(json.dumps(record) + "\n")
+        else:
+            out.write(("," if count else "") + "\n  " + json.dumps(record))
+        count += 1
+    if fmt == "json":
+        out.write("\n]\n" if count else "]\n")
+    return count
 
 
 def main():
     """CLI for storage operations"""
+    qa_telemetry.export_at_exit("qa-storage")
+    qa_tracing.trace_at_exit("qa-storage")
+    qa_profiling.from_argv("qa-storage")
     if len(sys.argv) < 2:
-        print("Usage: qa-storage.py <command> [args...]")
+        print("Usage: qa-storage.py <command> [args...] [--profile[=dir]]")
         print("Commands:")
         print("  create <run-id>  - Create run directory")
-        print("  store <run-id> <file> <data> - Store data")
+        print("  store <run-id> <file> - Store and index one artifact (test-results-iter-N.json, fixes-iter-N.json, ...)")
+        print("  ingest <run-dir>... | ingest - - Store and index whole run directories, or artifact paths read from stdin")
+        print("  query [runs|failures] [--status=] [--type=] [--since=] [--until=] [--run=] [--id=] [--text=]")
+        print("        [--limit=N] [--offset=N] [--format=json|jsonl|csv] - Filtered, paginated, streamed query")
         print("  list [limit] - List recent runs")
+        print("  cat <artifact> - Print a (possibly compressed) JSON artifact")
+        print("  compress <file|run-dir>... - Compress plain JSON artifacts (iteration files in a run dir)")
+        print("  dedup <run-id> <iteration> - Store an iteration's results/analysis as deltas")
+        print("  index <run-id> [iteration] - Add failures to the search index (all iterations if omitted)")
+        print("  search <text> [--id=<failure-id>] [--any] [--limit=N] - Find earlier occurrences of a failure")
+        print("  history <test-id> [--since=] [--until=] - Status/duration history of a test")
+        print("  trends slowest|degraded [--limit=N] [--since=] [--until=] - Rank tests over a range")
+        print("  export-history <out.csv|-> [--since=] [--until=] - Export per-test history as CSV")
+        print("  gc [--keep=N] [--max-age-days=D] [--max-size-mb=M] [--dry-run] - Compact expired runs")
+        print("  pin <run-id> | unpin <run-id> - Exclude a run from (or return it to) retention")
         sys.exit(1)
     
     command = sys.argv[1]
+    
+    if command == "cat":
+        if len(sys.argv) < 3:
+            print("Usage: qa-storage.py cat <artifact>")
+            sys.exit(1)
+        try:
+            resolved = resolve_artifact(sys.argv[2])
+            if resolved is not None and not _is_delta(resolved):
+                with open_artifact(resolved) as f:
+                    shutil.copyfileobj(f, sys.stdout)
+            else:
+                json.dump(read_artifact(sys.argv[2]), sys.stdout, indent=2)
+        except (OSError, RuntimeError, KeyError) as e:
+            print(f"Error: {e}", file=sys.stderr)
+            sys.exit(1)
+        return
+    
+    if command == "compress":
+        files = []
+        for arg in sys.argv[2:]:
+            path = Path(arg)
+            if path.is_dir():
+                files.extend(sorted(path.glob("*-iter-*.json")))
+            elif path.exists():
+                files.append(path)
+        
+        count = before = after = 0
+        for path in files:
+            size = path.stat().st_size
+            target = compress_artifact(path)
+            if target:
+                count += 1
+                before += size
+                after += target.stat().st_size
+        print(f"Compressed {count} artifacts: {before} -> {after} bytes", file=sys.stderr)
+        return
+    
     storage = ResultStorage()
     
     if command == "create":
@@ -169,6 +1407,151 @@ def main():
         run_dir = storage.create_run_directory(run_id)
         print(f"Created run directory: {run_dir}")
     
+    elif command == "store":
+        if len(sys.argv) < 4:
+            print("Usage: qa-storage.py store <run-id> <file>")
+            sys.exit(1)
+        try:
+            print(json.dumps(storage.ingest_artifact(sys.argv[2], sys.argv[3])))
+        except (OSError, ValueError, KeyError, RuntimeError) as e:
+            print(f"Error: {e}", file=sys.stderr)
+            sys.exit(1)
+    
+    elif command == "ingest":
+        if len(sys.argv) < 3:
+            print("Usage: qa-storage.py ingest <run-dir>... | ingest -")
+            sys.exit(1)
+        sources = (line.strip() for line in sys.stdin) if sys.argv[2] == "-" else iter(sys.argv[2:])
+        ingested = failed = 0
+        for source in sources:
+            if not source:
+                continue
+            path = Path(source)
+            try:
+                if path.is_dir():
+                    ingested += len(storage.ingest_run(path))
+                else:
+                    storage.ingest_artifact(path.parent.name, path)
+                    ingested += 1
+            except (OSError, ValueError, KeyError, RuntimeError) as e:
+                failed += 1
+                print(f"[STORAGE] Skipped {source}: {e}", file=sys.stderr)
+        print(f"[STORAGE] Ingested {ingested} artifacts ({failed} skipped)", file=sys.stderr)
+        if failed and not ingested:
+            sys.exit(1)
+    
+    elif command == "query":
+        positional = [arg for arg in sys.argv[2:] if not arg.startswith("--")]
+        options = dict(arg[2:].split("=", 1) for arg in sys.argv[2:] if arg.startswith("--") and "=" in arg)
+        target = positional[0] if positional else "runs"
+        limit = int(options["limit"]) if "limit" in options else None
+        offset = int(options.get("offset", 0))
+        fmt = options.get("format", "jsonl")
+        if fmt not in ("json", "jsonl", "csv"):
+            print(f"Unknown format: {fmt} (use json, jsonl or csv)")
+            sys.exit(1)
+        
+        if target == "runs":
+            records = storage.iter_runs(options.get("status"), options.get("type"), options.get("since"),
+                                        options.get("until"), limit, offset)
+        elif target == "failures":
+            records = storage.iter_failures(options.get("text"), failure_id=options.get("id"),
+                                            match_all="--any" not in sys.argv, limit=limit,
+                                            run_id=options.get("run"), offset=offset)
+        else:
+            print(f"Unknown query target: {target} (use runs or failures)")
+            sys.exit(1)
+        count = write_records(records, fmt)
+        print(f"[STORAGE] {count} {target}", file=sys.stderr)
+    
+    elif command == "dedup":
+        if len(sys.argv) < 4:
+            print("Usage: qa-storage.py dedup <run-id> <iteration>")
+            sys.exit(1)
+        for manifest in storage.dedup_iteration(sys.argv[2], int(sys.argv[3])):
+            print(f"Stored delta: {manifest}")
+    
+    elif command == "index":
+        if len(sys.argv) < 3:
+            print("Usage: qa-storage.py index <run-id> [iteration]")
+            sys.exit(1)
+        run_id = sys.argv[2]
+        if len(sys.argv) > 3:
+            iterations = [int(sys.argv[3])]
+        else:
+            iterations = storage._iterations_of(run_id)
+        indexed = sum(storage.index_iteration(run_id, iteration) for iteration in iterations)
+        print(f"Indexed {indexed} failures from {len(iterations)} iterations of {run_id}")
+    
+    elif command == "search":
+        text = " ".join(arg for arg in sys.argv[2:] if not arg.startswith("--"))
+        options = dict(arg[2:].split("=", 1) for arg in sys.argv[2:] if arg.startswith("--") and "=" in arg)
+        hits = storage.search_failures(
+            text or None,
+            failure_id=options.get("id"),
+            signature=options.get("signature"),
+            match_all="--any" not in sys.argv,
+            limit=int(options.get("limit", 20))
+        )
+        print(json.dumps(hits, indent=2))
+    
+    elif command in ("history", "trends", "export-history"):
+        positional = [arg for arg in sys.argv[2:] if not arg.startswith("--")]
+        options = dict(arg[2:].split("=", 1) for arg in sys.argv[2:] if arg.startswith("--") and "=" in arg)
+        if not positional:
+            print(f"Usage: qa-storage.py {command} <{'test-id' if command == 'history' else 'mode|out'}> ...")
+            sys.exit(1)
+        since, until = options.get("since"), options.get("until")
+        
+        if command == "history":
+            print(json.dumps({
+                "testId": positional[0],
+                "firstFailure": storage.first_failure(positional[0]),
+                "history": storage.test_history(positional[0], since, until)
+            }, indent=2))
+        elif command == "trends":
+            limit = int(options.get("limit", 20))
+            if positional[0] == "slowest":
+                print(json.dumps(storage.slowest_tests(limit, since, until), indent=2))
+            elif positional[0] == "degraded":
+                print(json.dumps(storage.degraded_tests(limit, since, until), indent=2))
+            else:
+                print(f"Unknown trend: {positional[0]} (use slowest or degraded)")
+                sys.exit(1)
+        else:
+            if positional[0] == "-":
+                rows = storage.export_test_history(sys.stdout, since=since, until=until)
+            else:
+                with open(positional[0], "w", newline="") as out:
+                    rows = storage.export_test_history(out, since=since, until=until)
+            print(f"[STORAGE] Exported {rows} history rows", file=sys.stderr)
+    
+    elif command == "gc":
+        policy = RetentionPolicy.from_env()
+        dry_run = False
+        for arg in sys.argv[2:]:
+            if arg.startswith("--keep="):
+                policy.keep_runs = max(int(arg.split("=", 1)[1]), 1)
+            elif arg.startswith("--max-age-days="):
+                policy.max_age_days = float(arg.split("=", 1)[1])
+            elif arg.startswith("--max-size-mb="):
+                policy.max_total_bytes = int(float(arg.split("=", 1)[1]) * 1024 * 1024)
+            elif arg == "--dry-run":
+                dry_run = True
+        report = storage.gc(policy, dry_run=dry_run)
+        print(json.dumps(report, indent=2))
+        print(f"[STORAGE] {'Would reclaim' if dry_run else 'Reclaimed'} {report['bytesReclaimed']} bytes "
+              f"from {report['runsCompacted']} runs", file=sys.stderr)
+    
+    elif command in ("pin", "unpin"):
+        if len(sys.argv) < 3:
+            print(f"Usage: qa-storage.py {command} <run-id>")
+            sys.exit(1)
+        if not storage.set_pinned(sys.argv[2], command == "pin"):
+            print(f"Run not found: {sys.argv[2]}")
+            sys.exit(1)
+        print(f"{'Pinned' if command == 'pin' else 'Unpinned'} run: {sys.argv[2]}")
+    
     elif command == "list":
         limit = int(sys.argv[2]) if len(sys.argv) > 2 else 10
         runs = storage.list_runs(limit)
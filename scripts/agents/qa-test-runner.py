@@ -0,0 +1,427 @@
+#!/usr/bin/env python3
+"""
+Test Runner for Autonomous Testing
+Runs the Docker test containers concurrently, streaming their logs and pulling each job's results as it exits
+"""
+
+import asyncio
+import json
+import os
+import shutil
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable, Dict, List, Any, Optional
+
+import qa_profiling
+
+SCRIPT_DIR = Path(__file__).resolve().parent
+REPO_ROOT = SCRIPT_DIR.parent.parent
+DOCKER_DIR = REPO_ROOT / "docker"
+COMPOSE_FILE = DOCKER_DIR / "docker-compose.test.yml"
+
+INFRASTRUCTURE = ["mongodb-test", "kafka-test", "zookeeper-test", "opensearch-test"]
+APPLICATION_SERVICES = ["core-api-test", "blob-storage-test"]
+# Same services, in the same order, as the unit-tests-runner loop in docker-compose.test.yml
+UNIT_TEST_SERVICES = [
+    "core-api", "blob-storage", "chemical-parser", "chemical-properties", "reaction-parser", "crystal-parser",
+    "spectra-parser", "imaging", "office-processor", "metadata-processing", "indexing"
+]
+HEALTH_TIMEOUT = 60
+CONTAINER_RESULTS = "/workspace/test-results"
+TIMEOUT_EXIT_CODE = 124  # What timeout(1) returns, as the shell runner reported
+CANCELLED_EXIT_CODE = 130  # As for SIGINT
+
+# Builds shared models and test utilities into the shared Maven cache before any service job
+PREPARE_COMMAND = (
+    "echo 'Building shared models first...' && "
+    "cd /workspace/shared/models && mkdir -p target && "
+    "(mvn clean install -DskipTests && echo 'shared-models: BUILD SUCCESS' "
+    "|| (echo 'shared-models: BUILD FAILURE' && exit 1)) && "
+    "echo 'Building test-utilities...' && "
+    "cd /workspace/tests/utils && mkdir -p target && "
+    "(mvn clean install -DskipTests && echo 'test-utilities: BUILD SUCCESS' "
+    "|| (echo 'test-utilities: BUILD FAILURE' && exit 1))"
+)
+# One service per container; reports land where the sequential runner put them
+UNIT_TEST_COMMAND = (
+    "echo 'Testing service: {service}' && "
+    "cd /workspace/services/{service} && mkdir -p target/classes target/test-classes && "
+    "if mvn test -Dmaven.test.failure.ignore=true; then echo '{service}: BUILD SUCCESS'; "
+    "else echo '{service}: BUILD FAILURE'; fi; "
+    "rm -rf " + CONTAINER_RESULTS + "/{results} && "
+    "cp -r target/surefire-reports " + CONTAINER_RESULTS + "/{results}/ 2>/dev/null || true"
+)
+
+# Colors
+GREEN = "\033[0;32m"
+YELLOW = "\033[1;33m"
+BLUE = "\033[0;34m"
+RED = "\033[0;31m"
+NC = "\033[0m"
+
+
+# All progress goes to stderr; stdout only carries the run directory
+def print_info(message: str):
+    print(f"{BLUE}[TEST RUNNER]{NC} {message}", file=sys.stderr, flush=True)
+
+
+def print_success(message: str):
+    print(f"{GREEN}[TEST RUNNER]{NC} {message}", file=sys.stderr, flush=True)
+
+
+def print_warn(message: str):
+    print(f"{YELLOW}[TEST RUNNER]{NC} {message}", file=sys.stderr, flush=True)
+
+
+def print_error(message: str):
+    print(f"{RED}[TEST RUNNER]{NC} {message}", file=sys.stderr, flush=True)
+
+
+def _utc(timestamp: float) -> str:
+    return datetime.fromtimestamp(timestamp, timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+class TestRunner:
+    """Run one test type in Docker and lay the results out for the parser
+    
+    Produces <output-dir>/<run-id>/ with execution.log, logs/<job>.log,
+    results/<job results>/ and metadata.json, the layout the parser expects.
+    Unit tests run one container per service (``parallel`` at a time) after a
+    shared build; integration and e2e tests keep their single runner container.
+    ``on_results(path)`` is called with each job's results directory as soon as
+    that job's container has exited and its results are copied out. The run
+    directory is created up front, so one runner does one run.
+    """
+    
+    def __init__(self, output_dir: str, test_type: str = "all", timeout: int = 3600,
+                 parallel: Optional[int] = None, on_results: Optional[Callable[[Path], None]] = None):
+        self.output_dir = Path(output_dir)
+        self.test_type = test_type
+        self.timeout = timeout
+        self.parallel = parallel or int(os.environ.get("QA_TEST_PARALLEL", 0)) or max(1, (os.cpu_count() or 2) // 2)
+        self.on_results = on_results
+        self.run_id = None
+        self.run_dir = None
+        self.jobs = []
+        self._containers = set()
+        # Set by cancel() from another thread; _loop and _jobs_task belong to run()
+        self._cancelled = False
+        self._loop = None
+        self._jobs_task = None
+        self._compose = ["docker-compose"] if shutil.which("docker-compose") else ["docker", "compose"]
+        self._new_run_dir()
+    
+    def _new_run_dir(self):
+        # The orchestrator runs every iteration in one process, so the pid alone is not unique
+        while True:
+            self.run_id = f"{datetime.now().strftime('%Y%m%d-%H%M%S')}-{os.getpid()}"
+            self.run_dir = self.output_dir / self.run_id
+            if not self.run_dir.exists():
+                break
+            time.sleep(1 - time.time() % 1)
+        self.results_dir = self.run_dir / "results"
+        self.logs_dir = self.run_dir / "logs"
+        self.results_dir.mkdir(parents=True)
+        self.logs_dir.mkdir()
+        self.execution_log = self.run_dir / "execution.log"
+    
+    def _log(self, text: str):
+        with open(self.execution_log, "a", encoding="utf-8") as log:
+            log.write(text if text.endswith("\n") else text + "\n")
+    
+    def _compose_command(self, *args: str, profiles: List[str] = ()) -> List[str]:
+        command = self._compose + ["-f", str(COMPOSE_FILE)]
+        for profile in profiles:
+            command += ["--profile", profile]
+        return command + list(args)
+    
+    async def _exec(self, *command: str, log: bool = True) -> tuple:
+        """Run a command to completion; returns (exit code, combined output)"""
+        process = await asyncio.create_subprocess_exec(
+            *command, cwd=str(DOCKER_DIR), stdin=asyncio.subprocess.DEVNULL,
+            stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.STDOUT
+        )
+        output, _ = await process.communicate()
+        output = output.decode("utf-8", errors="replace")
+        if log and output.strip():
+            self._log(output)
+        return process.returncode, output
+    
+    def plan(self) -> tuple:
+        """(jobs that must succeed first, jobs that run concurrently)"""
+        services = [s for s in UNIT_TEST_SERVICES if (REPO_ROOT / "services" / s).is_dir()]
+        unit_jobs = [{
+            "name": f"{service}-unit-tests",
+            "service": "unit-tests-runner",
+            "profile": "unit-tests",
+            "command": UNIT_TEST_COMMAND.format(service=service, results=f"{service}-unit-tests"),
+            "results": f"{service}-unit-tests"
+        } for service in services]
+        prepare = [{
+            "name": "prepare",
+            "service": "unit-tests-runner",
+            "profile": "unit-tests",
+            "command": PREPARE_COMMAND,
+            "results": None
+        }]
+        integration = {
+            "name": "integration-tests",
+            "service": "integration-tests-runner",
+            "profile": "integration-tests",
+            "command": None,
+            "results": "integration-tests"
+        }
+        e2e = {
+            "name": "e2e-tests",
+            "service": "e2e-tests-runner",
+            "profile": "e2e-tests",
+            "command": None,
+            "results": "e2e-tests"
+        }
+        
+        if self.test_type == "unit":
+            return prepare, unit_jobs
+        if self.test_type == "integration":
+            return [], [integration]
+        if self.test_type == "e2e":
+            return [], [e2e]
+        return prepare, unit_jobs + [integration]
+    
+    async def _wait_healthy(self, services: List[str], timeout: int = HEALTH_TIMEOUT):
+        pending = [f"leanda-ng-{service}" for service in services]
+        deadline = time.monotonic() + timeout
+        while pending and time.monotonic() < deadline:
+            statuses = await asyncio.gather(*(
+                self._exec("docker", "inspect", "-f", "{{.State.Health.Status}}", name, log=False) for name in pending
+            ))
+            pending = [name for name, (_, status) in zip(pending, statuses) if status.strip() != "healthy"]
+            if pending:
+                await asyncio.sleep(2)
+        if pending:
+            print_warn(f"Not healthy after {timeout}s: {', '.join(pending)}")
+    
+    async def _run_job(self, job: Dict[str, Any]) -> int:
+        """Start a job's container, stream its log, and pull its results once it exits"""
+        name = f"leanda-ng-qa-{self.run_id}-{job['name']}"
+        log_file = self.logs_dir / f"{job['name']}.log"
+        started = time.monotonic()
+        
+        command = self._compose_command("run", "-d", "--name", name, job["service"], profiles=[job["profile"]])
+        if job["command"]:
+            command += ["sh", "-c", job["command"]]
+        code, output = await self._exec(*command, log=False)
+        if code != 0:
+            self._log(output)
+            print_error(f"{job['name']}: could not start container")
+            self.jobs.append({"name": job["name"], "exitCode": code, "duration": 0, "results": None})
+            self._results_ready(job, None)
+            return code
+        self._containers.add(name)
+        await self._container_started(job, name)
+        print_info(f"{job['name']}: started")
+        
+        with open(log_file, "wb") as log:
+            follower = await asyncio.create_subprocess_exec(
+                "docker", "logs", "-f", name, stdout=log, stderr=asyncio.subprocess.STDOUT,
+                stdin=asyncio.subprocess.DEVNULL
+            )
+            code, output = await self._exec("docker", "wait", name, log=False)
+            exit_code = int(output.split()[-1]) if code == 0 and output.split() else 1
+            await follower.wait()
+        
+        results = None
+        if job["results"]:
+            destination = self._results_path(job)
+            destination.parent.mkdir(parents=True, exist_ok=True)
+            await self._exec("docker", "cp", f"{name}:{CONTAINER_RESULTS}/{job['results']}", str(destination),
+                             log=False)
+            results = destination if destination.exists() else None
+        await self._exec("docker", "rm", "-f", name, log=False)
+        self._containers.discard(name)
+        
+        # Whole job logs go into execution.log one after another, so the parser
+        # never sees interleaved lines from concurrent builds
+        self._log(f"=== {job['name']} (exit code {exit_code}) ===")
+        with open(log_file, encoding="utf-8", errors="replace") as log:
+            self._log(log.read())
+        
+        duration = round(time.monotonic() - started, 1)
+        self.jobs.append({
+            "name": job["name"],
+            "exitCode": exit_code,
+            "duration": duration,
+            "results": str(results) if results else None
+        })
+        if exit_code == 0:
+            print_success(f"{job['name']}: finished in {duration}s")
+        else:
+            print_warn(f"{job['name']}: exited with {exit_code} after {duration}s")
+        if results is None and job["results"]:
+            print_warn(f"{job['name']}: no test results found")
+        self._results_ready(job, results)
+        return exit_code
+    
+    async def _container_started(self, job: Dict[str, Any], name: str):
+        """Called once a job's container is running, before its log is followed"""
+    
+    def _results_path(self, job: Dict[str, Any]) -> Path:
+        """Where a job's results are copied out of its container"""
+        return self.results_dir / job["results"]
+    
+    def _results_ready(self, job: Dict[str, Any], results: Optional[Path]):
+        """Called when a job is done, with its results directory (None if it produced none)"""
+        if results is not None and self.on_results:
+            self.on_results(results)
+    
+    def _drain_results(self):
+        """Called once the run is over, for results still held back (jobs cancelled by the timeout)"""
+    
+    async def _run_jobs(self) -> int:
+        code, _ = await self._exec("docker", "info", log=False)
+        if code != 0:
+            print_error("Docker is not running. Please start Docker and try again.")
+            return 1
+        
+        print_info("Starting infrastructure services...")
+        await self._exec(*self._compose_command("up", "-d", *INFRASTRUCTURE))
+        await self._wait_healthy(INFRASTRUCTURE)
+        
+        if self.test_type in ("integration", "e2e", "all"):
+            print_info("Starting service containers...")
+            profile = f"{self.test_type}-tests" if self.test_type != "all" else "integration-tests"
+            await self._exec(*self._compose_command("up", "-d", *APPLICATION_SERVICES, profiles=[profile]))
+            await self._wait_healthy(APPLICATION_SERVICES)
+        
+        prepare, jobs = self.plan()
+        for job in prepare:
+            exit_code = await self._run_job(job)
+            if exit_code != 0:
+                print_error(f"{job['name']} failed; not running tests")
+                return exit_code
+        
+        print_info(f"Running {len(jobs)} test jobs, {self.parallel} at a time...")
+        slots = asyncio.Semaphore(self.parallel)
+        
+        async def run_limited(job):
+            async with slots:
+                return await self._run_job(job)
+        
+        exit_codes = await asyncio.gather(*(run_limited(job) for job in jobs))
+        return next((code for code in exit_codes if code != 0), 0)
+    
+    def cancel(self):
+        """Stop a run() going on in another thread; its containers are cleaned up as on a timeout"""
+        self._cancelled = True
+        loop = self._loop
+        if loop is not None:
+            try:
+                loop.call_soon_threadsafe(self._cancel_jobs)
+            except RuntimeError:
+                pass  # The run is already over
+    
+    def _cancel_jobs(self):
+        if self._jobs_task is not None:
+            self._jobs_task.cancel()
+    
+    async def run(self) -> int:
+        """Run the tests; returns the exit code (non-zero if a job container failed, 124 on timeout,
+        130 when cancelled)"""
+        start_time = time.time()
+        print_info("Starting autonomous test execution")
+        print_info(f"Run ID: {self.run_id}")
+        print_info(f"Test Type: {self.test_type}")
+        print_info(f"Output Directory: {self.run_dir}")
+        self._log("\n".join([
+            "=== Test Execution Log ===",
+            f"Run ID: {self.run_id}",
+            f"Test Type: {self.test_type}",
+            f"Start Time: {_utc(start_time)}",
+            f"Timeout: {self.timeout}s",
+            ""
+        ]))
+        
+        self._loop = asyncio.get_running_loop()
+        self._jobs_task = asyncio.ensure_future(self._run_jobs())
+        if self._cancelled:
+            self._jobs_task.cancel()
+        try:
+            exit_code = await asyncio.wait_for(self._jobs_task, self.timeout)
+        except asyncio.TimeoutError:
+            print_warn(f"Test execution timed out after {self.timeout}s")
+            exit_code = TIMEOUT_EXIT_CODE
+        except asyncio.CancelledError:
+            if not self._cancelled:
+                raise
+            print_warn("Test execution cancelled")
+            exit_code = CANCELLED_EXIT_CODE
+        finally:
+            for name in list(self._containers):
+                await self._exec("docker", "rm", "-f", name, log=False)
+            print_info("Cleaning up test containers...")
+            await self._exec(*self._compose_command("down", "--volumes"), log=False)
+            self._drain_results()
+        
+        end_time = time.time()
+        duration = int(end_time - start_time)
+        self._log("\n".join([
+            "",
+            "=== Execution Summary ===",
+            f"End Time: {_utc(end_time)}",
+            f"Duration: {duration}s",
+            f"Exit Code: {exit_code}" + {TIMEOUT_EXIT_CODE: " (timeout)",
+                                         CANCELLED_EXIT_CODE: " (cancelled)"}.get(exit_code, ""),
+            f"Test Type: {self.test_type}"
+        ]))
+        with open(self.run_dir / "metadata.json", "w") as f:
+            json.dump({
+                "runId": self.run_id,
+                "testType": self.test_type,
+                "startTime": _utc(start_time),
+                "endTime": _utc(end_time),
+                "duration": duration,
+                "exitCode": exit_code,
+                "resultsPath": str(self.results_dir),
+                "logsPath": str(self.logs_dir),
+                "executionLog": str(self.execution_log),
+                "jobs": sorted(self.jobs, key=lambda job: job["name"])
+            }, f, indent=2)
+        
+        if exit_code == 0:
+            print_success("Test execution complete")
+        else:
+            print_warn(f"Tests completed with exit code: {exit_code}")
+        print_info(f"Results available in: {self.run_dir}")
+        return exit_code
+
+
+def main():
+    """CLI for the test runner (same arguments as qa-autonomous-runner.sh)"""
+    profile = qa_profiling.from_argv("qa-test-runner")
+    options = dict(a[2:].split("=", 1) if "=" in a else (a[2:], "") for a in sys.argv[1:] if a.startswith("--"))
+    args = [a for a in sys.argv[1:] if not a.startswith("--")]
+    
+    if "help" in options:
+        print("Usage: qa-test-runner.py [output-dir] [unit|integration|e2e|all] [timeout-seconds] [--parallel=N]")
+        print("       [--profile[=dir]]  (cProfile/tracemalloc reports, default: in the run directory)")
+        print("Prints the run directory on stdout when done; progress goes to stderr")
+        print("Environment: QA_TEST_PARALLEL (concurrent unit test containers, default: half the CPUs)")
+        sys.exit(0)
+    
+    runner = TestRunner(
+        output_dir=args[0] if len(args) > 0 else str(REPO_ROOT / "docs" / "testing" / "autonomous-runs" / "temp"),
+        test_type=args[1] if len(args) > 1 else "all",
+        timeout=int(args[2]) if len(args) > 2 else 3600,
+        parallel=int(options["parallel"]) if options.get("parallel") else None
+    )
+    if profile:
+        profile.output_dir = profile.output_dir or runner.run_dir
+    exit_code = asyncio.run(runner.run())
+    # Output run directory for next step
+    print(runner.run_dir)
+    sys.exit(exit_code)
+
+
+if __name__ == "__main__":
+    main()
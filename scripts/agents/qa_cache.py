@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+"""
+Stage Cache for Autonomous Testing
+Make-style memoization of whole stages, keyed by input, code version and config hashes
+"""
+
+import hashlib
+import inspect
+import json
+import os
+import re
+import subprocess
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple, Union
+
+import qa_modules
+import qa_telemetry
+import qa_tracing
+
+storage_module = qa_modules.load("qa-storage")
+
+AGENTS_DIR = Path(__file__).resolve().parent
+# Bump when the key layout or stored format changes
+CACHE_FORMAT = 1
+DEFAULT_MAX_ENTRIES = 200
+# Per-run measurements that stages copy through but never act on; excluded
+# from keys so a rerun with no fixes applied still hits
+VOLATILE_FIELDS = ("duration",)
+# Per-iteration output directories (YYYYmmdd-HHMMSS-pid) embedded in report paths
+RUN_DIR_COMPONENT = re.compile(r"(?<![\d-])\d{8}-\d{6}-\d+(?![\d-])")
+
+
+def default_cache_dir() -> Path:
+    if os.environ.get("QA_STAGE_CACHE_DIR"):
+        return Path(os.environ["QA_STAGE_CACHE_DIR"])
+    return AGENTS_DIR.parent.parent / "docs" / "testing" / "autonomous-runs" / ".stage-cache"
+
+
+def canonical_json(data: Any) -> bytes:
+    """Serialization used for hashing: key order and whitespace do not matter"""
+    return json.dumps(data, sort_keys=True, separators=(",", ":"), default=str).encode("utf-8")
+
+
+def _strip_volatile(data: Any) -> Any:
+    if isinstance(data, dict):
+        return {k: _strip_volatile(v) for k, v in data.items() if k not in VOLATILE_FIELDS}
+    if isinstance(data, list):
+        return [_strip_volatile(v) for v in data]
+    return data
+
+
+def _volatile_by_id(data: Any, found: Dict[str, Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    if isinstance(data, dict):
+        fields = {k: data[k] for k in VOLATILE_FIELDS if k in data}
+        if fields and "id" in data:
+            found[data["id"]] = fields
+        for value in data.values():
+            _volatile_by_id(value, found)
+    elif isinstance(data, list):
+        for value in data:
+            _volatile_by_id(value, found)
+    return found
+
+
+def rebase(output: Any, data: Any) -> Any:
+    """Copy volatile fields of the current input onto a cached output, matched by failure id"""
+    current = _volatile_by_id(data, {})
+    if not current:
+        return output
+    
+    def walk(value):
+        if isinstance(value, dict):
+            value = {k: walk(v) for k, v in value.items()}
+            if value.get("id") in current:
+                value.update(current[value["id"]])
+            return value
+        if isinstance(value, list):
+            return [walk(v) for v in value]
+        return value
+    
+    return walk(output)
+
+
+@lru_cache(maxsize=None)
+def _file_digest(path: str, mtime_ns: int, size: int) -> str:
+    with open(path, "rb") as f:
+        return hashlib.blake2b(f.read(), digest_size=16).hexdigest()
+
+
+def code_version(stage: Any) -> str:
+    """Hash of the source file defining ``stage`` (an object, class or module)"""
+    if not inspect.ismodule(stage) and not inspect.isclass(stage):
+        stage = type(stage)
+    path = inspect.getfile(stage)
+    stat = os.stat(path)
+    return _file_digest(path, stat.st_mtime_ns, stat.st_size)
+
+
+def tree_hash(repo_root: Path, paths: Iterable[str]) -> str:
+    """Hash of the working tree under ``paths``: committed tree plus uncommitted and untracked files"""
+    repo_root = Path(repo_root)
+    paths = [p for p in paths if (repo_root / p).exists()]
+    digest = hashlib.blake2b(digest_size=16)
+    if not paths:
+        return digest.hexdigest()
+    
+    try:
+        committed = subprocess.run(
+            ["git", "rev-parse"] + [f"HEAD:{p}" for p in paths],
+            cwd=repo_root, capture_output=True, text=True, check=True
+        ).stdout
+        changed = subprocess.run(
+            ["git", "status", "--porcelain", "-z", "--untracked-files=all", "--"] + paths,
+            cwd=repo_root, capture_output=True, text=True, check=True
+        ).stdout
+    except (OSError, subprocess.CalledProcessError):
+        # Not a git checkout (or paths not committed): fall back to file metadata
+        for base in paths:
+            for root, dirs, files in os.walk(repo_root / base):
+                dirs.sort()
+                for name in sorted(files):
+                    stat = os.stat(os.path.join(root, name))
+                    digest.update(f"{os.path.join(root, name)}:{stat.st_size}:{stat.st_mtime_ns}\n".encode())
+        return digest.hexdigest()
+    
+    digest.update(committed.encode())
+    # Records are "XY path"; a rename or copy is followed by its original path, with no status prefix
+    records = []
+    entries = iter(changed.split("\0"))
+    for entry in entries:
+        if entry:
+            origin = next(entries, "") if "R" in entry[:2] or "C" in entry[:2] else ""
+            records.append((entry, origin))
+    for entry, origin in sorted(records):
+        digest.update(f"{entry}\0{origin}\0".encode())
+        path = repo_root / entry[3:]
+        if path.is_file():
+            stat = path.stat()
+            digest.update(_file_digest(str(path), stat.st_mtime_ns, stat.st_size).encode())
+    return digest.hexdigest()
+
+
+class StageCache:
+    """Stored stage outputs under ``<cache_dir>/<stage>/<key>.json.gz``
+    
+    Keys ignore VOLATILE_FIELDS and the names of per-iteration output
+    directories in report paths; on a hit both are mapped back to the
+    values of the current input.
+    """
+    
+    def __init__(self, cache_dir: Optional[Path] = None, enabled: bool = True,
+                 max_entries: Optional[int] = None):
+        self.cache_dir = Path(cache_dir) if cache_dir else default_cache_dir()
+        self.enabled = enabled
+        self.max_entries = max_entries or int(os.environ.get("QA_STAGE_CACHE_MAX_ENTRIES", DEFAULT_MAX_ENTRIES))
+        # Output directory names of inputs looked up but not yet stored, by key
+        self._run_dirs = {}
+    
+    @staticmethod
+    @qa_tracing.traced("cache.fingerprint")
+    def _fingerprint(data: Any) -> Tuple[bytes, List[str]]:
+        """Normalized input bytes and the output directory names they contained, in order"""
+        text = canonical_json(_strip_volatile(data)).decode("utf-8")
+        run_dirs = list(dict.fromkeys(RUN_DIR_COMPONENT.findall(text)))
+        return RUN_DIR_COMPONENT.sub("<run-dir>", text).encode("utf-8"), run_dirs
+    
+    def _path(self, stage: str, key: str) -> Path:
+        return self.cache_dir / stage / f"{key}.json.gz"
+    
+    @qa_tracing.traced("cache.lookup", stage="stage")
+    def lookup(self, stage: str, code: str, data: Any, config: Optional[Dict[str, Any]] = None) -> tuple:
+        """Returns (key, stored output rebased onto ``data``, or None on a miss)"""
+        if not self.enabled:
+            return None, None
+        normalized, run_dirs = self._fingerprint(data)
+        digest = hashlib.blake2b(digest_size=20)
+        digest.update(canonical_json([CACHE_FORMAT, stage, code, config or {}]))
+        digest.update(normalized)
+        key = digest.hexdigest()
+        self._run_dirs[key] = run_dirs
+        
+        path = self._path(stage, key)
+        entry = None
+        if path.exists():
+            try:
+                entry = storage_module.read_artifact(path)
+            except (OSError, ValueError, EOFError):
+                pass
+        if entry is None or len(entry.get("runDirs", [])) != len(run_dirs):
+            qa_telemetry.CACHE_REQUESTS.inc(stage=stage, result="miss")
+            return key, None
+        qa_telemetry.CACHE_REQUESTS.inc(stage=stage, result="hit")
+        # Recently used entries survive pruning
+        os.utime(path)
+        print(f"[CACHE] {stage}: hit ({key[:12]})")
+        
+        output = entry["output"]
+        if entry["runDirs"] != run_dirs:
+            mapping = dict(zip(entry["runDirs"], run_dirs))
+            output = json.loads(RUN_DIR_COMPONENT.sub(lambda m: mapping.get(m.group(0), m.group(0)),
+                                                      json.dumps(output)))
+        return key, rebase(output, data)
+    
+    def run(self, stage: str, code: str, data: Any, compute: Callable[[Any], Any],
+            config: Union[Dict[str, Any], Callable[[], Dict[str, Any]], None] = None) -> Any:
+        """Stored output for ``data`` if there is one, else ``compute(data)`` (stored)
+        
+        ``config`` may be a callable so it is only evaluated when the cache is enabled.
+        """
+        if not self.enabled:
+            return compute(data)
+        key, output = self.lookup(stage, code, data, config() if callable(config) else config)
+        if output is None:
+            output = compute(data)
+            self.put(stage, key, output)
+        return output
+    
+    @qa_tracing.traced("cache.put", stage="stage")
+    def put(self, stage: str, key: str, output: Any):
+        """Store ``output`` for a key returned by lookup()"""
+        if not self.enabled:
+            return
+        try:
+            (self.cache_dir / stage).mkdir(parents=True, exist_ok=True)
+            storage_module.write_artifact(self._path(stage, key), {
+                "runDirs": self._run_dirs.pop(key, []),
+                "output": output
+            }, "gzip")
+            self._prune(stage)
+        except OSError as e:
+            print(f"[CACHE] Warning: could not store {stage} output: {e}")
+    
+    def _prune(self, stage: str):
+        """Drop the least recently used entries beyond max_entries"""
+        entries = list(os.scandir(self.cache_dir / stage))
+        if len(entries) <= self.max_entries:
+            return
+        entries.sort(key=lambda e: e.stat().st_mtime_ns, reverse=True)
+        for entry in entries[self.max_entries:]:
+            try:
+                os.unlink(entry.path)
+            except FileNotFoundError:
+                pass
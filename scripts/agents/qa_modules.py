@@ -0,0 +1,33 @@
+#!/usr/bin/env python3
+"""
+Module Loader for Autonomous Testing
+Imports the hyphenated qa-*.py agent scripts as regular modules
+"""
+
+import importlib.util
+import sys
+from pathlib import Path
+
+AGENTS_DIR = Path(__file__).resolve().parent
+
+
+def load(script: str):
+    """Import ``qa-<name>.py`` from this directory as module ``qa_<name>``
+    
+    The module is registered in sys.modules, so repeated loads are free and
+    its classes and functions can be pickled (ProcessPoolExecutor workers).
+    """
+    name = script[:-3] if script.endswith(".py") else script
+    module_name = name.replace("-", "_")
+    if module_name in sys.modules:
+        return sys.modules[module_name]
+    
+    spec = importlib.util.spec_from_file_location(module_name, AGENTS_DIR / f"{name}.py")
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[module_name] = module
+    try:
+        spec.loader.exec_module(module)
+    except BaseException:
+        del sys.modules[module_name]
+        raise
+    return module
@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+"""
+Stage Pipeline for Autonomous Testing
+Streams failure objects from stage to stage in memory; artifacts are optional async checkpoints
+"""
+
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Dict, List, Any, Iterable, Iterator, Optional, Tuple
+
+import qa_cache
+import qa_modules
+import qa_telemetry
+import qa_tracing
+
+storage_module = qa_modules.load("qa-storage")
+
+# Returns the failures still standing once the parser is exhausted: the same objects it yielded,
+# matched by identity, since failure ids need not be unique (simple class names)
+FinalFailures = Optional[Callable[[], List[Dict[str, Any]]]]
+
+
+class Checkpointer:
+    """Write stage artifacts to a run directory on a background thread
+    
+    Stages hand over their output and move on; the data must not be mutated
+    afterwards (no stage mutates its input, so passing stage output is safe).
+    Call flush() before anything reads the files back.
+    """
+    
+    def __init__(self, run_dir: Path, enabled: bool = True, compression: str = "none"):
+        self.run_dir = Path(run_dir)
+        self.enabled = enabled
+        self.compression = compression
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="checkpoint") if enabled else None
+        self._pending = []
+    
+    def write(self, name: str, data: Any):
+        """Queue ``data`` to be written as ``name`` (no-op when checkpoints are disabled)"""
+        if not self.enabled:
+            return
+        self._pending.append((name, self._executor.submit(
+            qa_tracing.in_context(storage_module.write_artifact), self.run_dir / name, data, self.compression
+        )))
+    
+    def flush(self) -> List[Tuple[str, Exception]]:
+        """Wait for queued writes; returns (name, error) for writes that failed"""
+        errors = []
+        pending, self._pending = self._pending, []
+        for name, future in pending:
+            try:
+                future.result()
+            except Exception as e:
+                errors.append((name, e))
+        return errors
+    
+    def close(self) -> List[Tuple[str, Exception]]:
+        errors = self.flush()
+        if self._executor:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+        self.enabled = False
+        return errors
+
+
+class Pipeline:
+    """parse -> analyze -> solve -> fix, one failure at a time where the stage allows it
+    
+    Analysis and solutions are produced per failure as the parser yields them;
+    only summarizing (prioritization, statistics) and fixing need the full set.
+    With a stage cache the analyze and solve stages run whole instead, so their
+    input can be hashed and a hit skips the stage.
+    """
+    
+    def __init__(self, analyzer, finder, fixer, checkpointer: Optional[Checkpointer] = None,
+                 cache: Optional[qa_cache.StageCache] = None):
+        self.analyzer = analyzer
+        self.finder = finder
+        self.fixer = fixer
+        self.checkpointer = checkpointer or Checkpointer(Path("."), enabled=False)
+        self.cache = cache or qa_cache.StageCache(enabled=False)
+        # The versions of the code this process loaded, not of later edits on disk
+        self._code_versions = {"analyze": qa_cache.code_version(analyzer), "solve": qa_cache.code_version(finder)}
+        # Seconds spent inside each stage (exclusive of upstream stages)
+        self.durations = {}
+    
+    def _timed(self, stage: str, items: Iterable) -> Iterator:
+        """Yield from ``items``, charging time spent producing each item to ``stage``
+        
+        Each item is traced as a span; upstream stages nest inside it.
+        """
+        iterator = iter(items)
+        while True:
+            started = time.monotonic()
+            try:
+                with qa_tracing.span(stage):
+                    item = next(iterator)
+            except StopIteration:
+                self.durations[stage] = self.durations.get(stage, 0.0) + time.monotonic() - started
+                return
+            self.durations[stage] = self.durations.get(stage, 0.0) + time.monotonic() - started
+            yield item
+    
+    def solve(self, failures: Iterable[Dict[str, Any]], iteration: int,
+              final: FinalFailures = None) -> Tuple[Dict[str, Any], List[Dict[str, Any]]]:
+        """Run failures through analysis and solution finding; returns (analysis, solutions)
+        
+        ``final`` is called once ``failures`` is exhausted and returns the
+        failures that still stand; anything else the parser yielded earlier
+        (a test that passed on a later attempt) is dropped.
+        """
+        self.durations = {}
+        if self.cache.enabled:
+            analysis, solutions = self._solve_cached(failures, final)
+        else:
+            analysis, solutions = self._solve_streaming(failures, final)
+        qa_telemetry.observe_analysis(analysis)
+        qa_telemetry.observe_solutions(solutions)
+        
+        self.checkpointer.write(f"failures-analysis-iter-{iteration}.json", analysis)
+        self.checkpointer.write(f"solutions-iter-{iteration}.json", {
+            "failures": analysis["failures"],
+            "solutions": solutions,
+            "summary": {
+                "totalFailures": len(analysis["failures"]),
+                "failuresWithSolutions": len([s for s in solutions if s.get("suggestedFixes")]),
+                "totalFixes": sum(len(s.get("suggestedFixes", [])) for s in solutions)
+            }
+        })
+        return analysis, solutions
+    
+    @staticmethod
+    def _standing(final: FinalFailures) -> Optional[set]:
+        return {id(failure) for failure in final()} if final else None
+    
+    @staticmethod
+    def _kept(failures: Iterable[Dict[str, Any]], seen: List[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+        for failure in failures:
+            seen.append(failure)
+            yield failure
+    
+    def _solve_streaming(self, failures: Iterable[Dict[str, Any]],
+                         final: FinalFailures = None) -> Tuple[Dict[str, Any], List[Dict[str, Any]]]:
+        # Analysis and solution finding map one failure to one result, so solutions line up with these
+        parsed_failures = []
+        parsed = self._timed("parse", self._kept(failures, parsed_failures))
+        analyzed = self._timed("analyze", self.analyzer.iter_analyze(parsed))
+        solutions = list(self._timed("solve", self.finder.iter_solutions(analyzed)))
+        standing = self._standing(final)
+        if standing is not None:
+            solutions = [solution for solution, failure in zip(solutions, parsed_failures) if id(failure) in standing]
+        
+        # Stage timings above are inclusive of upstream generators
+        self.durations["solve"] -= self.durations["analyze"]
+        self.durations["analyze"] -= self.durations["parse"]
+        
+        started = time.monotonic()
+        with qa_tracing.span("summarize"):
+            analysis = self.analyzer.summarize([solution["failure"] for solution in solutions])
+        # Keep solutions in the analyzer's priority order, as the file-based hop did
+        position = {id(failure): i for i, failure in enumerate(analysis["failures"])}
+        solutions.sort(key=lambda solution: position[id(solution["failure"])])
+        self.durations["analyze"] += time.monotonic() - started
+        return analysis, solutions
+    
+    def _solve_cached(self, failures: Iterable[Dict[str, Any]],
+                      final: FinalFailures = None) -> Tuple[Dict[str, Any], List[Dict[str, Any]]]:
+        parsed = list(self._timed("parse", failures))
+        standing = self._standing(final)
+        if standing is not None:
+            parsed = [failure for failure in parsed if id(failure) in standing]
+        
+        started = time.monotonic()
+        with qa_tracing.span("analyze"):
+            analysis = self.cache.run(
+                "analyze", self._code_versions["analyze"], parsed,
+                lambda failures: self.analyzer.summarize(list(self.analyzer.iter_analyze(failures))))
+        self.durations["analyze"] = time.monotonic() - started
+        
+        started = time.monotonic()
+        with qa_tracing.span("solve"):
+            solutions = self.cache.run("solve", self._code_versions["solve"], analysis["failures"],
+                                       lambda failures: list(self.finder.iter_solutions(failures)),
+                                       self.finder.cache_config)
+        self.durations["solve"] = time.monotonic() - started
+        return analysis, solutions
+    
+    def fix(self, solutions: List[Dict[str, Any]], iteration: int, confidence_threshold: float,
+            strategy: str = "service") -> Dict[str, Any]:
+        """Apply fixes for the solved failures (the fixer reports its own stage metrics)"""
+        started = time.monotonic()
+        fixes = self.fixer.apply_fixes(solutions, confidence_threshold, strategy)
+        self.durations["fix"] = time.monotonic() - started
+        self.checkpointer.write(f"fixes-iter-{iteration}.json", fixes)
+        return fixes
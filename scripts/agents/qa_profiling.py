@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""
+Profiling for Autonomous Testing
+CPU (cProfile) and memory (tracemalloc) reports per stage, enabled with --profile
+"""
+
+import atexit
+import contextlib
+import cProfile
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+TOP_FUNCTIONS = 20
+TOP_ALLOCATIONS = 25
+# Seconds between checks for a new high of traced memory; a snapshot is only taken on a new high
+SNAPSHOT_INTERVAL = 0.5
+# Frames of the profilers themselves are left out of allocation reports
+IGNORED_FRAMES = (__file__, tracemalloc.__file__, cProfile.__file__, pstats.__file__, "<frozen importlib._bootstrap>")
+
+
+def _size(size: int) -> str:
+    if size < 1024 * 1024:
+        return f"{size / 1024:.1f} KiB"
+    return f"{size / (1024 * 1024):.1f} MiB"
+
+
+# The innermost started Profile, for paused()
+_active = None
+
+
+@contextlib.contextmanager
+def paused():
+    """Leave the enclosed block (e.g. waiting for containers) out of the active CPU profile"""
+    profile = _active
+    if profile is None or profile.profiler is None:
+        yield
+        return
+    started = time.monotonic()
+    profile.profiler.disable()
+    try:
+        yield
+    finally:
+        profile.profiler.enable()
+        profile.paused_seconds += time.monotonic() - started
+
+
+class Profile:
+    """Profile one stage into <output_dir>/<name>.pstats and <name>-allocations.txt
+    
+    Usable as a context manager or with start()/stop(). Only the calling
+    thread is seen by cProfile; tracemalloc covers the whole process. The
+    allocation report lists the sites live at the largest sampled point of
+    the stage as well as those still live at its end.
+    ``output_dir`` may be set until stop(); it defaults to QA_PROFILE_DIR,
+    else the current directory.
+    """
+    
+    def __init__(self, name: str, output_dir=None):
+        self.name = name
+        self.output_dir = output_dir
+        self.profiler = None
+        self.paused_seconds = 0.0
+        self._own_tracemalloc = False
+        self._baseline = 0
+        self._largest = (0, None)
+        self._sampling = threading.Event()
+        self._sampler = None
+        self._outer = None
+    
+    def start(self) -> "Profile":
+        global _active
+        self._own_tracemalloc = not tracemalloc.is_tracing()
+        if self._own_tracemalloc:
+            tracemalloc.start()
+        else:
+            tracemalloc.reset_peak()
+        self._baseline = tracemalloc.get_traced_memory()[0]
+        self._sampler = threading.Thread(target=self._sample, name=f"profile-{self.name}", daemon=True)
+        self._sampler.start()
+        self._outer, _active = _active, self
+        self.profiler = cProfile.Profile()
+        try:
+            self.profiler.enable()
+        except ValueError as e:
+            # Another profiler is active (e.g. an enclosing --profile)
+            print(f"[PROFILE] {self.name}: CPU profile skipped ({e})", file=sys.stderr)
+            self.profiler = None
+        return self
+    
+    def _sample(self):
+        """Keep a snapshot of the largest traced memory seen (on the sampler thread)"""
+        while not self._sampling.wait(SNAPSHOT_INTERVAL):
+            current = tracemalloc.get_traced_memory()[0]
+            if current > self._largest[0]:
+                self._largest = (current, tracemalloc.take_snapshot())
+    
+    def stop(self) -> Dict[str, Any]:
+        """Write and print the reports; returns their paths and the memory figures"""
+        global _active
+        if self.profiler is not None:
+            self.profiler.disable()
+        if _active is self:
+            _active = self._outer
+        self._sampling.set()
+        self._sampler.join()
+        current, peak = tracemalloc.get_traced_memory()
+        snapshot = tracemalloc.take_snapshot()
+        if current >= self._largest[0]:
+            self._largest = (current, snapshot)
+        if self._own_tracemalloc:
+            tracemalloc.stop()
+        
+        self.output_dir = Path(self.output_dir or os.environ.get("QA_PROFILE_DIR") or ".")
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        report = {
+            "stage": self.name,
+            "peakBytes": peak,
+            "peakIncreaseBytes": max(0, peak - self._baseline),
+            "currentBytes": current,
+            "largestSampledBytes": self._largest[0],
+            "allocations": str(self._write_allocations(snapshot, peak, current)),
+        }
+        if self.paused_seconds:
+            report["pausedSeconds"] = round(self.paused_seconds, 3)
+        print(f"[PROFILE] {self.name}: peak memory {_size(peak)} (+{_size(report['peakIncreaseBytes'])} "
+              f"during the stage), {_size(current)} still allocated", file=sys.stderr)
+        if self.profiler is not None:
+            pstats_path = self.output_dir / f"{self.name}.pstats"
+            self.profiler.dump_stats(str(pstats_path))
+            report["pstats"] = str(pstats_path)
+            excluded = f", {self.paused_seconds:.1f}s of waiting excluded" if self.paused_seconds else ""
+            print(f"[PROFILE] {self.name}: top {TOP_FUNCTIONS} functions by cumulative time "
+                  f"({pstats_path}{excluded})", file=sys.stderr)
+            stats = pstats.Stats(self.profiler, stream=sys.stderr)
+            stats.strip_dirs().sort_stats(pstats.SortKey.CUMULATIVE).print_stats(TOP_FUNCTIONS)
+        return report
+    
+    def _write_allocations(self, snapshot: tracemalloc.Snapshot, peak: int, current: int) -> Path:
+        path = self.output_dir / f"{self.name}-allocations.txt"
+        largest, largest_snapshot = self._largest
+        lines = [
+            f"Stage: {self.name}",
+            f"Peak traced memory: {_size(peak)} (+{_size(max(0, peak - self._baseline))} during the stage)",
+            f"Largest sampled: {_size(largest)} (checked every {SNAPSHOT_INTERVAL}s, so it may miss short spikes)",
+            f"Still allocated at the end: {_size(current)}",
+        ]
+        sections = [(f"Top {TOP_ALLOCATIONS} allocation sites live at the largest sampled point:", largest_snapshot),
+                    (f"Top {TOP_ALLOCATIONS} allocation sites still live at the end of the stage:", snapshot)]
+        for title, section in sections:
+            lines += ["", title]
+            section = section.filter_traces([tracemalloc.Filter(False, pattern) for pattern in IGNORED_FRAMES])
+            for stat in section.statistics("lineno")[:TOP_ALLOCATIONS]:
+                frame = stat.traceback[0]
+                lines.append(f"{_size(stat.size):>12}  {stat.count:>8} blocks  {frame.filename}:{frame.lineno}")
+        path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+        return path
+    
+    def __enter__(self):
+        return self.start()
+    
+    def __exit__(self, *exc_info):
+        self.stop()
+        return False
+
+
+def from_argv(job: str) -> Optional[Profile]:
+    """Handle --profile[=DIR] for a stage CLI: strip it from sys.argv and profile until exit
+    
+    Reports go to DIR; without one, CLIs that create a run directory set
+    ``output_dir`` to it, others fall back to QA_PROFILE_DIR or the current directory.
+    """
+    for i, arg in enumerate(sys.argv[1:], 1):
+        if arg == "--profile" or arg.startswith("--profile="):
+            del sys.argv[i]
+            profile = Profile(f"{job}-{os.getpid()}", arg.partition("=")[2] or None).start()
+            atexit.register(profile.stop)
+            return profile
+    return None
@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+"""
+Telemetry for Autonomous Testing
+Stage timings and counters in Prometheus exposition format, as a textfile or on a /metrics endpoint
+"""
+
+import atexit
+import math
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import qa_tracing
+
+DEFAULT_METRICS_PORT = 9464
+DEFAULT_METRICS_HOST = "127.0.0.1"
+STAGE_BUCKETS = (0.01, 0.05, 0.1, 0.5, 1, 5, 10, 30, 60, 300, 900, 1800, 3600)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if value == int(value) and abs(value) < 1e15:
+        return str(int(value))
+    return repr(float(value))
+
+
+class Metric:
+    """One metric family; values are kept per label tuple"""
+    
+    kind = "untyped"
+    
+    def __init__(self, name: str, help_text: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+    
+    def _key(self, labels: Dict[str, Any]) -> tuple:
+        if set(labels) != set(self.labels):
+            raise ValueError(f"{self.name} takes labels {self.labels}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labels)
+    
+    def _label_text(self, key: tuple, extra: Tuple[Tuple[str, str], ...] = ()) -> str:
+        pairs = list(zip(self.labels, key)) + list(extra)
+        if not pairs:
+            return ""
+        return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+    
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+    
+    def samples(self) -> List[str]:
+        with self._lock:
+            return [f"{self.name}{self._label_text(key)} {_format_value(value)}"
+                    for key, value in sorted(self._values.items())]
+    
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.kind}"]
+        return "\n".join(lines + self.samples())
+
+
+class Counter(Metric):
+    kind = "counter"
+    
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+    
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+
+class Gauge(Metric):
+    kind = "gauge"
+    
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = float(value)
+    
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+
+class Histogram(Metric):
+    kind = "histogram"
+    
+    def __init__(self, name: str, help_text: str, labels: Tuple[str, ...] = (), buckets: Tuple[float, ...] = ()):
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+    
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            counts, total = self._values.get(key, ([0] * len(self.buckets), 0.0))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+            self._values[key] = (counts, total + value)
+    
+    def samples(self) -> List[str]:
+        lines = []
+        with self._lock:
+            for key, (counts, total) in sorted(self._values.items()):
+                for bound, count in zip(self.buckets, counts):
+                    lines.append(f"{self.name}_bucket{self._label_text(key, (('le', _format_value(bound)),))} {count}")
+                lines.append(f"{self.name}_sum{self._label_text(key)} {_format_value(total)}")
+                lines.append(f"{self.name}_count{self._label_text(key)} {counts[-1]}")
+        return lines
+
+
+class Registry:
+    """Metric families of this process, rendered in registration order"""
+    
+    def __init__(self):
+        self._metrics = {}
+    
+    def _register(self, metric: Metric) -> Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric already registered: {metric.name}")
+        self._metrics[metric.name] = metric
+        return metric
+    
+    def counter(self, name: str, help_text: str, labels: Tuple[str, ...] = ()) -> Counter:
+        return self._register(Counter(name, help_text, labels))
+    
+    def gauge(self, name: str, help_text: str, labels: Tuple[str, ...] = ()) -> Gauge:
+        return self._register(Gauge(name, help_text, labels))
+    
+    def histogram(self, name: str, help_text: str, labels: Tuple[str, ...] = (),
+                  buckets: Tuple[float, ...] = STAGE_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, help_text, labels, buckets))
+    
+    def render(self) -> str:
+        """Prometheus text exposition format (0.0.4)"""
+        return "\n".join(metric.render() for metric in self._metrics.values()) + "\n"
+
+
+REGISTRY = Registry()
+
+# Stages: run, parse, analyze, solve, fix
+STAGE_SECONDS = REGISTRY.histogram("qa_stage_duration_seconds", "Wall time of one stage execution", ("stage",))
+ITERATIONS = REGISTRY.counter("qa_iterations_total", "Loop iterations completed")
+ITERATION = REGISTRY.gauge("qa_iteration", "Current loop iteration")
+ITERATION_FAILURES = REGISTRY.gauge("qa_iteration_failures", "Failures found in the latest iteration")
+BUDGET_REMAINING = REGISTRY.gauge("qa_budget_remaining_seconds", "Wall-clock budget left for the run")
+# qa-result-parser.py
+FILES_PARSED = REGISTRY.counter("qa_parser_files_total", "Report and log files parsed", ("format",))
+BYTES_READ = REGISTRY.counter("qa_parser_bytes_read_total", "Bytes of report and log files parsed", ("format",))
+TESTS = REGISTRY.gauge("qa_tests", "Tests in the latest parsed run by final status", ("status",))
+# qa-problem-analyzer.py / qa-solution-finder.py
+FAILURES = REGISTRY.gauge("qa_failures", "Failures in the latest analysis by category", ("category",))
+FAILURES_ANALYZED = REGISTRY.counter("qa_failures_analyzed_total", "Failures analyzed by category", ("category",))
+SOLUTIONS = REGISTRY.counter("qa_solutions_total", "Failures solved, by whether a fix was suggested", ("result",))
+# qa_cache.py
+CACHE_REQUESTS = REGISTRY.counter("qa_cache_requests_total", "Stage cache lookups", ("stage", "result"))
+# qa-auto-fix.py
+FIXES = REGISTRY.counter("qa_fixes_total", "Suggested fixes by outcome", ("result",))
+# qa-storage.py
+ARTIFACT_BYTES = REGISTRY.counter("qa_artifact_bytes_total", "Bytes of run artifacts read and written",
+                                  ("direction",))
+
+
+class timed:
+    """Context manager observing the wall time of a stage into STAGE_SECONDS (and tracing it as a span)"""
+    
+    def __init__(self, stage: str):
+        self.stage = stage
+        self.span = qa_tracing.span(stage)
+    
+    def __enter__(self):
+        self.span.__enter__()
+        self.started = time.monotonic()
+        return self
+    
+    def __exit__(self, *exc_info):
+        STAGE_SECONDS.observe(time.monotonic() - self.started, stage=self.stage)
+        return self.span.__exit__(*exc_info)
+
+
+def observe_analysis(analysis: Dict[str, Any]):
+    """Per-category failure counts of an analysis document (computed or cached)"""
+    FAILURES.clear()
+    for category, count in analysis.get("statistics", {}).get("byCategory", {}).items():
+        FAILURES.set(count, category=category)
+        FAILURES_ANALYZED.inc(count, category=category)
+
+
+def observe_solutions(solutions: List[Dict[str, Any]]):
+    for solution in solutions:
+        SOLUTIONS.inc(result="fix" if solution.get("suggestedFixes") else "none")
+
+
+def write_textfile(path) -> Path:
+    """Write the registry atomically, as node_exporter's textfile collector expects"""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    tmp.write_text(REGISTRY.render(), encoding="utf-8")
+    os.replace(tmp, path)
+    return path
+
+
+def export_at_exit(job: str):
+    """Write <QA_METRICS_TEXTFILE_DIR>/<job>.prom when the process exits (no-op when unset)"""
+    directory = os.environ.get("QA_METRICS_TEXTFILE_DIR")
+    if directory:
+        atexit.register(lambda: write_textfile(Path(directory) / f"{job}.prom"))
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?", 1)[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = REGISTRY.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(port: Optional[int] = None, host: str = None) -> Optional[ThreadingHTTPServer]:
+    """Serve /metrics on a daemon thread; None unless a port or host is given (or QA_METRICS_PORT/_HOST is set)
+    
+    The port falls back to DEFAULT_METRICS_PORT. The host defaults to
+    loopback; Prometheus in Docker reaches the host through the bridge
+    gateway, so set QA_METRICS_HOST to it (e.g. 172.17.0.1) for the
+    qa-autonomous-loop scrape job. Metrics are optional: when the address
+    cannot be bound (e.g. the daemon already serves the default port) a
+    warning is printed and None returned.
+    """
+    port = port if port is not None else os.environ.get("QA_METRICS_PORT") or None
+    host = host or os.environ.get("QA_METRICS_HOST")
+    if port is None and not host:
+        return None
+    port = port if port is not None else DEFAULT_METRICS_PORT
+    host = host or DEFAULT_METRICS_HOST
+    try:
+        server = ThreadingHTTPServer((host, int(port)), _MetricsHandler)
+    except (OSError, ValueError) as e:
+        print(f"[METRICS] Not serving /metrics on {host}:{port}: {e}", file=sys.stderr)
+        return None
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics", daemon=True).start()
+    return server
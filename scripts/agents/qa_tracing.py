@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+"""
+Tracing for Autonomous Testing
+Dependency-free span recorder: spans go to a JSONL file per run (OpenTelemetry-like fields)
+and are converted to a Chrome trace for chrome://tracing, Perfetto or speedscope
+"""
+
+import atexit
+import contextvars
+import functools
+import inspect
+import json
+import os
+import secrets
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional
+
+_current = contextvars.ContextVar("qa_span", default=None)
+_tracer = None
+
+
+class Tracer:
+    """Appends finished spans to a JSONL file, one object per line
+    
+    Each span is a single unbuffered append, so there is no buffer for a
+    forked child to inherit and flush a second time.
+    """
+    
+    def __init__(self, path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.trace_id = secrets.token_hex(16)
+        self._lock = threading.Lock()
+        self._fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+    
+    def record(self, span: Dict[str, Any]):
+        line = (json.dumps(span, separators=(",", ":"), default=str) + "\n").encode("utf-8")
+        with self._lock:
+            if self._fd is not None:
+                os.write(self._fd, line)
+    
+    def close(self):
+        with self._lock:
+            if self._fd is not None:
+                os.close(self._fd)
+                self._fd = None
+
+
+def _forget_in_child():
+    # Forked workers (ProcessPoolExecutor on Linux) do not trace; their
+    # callers record spans around the submitted work instead
+    global _tracer
+    _tracer = None
+
+
+os.register_at_fork(after_in_child=_forget_in_child)
+
+
+def start(path) -> Tracer:
+    """Record spans of this process to ``path`` (JSONL) until stop()"""
+    global _tracer
+    stop()
+    _tracer = Tracer(path)
+    return _tracer
+
+
+def stop(chrome_path=None) -> Optional[Path]:
+    """Close the span file and convert it to a Chrome trace (default: <name>.json next to it)"""
+    global _tracer
+    tracer, _tracer = _tracer, None
+    if tracer is None:
+        return None
+    tracer.close()
+    chrome_path = Path(chrome_path) if chrome_path else tracer.path.with_suffix(".json")
+    return to_chrome_trace(tracer.path, chrome_path)
+
+
+def enabled() -> bool:
+    return _tracer is not None
+
+
+class span:
+    """Context manager recording one span; a no-op while tracing is off
+    
+    Spans nest through a context variable, so parents follow asyncio tasks;
+    threads only keep them when started through in_context(). Attributes
+    can be added inside the block with set().
+    """
+    
+    __slots__ = ("name", "attributes", "_tracer", "_token", "_id", "_parent", "_start_ns", "_start_perf")
+    
+    def __init__(self, name: str, **attributes):
+        self.name = name
+        self.attributes = attributes
+        self._tracer = None
+    
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+    
+    def __enter__(self):
+        self._tracer = _tracer
+        if self._tracer is not None:
+            self._id = secrets.token_hex(8)
+            self._parent = _current.get()
+            self._token = _current.set(self._id)
+            self._start_ns = time.time_ns()
+            self._start_perf = time.perf_counter_ns()
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        if self._tracer is None:
+            return False
+        duration = time.perf_counter_ns() - self._start_perf
+        _current.reset(self._token)
+        attributes = self.attributes
+        if exc_type is not None:
+            attributes = dict(attributes, exception=f"{exc_type.__name__}: {exc}")
+        _record(self._tracer, self.name, self._id, self._parent, self._start_ns, self._start_ns + duration,
+                "ok" if exc_type is None else "error", attributes)
+        return False
+
+
+def _record(tracer: Tracer, name: str, span_id: str, parent: Optional[str], start_ns: int, end_ns: int,
+            status: str, attributes: Dict[str, Any]):
+    tracer.record({
+        "name": name,
+        "traceId": tracer.trace_id,
+        "spanId": span_id,
+        "parentSpanId": parent,
+        "startTimeUnixNano": start_ns,
+        "endTimeUnixNano": end_ns,
+        "pid": os.getpid(),
+        "tid": threading.get_ident(),
+        "thread": threading.current_thread().name,
+        "status": status,
+        "attributes": attributes,
+    })
+
+
+def record_span(name: str, start_ns: int, end_ns: int = None, status: str = "ok", **attributes):
+    """Record a span that already happened elsewhere (e.g. in a worker process), under the current span"""
+    tracer = _tracer
+    if tracer is not None:
+        _record(tracer, name, secrets.token_hex(8), _current.get(), start_ns, end_ns or time.time_ns(),
+                status, attributes)
+
+
+def in_context(func: Callable) -> Callable:
+    """``func`` bound to a copy of the current context, so spans it opens on another thread keep their parent"""
+    return functools.partial(contextvars.copy_context().run, func)
+
+
+def traced(name: str = None, **attribute_args: str) -> Callable:
+    """Decorator running a function inside a span named after it
+    
+    ``attribute_args`` maps span attributes to argument names, e.g.
+    ``@traced(file="xml_file")``; they are only bound while tracing is on.
+    """
+    def decorate(func):
+        span_name = name or func.__qualname__
+        signature = inspect.signature(func) if attribute_args else None
+        
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if _tracer is None:
+                return func(*args, **kwargs)
+            attributes = {}
+            if signature is not None:
+                bound = signature.bind_partial(*args, **kwargs).arguments
+                attributes = {attr: bound.get(arg) for attr, arg in attribute_args.items()}
+            with span(span_name, **attributes):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def to_chrome_trace(jsonl_path, output_path) -> Path:
+    """Convert a span file to Chrome trace event format (complete "X" events, microseconds)"""
+    events = []
+    threads = {}
+    with open(jsonl_path, encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            s = json.loads(line)
+            threads[(s["pid"], s["tid"])] = s.get("thread", "")
+            events.append({
+                "name": s["name"],
+                "cat": s["name"].split(".", 1)[0],
+                "ph": "X",
+                "ts": s["startTimeUnixNano"] / 1000,
+                "dur": (s["endTimeUnixNano"] - s["startTimeUnixNano"]) / 1000,
+                "pid": s["pid"],
+                "tid": s["tid"],
+                "args": dict(s.get("attributes") or {}, status=s.get("status")),
+            })
+    # Parents first when spans share a start time, so viewers nest them
+    events.sort(key=lambda e: (e["ts"], -e["dur"]))
+    events.extend({"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": thread_name}}
+                  for (pid, tid), thread_name in threads.items())
+    output_path = Path(output_path)
+    with open(output_path, "w", encoding="utf-8") as f:
+        json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+    return output_path
+
+
+def trace_at_exit(job: str):
+    """Trace this process to <QA_TRACE_DIR>/<job>-<pid>.trace.jsonl (+ .trace.json on exit; no-op when unset)"""
+    directory = os.environ.get("QA_TRACE_DIR")
+    if directory and not enabled():
+        start(Path(directory) / f"{job}-{os.getpid()}.trace.jsonl")
+        atexit.register(stop)
+
+
+def main():
+    """CLI: convert a span file to a Chrome trace"""
+    if len(sys.argv) < 2:
+        print("Usage: qa_tracing.py <trace.jsonl> [trace.json]")
+        sys.exit(1)
+    jsonl_path = Path(sys.argv[1])
+    output = to_chrome_trace(jsonl_path, sys.argv[2] if len(sys.argv) > 2 else jsonl_path.with_suffix(".json"))
+    print(f"Chrome trace written to: {output}")
+
+
+if __name__ == "__main__":
+    main()